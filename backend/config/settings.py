@@ -1,3 +1,5 @@
+from functools import lru_cache
+from typing import Dict
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,12 +9,71 @@ class Settings(BaseSettings):
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     MONGODB_URI: str
     MONGODB_DB_NAME: str
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 10
+    MONGODB_MAX_IDLE_TIME_MS: int = 300000
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 5000
+    MONGODB_CONNECT_TIMEOUT_MS: int = 5000
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGODB_COMPRESSORS: str = "zlib"  # comma-separated, e.g. "zstd,snappy,zlib"; empty to disable
     STRIPE_SECRET_KEY: str
     STRIPE_PUBLISHABLE_KEY: str  # Add this field
     PAYPAL_CLIENT_ID: str
     PAYPAL_SECRET: str
     GROQ_API_KEY: str
+    FORECAST_CACHE_TTL_SECONDS: int = 300
+    FORECAST_CACHE_MAX_ENTRIES: int = 1024
+    FORECAST_SNAPSHOT_ENABLED: bool = True
+    FORECAST_SNAPSHOT_INTERVAL_SECONDS: int = 3600
+    FORECAST_SNAPSHOT_BATCH_SIZE: int = 500
+    FORECAST_SNAPSHOT_WORKERS: int = 2
+    SUGGESTION_CACHE_TTL_SECONDS: int = 3600
+    SUGGESTION_CACHE_STALE_SECONDS: int = 86400
+    SUGGESTION_CACHE_MAX_ENTRIES: int = 1024
+    SUGGESTION_STALE_WHILE_REVALIDATE: bool = True
+    LLM_BACKEND: str = "groq"  # "groq" or "stub"
+    LLM_MODEL_NAME: str = "llama-3.3-70b-versatile"
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_TIMEOUT_SECONDS: float = 20.0
+    LLM_MAX_RETRIES: int = 1
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0
+    LLM_STUB_LATENCY_MS: int = 0
+    EVENT_WRITE_BATCH_SIZE: int = 100
+    EVENT_WRITE_FLUSH_INTERVAL_MS: int = 1000
+    EVENT_WRITE_MAX_PENDING: int = 50000  # per buffer; the oldest are dropped past it
+    WS_CLIENT_QUEUE_SIZE: int = 100
+    NOTIFICATION_BUS_BACKEND: str = "local"  # "local" or "mongo"
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    APPLY_INDEXES_ON_STARTUP: bool = True
+    # Off by default: the payments and tax report pages still sum the full raw event history.
+    RETENTION_ENABLED: bool = False
+    RETENTION_INTERVAL_SECONDS: int = 3600
+    RETENTION_BATCH_SIZE: int = 1000
+    # "collection.type" -> days kept; "collection.*" covers the remaining types
+    RETENTION_DAYS: Dict[str, int] = {
+        "data.impression": 30,
+        "data.click": 90,
+        # Wallet balance (commissions minus payouts) and tax reports need all three for the same period.
+        "data.conversion": 2555,
+        "data.commission": 2555,
+        "data.payout": 2555,
+        "data.*": 365,
+        "notifications.impression": 7,
+        "notifications.*": 90,
+    }
+    NOTIFICATION_READ_TTL_DAYS: int = 30
+    EVENT_STORAGE_LAYOUT: str = "documents"  # "documents" or "buckets"
 
     class Config:
         env_file = ".env"
-        env_file_encoding = "utf-8"
\ No newline at end of file
+        env_file_encoding = "utf-8"
+
+@lru_cache
+def get_settings() -> Settings:
+    """Process-wide settings, read from the environment and .env once."""
+    return Settings()
@@ -1,13 +1,128 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
 from motor.motor_asyncio import AsyncIOMotorClient
-from config.settings import Settings
+from pymongo import monitoring
+from config.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks connection counts and checkout wait times across the client's pools."""
+
+    def __init__(self, window: int = 1000):
+        self.open = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+        self._waits_ms = deque(maxlen=window)
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+
+    def pool_cleared(self, event):
+        self.pool_clears += 1
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_closed(self, event):
+        self.open -= 1
+
+    def connection_checked_out(self, event):
+        self.in_use += 1
+        self.checkouts += 1
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            self._waits_ms.append(duration * 1000)
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            self._waits_ms.append(duration * 1000)
+
+    def connection_checked_in(self, event):
+        self.in_use -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits_ms)
+
+        def percentile(pct: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(pct / 100 * len(waits)))], 3)
+
+        return {
+            "openConnections": self.open,
+            "inUseConnections": self.in_use,
+            "checkouts": self.checkouts,
+            "checkoutFailures": self.checkout_failures,
+            "poolClears": self.pool_clears,
+            "checkoutWaitMs": {"p50": percentile(50), "p99": percentile(99), "max": percentile(100)},
+        }
 
 class Database:
     client: AsyncIOMotorClient = None
     db = None
+    monitor: PoolMonitor = None
+
+    @classmethod
+    def connect(cls, settings: Optional[Settings] = None):
+        """Creates the client with the configured pool sizing, timeouts and compression."""
+        if cls.client is not None:
+            return cls.db
+        settings = settings or get_settings()
+        cls.monitor = PoolMonitor()
+        options: Dict[str, Any] = {
+            "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+            "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+            "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+            "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            "event_listeners": [cls.monitor],
+        }
+        if settings.MONGODB_COMPRESSORS:
+            options["compressors"] = settings.MONGODB_COMPRESSORS
+        cls.client = AsyncIOMotorClient(settings.MONGODB_URI, **options)
+        cls.db = cls.client[settings.MONGODB_DB_NAME]
+        return cls.db
+
+    @classmethod
+    async def ping(cls) -> float:
+        """Round-trips a ping and returns its latency in milliseconds."""
+        started = time.perf_counter()
+        await cls.client.admin.command("ping")
+        return (time.perf_counter() - started) * 1000
+
+    @classmethod
+    async def warmup(cls) -> bool:
+        """Runs server selection and opens the first connection before traffic arrives;
+        minPoolSize connections are then filled in by the driver's background task."""
+        try:
+            latency = await cls.ping()
+        except Exception as e:
+            logger.error(f"MongoDB warmup ping failed: {e}")
+            return False
+        logger.info(f"MongoDB ready (ping {latency:.1f} ms)")
+        return True
+
+    @classmethod
+    def close(cls):
+        if cls.client is not None:
+            cls.client.close()
+        cls.client = None
+        cls.db = None
 
 def get_db():
+    # The app connects in its lifespan hook; CLI tools and scripts connect lazily here.
     if Database.db is None:
-        settings = Settings()
-        Database.client = AsyncIOMotorClient(settings.MONGODB_URI)
-        Database.db = Database.client[settings.MONGODB_DB_NAME]
-    return Database.db
\ No newline at end of file
+        Database.connect()
+    return Database.db
@@ -1,8 +1,56 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from routers import auth_router, dashboard_router, network_router, notification_router, payment_router, analytics_router,affiliate_router,tax_router
+from routers import auth_router, dashboard_router, network_router, notification_router, payment_router, analytics_router,affiliate_router,tax_router,health_router
 from fastapi.middleware.cors import CORSMiddleware
+from config.settings import get_settings
+from db.database import Database, get_db
+from services.forecast_snapshot_service import ForecastSnapshotJob
+from services.event_writer import event_writer
+from services.notification_bus import notification_bus, MongoBusBackend
+from services.password_hasher import password_hasher
+from services.index_manifest import apply_indexes
+from services.retention import RetentionCompactor, apply_ttl_indexes, parse_policies
 
-app = FastAPI(title="Affiliate Command Center")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    Database.connect(settings)
+    db_ready = await Database.warmup()
+    if db_ready and settings.APPLY_INDEXES_ON_STARTUP:
+        await apply_indexes(get_db())
+        await apply_ttl_indexes(get_db(), settings.NOTIFICATION_READ_TTL_DAYS)
+    if settings.NOTIFICATION_BUS_BACKEND == "mongo":
+        await notification_bus.use_backend(MongoBusBackend(get_db()))
+    snapshot_job = None
+    if settings.FORECAST_SNAPSHOT_ENABLED:
+        snapshot_job = ForecastSnapshotJob(
+            get_db(),
+            campaign_names=[c["name"] for c in affiliate_router.campaigns],
+            interval=settings.FORECAST_SNAPSHOT_INTERVAL_SECONDS,
+            batch_size=settings.FORECAST_SNAPSHOT_BATCH_SIZE,
+            workers=settings.FORECAST_SNAPSHOT_WORKERS,
+        )
+        snapshot_job.start()
+    compactor = None
+    if settings.RETENTION_ENABLED:
+        compactor = RetentionCompactor(
+            get_db(),
+            policies=parse_policies(settings.RETENTION_DAYS),
+            interval=settings.RETENTION_INTERVAL_SECONDS,
+            batch_size=settings.RETENTION_BATCH_SIZE,
+        )
+        compactor.start()
+    yield
+    if snapshot_job:
+        await snapshot_job.stop()
+    if compactor:
+        await compactor.stop()
+    await event_writer.close()
+    await notification_bus.close()
+    password_hasher.close()
+    Database.close()
+
+app = FastAPI(title="Affiliate Command Center", lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -22,6 +70,7 @@ app.include_router(payment_router.router)
 app.include_router(analytics_router.router)
 app.include_router(tax_router.router)
 app.include_router(affiliate_router.router)
+app.include_router(health_router.router)
 
 @app.get("/")
 async def root():
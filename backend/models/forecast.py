@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class ForecastMonth(BaseModel):
+    month: str
+    predicted: int
+    confidence: int
+    actual: Optional[float] = None
+
+class ScenarioQuarter(BaseModel):
+    name: str
+    description: str
+    q1: int
+    q2: int
+    q3: int
+    q4: int
+    total: int
+    probability: int
+
+class RevenueForecastResponse(BaseModel):
+    forecastData: List[ForecastMonth]
+    scenarios: List[ScenarioQuarter]
+    positiveIndicators: List[str]
+    riskFactors: List[str]
+    generatedAt: Optional[datetime] = None
@@ -1,16 +1,37 @@
 # routers/affiliate_router.py
 from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import asyncio
 import random
-from datetime import datetime
+from itertools import accumulate
+from datetime import datetime, timedelta
 from bson import ObjectId
-from services.notification_service import NotificationService
+from services.notification_service import NotificationService, serialize_notification
+from services.rollup_service import RollupService, event_month
+from services.forecast_cache import forecast_cache
+from services.forecast_snapshot_service import ForecastSnapshotService
+from services.suggestion_cache import suggestion_cache
+from services.llm_gateway import llm_gateway, LLMUnavailableError
+from services.event_writer import event_writer
+from services.event_hub import EventHub, put_drop_oldest
+from services.notification_bus import notification_bus
+from services.ws_frames import FREQUENCY_RANGE, FrameEncoder, collect_batch, negotiate_encoder, parse_interval_ms
+from services.forecast_engine import (
+    SCENARIOS, campaign_indicators, campaign_metrics_from_rollups, finalize_campaign_metrics, monthly_revenue_from_rollups,
+    rollups_since,
+)
+from models.forecast import ForecastMonth, ScenarioQuarter, RevenueForecastResponse
+from services.token_cache import token_cache
+from services.pagination import encode_cursor, keyset_filter
+from services.event_store import bson_datetime, create_event_store, serialize_event, utc_now
+from services.unread_counter import UnreadCounterService, is_read
+from services.notification_state import NotificationStateService
+from services.retention import parse_policies, raw_retention_days
 from db.database import get_db
 from pymongo.database import Database
-from langchain_groq import ChatGroq
-from config.settings import Settings
+from config.settings import get_settings
 import json
 import logging
 import re
@@ -25,15 +46,32 @@ logger = logging.getLogger(__name__)
 
 # --- Initialization & Setup ---
 router = APIRouter(prefix="/api/affiliate", tags=["affiliate"])
-settings = Settings()
+settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+DEFAULT_EVENTS_PAGE_SIZE = 500
+MAX_EVENTS_PAGE_SIZE = 5000
+DEFAULT_NOTIFICATIONS_PAGE_SIZE = 50
+MAX_NOTIFICATIONS_PAGE_SIZE = 500
+
 class MarkAsReadRequest(BaseModel):
     notification_ids: List[str]
 
+class NotificationStateOperation(BaseModel):
+    action: str  # "read", "unread" or "delete"
+    notification_ids: List[str]
+
+class NotificationBulkRequest(BaseModel):
+    operations: List[NotificationStateOperation]
+
+class MarkAllReadRequest(BaseModel):
+    up_to: Optional[datetime] = None  # defaults to the newest notification
+
 class WebSocketConfig(BaseModel):
     frequency: int = 50000  # Reduced for faster testing
     networks: List[str] = None
+    encoding: str = "json"  # "json", "json-compact" or "msgpack"
+    batchInterval: int = 1000  # ms between frames in the batched encodings
 
 # Define models for API response
 class OptimizationSuggestion(BaseModel):
@@ -45,28 +83,6 @@ class OptimizationSuggestion(BaseModel):
     estimatedRevenue: float
     effort: str
 
-class ForecastMonth(BaseModel):
-    month: str
-    predicted: int
-    confidence: int
-    actual: Optional[float] = None
-
-class ScenarioQuarter(BaseModel):
-    name: str
-    description: str
-    q1: int
-    q2: int
-    q3: int
-    q4: int
-    total: int
-    probability: int
-
-class RevenueForecastResponse(BaseModel):
-    forecastData: List[ForecastMonth]
-    scenarios: List[ScenarioQuarter]
-    positiveIndicators: List[str]
-    riskFactors: List[str]
-
 # ---- Entity Pools ----
 campaigns = [
     {"name": "Holiday Discounts", "weight": 30},
@@ -88,13 +104,17 @@ products = [
 payment_method_ids = ["1", "2", "3", "4"]
 
 # ---- Utility Functions ----
-def weighted_random(items):
-    total = sum(item["weight"] for item in items)
-    r = random.uniform(0, total)
-    for item in items:
-        if r < item["weight"]: return item["name"]
-        r -= item["weight"]
-    return items[-1]["name"]
+def weight_table(items):
+    """A pool's names and cumulative weights, computed once so that random.choices
+    bisects instead of rescanning the pool on every draw."""
+    return [item["name"] for item in items], list(accumulate(item["weight"] for item in items))
+
+campaign_weights = weight_table(campaigns)
+product_weights = weight_table(products)
+
+def weighted_random(table):
+    names, cum_weights = table
+    return random.choices(names, cum_weights=cum_weights)[0]
 
 async def get_user_from_token(token: str, db: Database) -> Dict[str, Any]:
     try:
@@ -102,7 +122,9 @@ async def get_user_from_token(token: str, db: Database) -> Dict[str, Any]:
         email = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token: No email found")
-        user = await db.get_collection("users").find_one({"email": email})
+        user = await token_cache.get_or_load(
+            token, payload.get("exp"), lambda: db.get_collection("users").find_one({"email": email})
+        )
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         return user
@@ -111,9 +133,9 @@ async def get_user_from_token(token: str, db: Database) -> Dict[str, Any]:
 
 async def generate_event(network_name: str, db: Database, tenant_id: str):
     chosen_type = random.choice(["impression"] * 5 + ["click"] * 2 + ["conversion", "commission", "payout"])
-    now = datetime.now().isoformat()
-    campaign = weighted_random(campaigns)
-    product = weighted_random(products)
+    now = bson_datetime()
+    campaign = weighted_random(campaign_weights)
+    product = weighted_random(product_weights)
 
     event_data = {
         "tenantId": tenant_id,
@@ -167,18 +189,64 @@ def generate_notification_message(event: dict) -> str:
     
     return f"Unknown event from {event.get('network', 'an unknown source')}"
 
+def build_event_notification(event: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    return {
+        "_id": ObjectId(),
+        "user_id": user_id,
+        "message": generate_notification_message(event),
+        "type": event["event"],
+        "network": event["network"],
+        "amount": event.get("amount"),
+        "clicks": event.get("clicks"),
+        "status": event.get("status"),
+        "paymentMethodId": event.get("paymentMethodId"),
+        "created_at": bson_datetime(),
+        "read": False,
+        "tenantId": event["tenantId"]
+    }
+
 # ---- Revenue Forecasting Logic ----
 async def fetch_all_events(db: Database, tenant_id: str) -> List[Dict[str, Any]]:
     events = []
-    cursor = db.get_collection("data").find({
-        "tenantId": tenant_id,
-        "event": {"$in": ["commission", "conversion", "click", "payout"]}
-    }).sort("date", 1)
-    async for event in cursor:
-        if "_id" in event: event["_id"] = str(event["_id"])
-        events.append(event)
+    async for event in create_event_store(db).iter_events(tenant_id, ["commission", "conversion", "click", "payout"]):
+        events.append(serialize_event(event))
     return events
 
+def lookback_since(lookback_days: Optional[int]) -> Optional[datetime]:
+    if lookback_days is None:
+        return None
+    return utc_now() - timedelta(days=lookback_days)
+
+def raw_campaign_history_days() -> Optional[int]:
+    """Days for which clicks and revenue events are all still raw, or None if retention is off."""
+    if not settings.RETENTION_ENABLED:
+        return None
+    return raw_retention_days(parse_policies(settings.RETENTION_DAYS), "data", ["commission", "conversion", "click"])
+
+async def aggregate_campaign_metrics(db: Database, tenant_id: str, lookback_days: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """Campaign revenue, commissions, clicks and conversion rate. Retention keeps clicks
+    and revenue events raw for different periods, so a window reaching past the
+    shorter one would compare all commissions against part of the clicks; such windows
+    are computed from the rollups (which still count archived events), at month
+    granularity. Shorter windows are aggregated from the raw events to the day."""
+    raw_days = raw_campaign_history_days()
+    if raw_days is not None and (lookback_days is None or lookback_days > raw_days):
+        rollups = await RollupService(db).get_rollups(tenant_id)
+        if lookback_days is not None:
+            rollups = rollups_since(rollups, lookback_since(lookback_days))
+        return campaign_metrics_from_rollups(rollups, [c['name'] for c in campaigns])
+
+    campaign_metrics: Dict[str, Dict[str, float]] = {c['name']: {"revenue": 0.0, "commissions": 0.0, "clicks": 0.0} for c in campaigns}
+    campaign_clicks: Dict[str, int] = {c['name']: 0 for c in campaigns}
+
+    rows = await create_event_store(db).campaign_totals(tenant_id, list(campaign_metrics), lookback_since(lookback_days))
+    for row in rows:
+        campaign_metrics[row["_id"]]["revenue"] += row["revenue"]
+        campaign_metrics[row["_id"]]["commissions"] += row["commissions"]
+        campaign_clicks[row["_id"]] += row["clicks"]
+
+    return finalize_campaign_metrics(campaign_metrics, campaign_clicks)
+
 def calculate_campaign_metrics(events: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
     campaign_metrics: Dict[str, Dict[str, float]] = {c['name']: {"revenue": 0.0, "commissions": 0.0, "clicks": 0.0} for c in campaigns}
     campaign_clicks: Dict[str, int] = {c['name']: 0 for c in campaigns}
@@ -197,33 +265,22 @@ def calculate_campaign_metrics(events: List[Dict[str, Any]]) -> Dict[str, Dict[s
         elif event["event"] == "click" and "clicks" in event and isinstance(event["clicks"], (int, float)):
             campaign_clicks[campaign_name] += event["clicks"]
             
-    final_metrics = {}
-    for name, metrics in campaign_metrics.items():
-        clicks = campaign_clicks.get(name, 0)
-        commissions = metrics['commissions']
-        conversion_rate = (commissions / clicks * 100) if clicks > 0 else 0
-        final_metrics[name] = {
-            "revenue": round(metrics['revenue'], 2),
-            "commissions": commissions,
-            "clicks": clicks,
-            "conversionRate": round(conversion_rate, 2)
-        }
-
-    return final_metrics
+    return finalize_campaign_metrics(campaign_metrics, campaign_clicks)
 
-def calculate_forecast_and_scenarios(events: List[Dict[str, Any]], campaign_metrics: Dict[str, Dict[str, float]]) -> RevenueForecastResponse:
+def monthly_revenue_from_events(events: List[Dict[str, Any]]) -> Dict[str, float]:
     monthly_data: Dict[str, float] = {}
     for event in events:
-        if event.get("event") in ["commission", "conversion"] and event.get("date"):
-            try:
-                event_date = datetime.fromisoformat(event["date"].replace('Z', '+00:00'))
-                month_key = event_date.strftime('%Y-%m')
-                amount = event.get("commissionAmount", event.get("amount", 0))
-                if isinstance(amount, (int, float)):
-                    monthly_data[month_key] = monthly_data.get(month_key, 0) + amount
-            except Exception:
-                pass
+        if event.get("event") in ["commission", "conversion"]:
+            month_key = event_month(event)
+            amount = event.get("commissionAmount", event.get("amount", 0))
+            if month_key is not None and isinstance(amount, (int, float)):
+                monthly_data[month_key] = monthly_data.get(month_key, 0) + amount
+    return monthly_data
+
+def calculate_forecast_and_scenarios(events: List[Dict[str, Any]], campaign_metrics: Dict[str, Dict[str, float]]) -> RevenueForecastResponse:
+    return build_forecast(monthly_revenue_from_events(events), campaign_metrics)
 
+def build_forecast(monthly_data: Dict[str, float], campaign_metrics: Dict[str, Dict[str, float]]) -> RevenueForecastResponse:
     revenues = list(monthly_data.values())
     sorted_months = sorted(monthly_data.keys())
     
@@ -240,7 +297,7 @@ def calculate_forecast_and_scenarios(events: List[Dict[str, Any]], campaign_metr
     monthly_growth_rate = total_growth / growth_count if growth_count > 0 else 0
 
     forecasts: List[Dict[str, Any]] = []
-    start_date = datetime.now().replace(day=1) + relativedelta(months=1)
+    start_date = utc_now().replace(day=1) + relativedelta(months=1)
     last_revenue = average_monthly_revenue if average_monthly_revenue > 0 else 1000
     
     mean = sum(revenues) / len(revenues) if len(revenues) > 0 else 0
@@ -274,15 +331,15 @@ def calculate_forecast_and_scenarios(events: List[Dict[str, Any]], campaign_metr
             quarterly_projections.append(round(monthly_proj * 3))
         return quarterly_projections
     
-    scenarios = [
-        {"name": "Conservative", "description": "Based on current performance with minimal growth", "q_projections": calculate_quarterly(conservative_growth), "probability": 85},
-        {"name": "Optimistic", "description": "Assuming successful implementation of optimization suggestions", "q_projections": calculate_quarterly(optimistic_growth), "probability": 65},
-        {"name": "Aggressive", "description": "With new market expansion and increased ad spend", "q_projections": calculate_quarterly(aggressive_growth), "probability": 35},
-    ]
+    growth_rates = {
+        "Conservative": conservative_growth,
+        "Optimistic": optimistic_growth,
+        "Aggressive": aggressive_growth,
+    }
 
     final_scenarios: List[Dict[str, Any]] = []
-    for s in scenarios:
-        projections = s["q_projections"]
+    for s in SCENARIOS:
+        projections = calculate_quarterly(growth_rates[s["name"]])
         final_scenarios.append({
             "name": s["name"],
             "description": s["description"],
@@ -294,21 +351,7 @@ def calculate_forecast_and_scenarios(events: List[Dict[str, Any]], campaign_metr
             "probability": s["probability"],
         })
 
-    sorted_campaigns = sorted(
-        campaign_metrics.items(),
-        key=lambda item: item[1]['revenue'],
-        reverse=True
-    )
-
-    positive_indicators = [
-        f"{name} contributing ${metrics['revenue']:,.0f} in revenue"
-        for name, metrics in sorted_campaigns[:3]
-    ] or ["No significant revenue drivers yet"]
-
-    risk_factors = [
-        f"Low performance in {name} ({metrics.get('conversionRate', 0):.1f}% conversion rate)"
-        for name, metrics in sorted_campaigns[-2:] if len(sorted_campaigns) > 2
-    ] or ["Insufficient data to identify risks"]
+    positive_indicators, risk_factors = campaign_indicators(campaign_metrics)
 
     return RevenueForecastResponse(
         forecastData=forecasts,
@@ -319,15 +362,33 @@ def calculate_forecast_and_scenarios(events: List[Dict[str, Any]], campaign_metr
 
 # --- Endpoints ---
 @router.get("/revenue-forecast", response_model=RevenueForecastResponse)
-async def get_revenue_forecast(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+async def get_revenue_forecast(
+    lookback_days: Optional[int] = Query(None, ge=1),
+    fresh: bool = False,
+    token: str = Depends(oauth2_scheme),
+    db: Database = Depends(get_db)
+):
     try:
         user = await get_user_from_token(token, db)
         tenant_id = user.get("tenantId")
         if not tenant_id:
             raise HTTPException(status_code=401, detail="Invalid user: No tenantId")
-        events = await fetch_all_events(db, tenant_id)
-        campaign_metrics = calculate_campaign_metrics(events)
-        forecast_data = calculate_forecast_and_scenarios(events, campaign_metrics)
+        if not fresh and lookback_days is None:
+            snapshot = await ForecastSnapshotService(db).get_forecast(tenant_id)
+            if snapshot is not None:
+                return snapshot
+        cached = forecast_cache.get(tenant_id, lookback_days)
+        if cached is not None:
+            return cached
+        rollups = await RollupService(db).get_rollups(tenant_id)
+        if lookback_days is not None:
+            # The same window for the revenue history as for the campaign metrics
+            # (whole months for the former, since rollups are monthly).
+            rollups = rollups_since(rollups, lookback_since(lookback_days))
+        campaign_metrics = await aggregate_campaign_metrics(db, tenant_id, lookback_days)
+        forecast_data = build_forecast(monthly_revenue_from_rollups(rollups), campaign_metrics)
+        forecast_data.generatedAt = datetime.utcnow()
+        forecast_cache.set(tenant_id, forecast_data, lookback_days)
         return forecast_data
     except HTTPException as e:
         raise e
@@ -335,14 +396,13 @@ async def get_revenue_forecast(token: str = Depends(oauth2_scheme), db: Database
         logger.error(f"Error generating revenue forecast: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate revenue forecast: {str(e)}")
 
-async def generate_optimization_suggestions(db: Database, tenant_id: str) -> List[OptimizationSuggestion]:
-    llm = ChatGroq(
-        api_key=settings.GROQ_API_KEY,
-        model_name="llama-3.3-70b-versatile",
-        temperature=0.7
-    )
+@router.get("/revenue-forecast/cache-stats")
+async def get_forecast_cache_stats(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    await get_user_from_token(token, db)
+    return forecast_cache.stats()
 
-    campaign_metrics = calculate_campaign_metrics(await fetch_all_events(db, tenant_id))
+async def generate_optimization_suggestions(db: Database, tenant_id: str, lookback_days: Optional[int] = None) -> List[OptimizationSuggestion]:
+    campaign_metrics = await aggregate_campaign_metrics(db, tenant_id, lookback_days)
     metrics_for_prompt = {
         name: {k: v for k, v in metrics.items() if k in ["revenue", "commissions", "clicks", "conversionRate"]}
         for name, metrics in campaign_metrics.items()
@@ -361,11 +421,15 @@ async def generate_optimization_suggestions(db: Database, tenant_id: str) -> Lis
         '"impact": "high", "estimatedRevenue": 2500.0, "effort": "low"}]'
     )
 
+    cache_key = suggestion_cache.key(metrics_for_prompt, llm_gateway.model_name)
+    return await suggestion_cache.get_or_compute(cache_key, lambda: request_optimization_suggestions(prompt))
+
+async def request_optimization_suggestions(prompt: str) -> List[OptimizationSuggestion]:
     try:
-        response = await llm.ainvoke(prompt)
-        logger.info(f"Raw Groq response: {response.content}")
+        content = await llm_gateway.complete(prompt)
+        logger.info(f"Raw Groq response: {content}")
 
-        json_match = re.search(r'\[[\s\S]*?\]', response.content, re.DOTALL)
+        json_match = re.search(r'\[[\s\S]*?\]', content, re.DOTALL)
         if not json_match:
             logger.error("No valid JSON array found in Groq response")
             raise ValueError("No valid JSON array found in Groq response")
@@ -390,6 +454,9 @@ async def generate_optimization_suggestions(db: Database, tenant_id: str) -> Lis
             raise ValueError("No valid suggestions found in Groq response")
 
         return validated_suggestions
+    except LLMUnavailableError as e:
+        logger.error(f"LLM unavailable: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Optimization suggestions temporarily unavailable: {str(e)}")
     except (json.JSONDecodeError, ValueError) as e:
         logger.error(f"Validation/Decode error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Invalid Groq response format: {str(e)}")
@@ -397,14 +464,28 @@ async def generate_optimization_suggestions(db: Database, tenant_id: str) -> Lis
         logger.error(f"Error generating optimization suggestions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate optimization suggestions: {str(e)}")
 
+@router.get("/optimization-suggestions/cache-stats")
+async def get_suggestion_cache_stats(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    await get_user_from_token(token, db)
+    return suggestion_cache.stats()
+
+@router.get("/optimization-suggestions/llm-stats")
+async def get_llm_stats(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    await get_user_from_token(token, db)
+    return llm_gateway.stats()
+
 @router.get("/optimization-suggestions")
-async def get_optimization_suggestions(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+async def get_optimization_suggestions(
+    lookback_days: Optional[int] = Query(None, ge=1),
+    token: str = Depends(oauth2_scheme),
+    db: Database = Depends(get_db)
+):
     try:
         user = await get_user_from_token(token, db)
         tenant_id = user.get("tenantId")
         if not tenant_id:
             raise HTTPException(status_code=401, detail="Invalid user: No tenantId")
-        suggestions = await generate_optimization_suggestions(db, tenant_id)
+        suggestions = await generate_optimization_suggestions(db, tenant_id, lookback_days)
         return {"suggestions": suggestions}
     except HTTPException as e:
         raise e
@@ -412,19 +493,40 @@ async def get_optimization_suggestions(token: str = Depends(oauth2_scheme), db:
         raise HTTPException(status_code=500, detail=f"Failed to generate optimization suggestions: {str(e)}")
 
 @router.get("/events")
-async def get_all_events(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+async def get_all_events(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_EVENTS_PAGE_SIZE),
+    after: Optional[str] = None,
+    stream: bool = False,
+    token: str = Depends(oauth2_scheme),
+    db: Database = Depends(get_db)
+):
+    """Returns the tenant's events newest first, paginated on (date, _id).
+
+    Pass the returned `next_cursor` as `after` to fetch the next page. With
+    `stream=true` the events are written as NDJSON straight from the cursor
+    (the whole history unless `limit` is given) instead of a single JSON body.
+    """
     try:
         user = await get_user_from_token(token, db)
         tenant_id = user.get("tenantId")
         if not tenant_id:
             raise HTTPException(status_code=401, detail="Invalid user: No tenantId")
 
-        all_events = []
-        async for event in db.get_collection("data").find({"tenantId": tenant_id}).sort("date", -1):
-            if "_id" in event:
-                event["_id"] = str(event["_id"])
-            all_events.append(event)
-        return {"events": all_events}
+        event_store = create_event_store(db)
+
+        if stream:
+            async def ndjson_lines():
+                async for event in event_store.iter_newest(tenant_id, after, limit):
+                    yield json.dumps(serialize_event(event), default=str) + "\n"
+
+            return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+        page_size = limit or DEFAULT_EVENTS_PAGE_SIZE
+        events = [event async for event in event_store.iter_newest(tenant_id, after, page_size)]
+        next_cursor = None
+        if len(events) == page_size:
+            next_cursor = encode_cursor(events[-1].get("date"), events[-1]["_id"])
+        return {"events": [serialize_event(event) for event in events], "next_cursor": next_cursor}
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -432,127 +534,299 @@ async def get_all_events(token: str = Depends(oauth2_scheme), db: Database = Dep
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 @router.get("/notifications")
-async def get_all_notifications(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+async def get_all_notifications(
+    limit: int = Query(DEFAULT_NOTIFICATIONS_PAGE_SIZE, ge=1, le=MAX_NOTIFICATIONS_PAGE_SIZE),
+    after: Optional[str] = None,
+    type: Optional[str] = None,
+    network: Optional[str] = None,
+    token: str = Depends(oauth2_scheme),
+    db: Database = Depends(get_db)
+):
+    """Returns the tenant's notifications newest first, paginated on (created_at, _id),
+    optionally filtered by `type` and `network`, together with the unread count."""
     try:
         user = await get_user_from_token(token, db)
         tenant_id = user.get("tenantId")
         if not tenant_id:
             raise HTTPException(status_code=401, detail="Invalid user: No tenantId")
 
-        notifications_collection = db.get_collection("notifications")
+        base_filter: Dict[str, Any] = {"tenantId": tenant_id}
+        if type:
+            base_filter["type"] = type
+        if network:
+            base_filter["network"] = network
+        cursor = db.get_collection("notifications").find(keyset_filter(base_filter, "created_at", after))
+        page = await cursor.sort([("created_at", -1), ("_id", -1)]).limit(limit).to_list(length=limit)
+
+        next_cursor = None
+        if len(page) == limit:
+            next_cursor = encode_cursor(page[-1].get("created_at"), page[-1]["_id"])
+        state = await UnreadCounterService(db).get_state(tenant_id)
         notifications = []
-        async for notification in notifications_collection.find({"tenantId": tenant_id}).sort("created_at", -1):
-            notification["_id"] = str(notification["_id"])
-            if "read" not in notification:
-                notification["read"] = False
-            if "created_at" in notification and isinstance(notification["created_at"], datetime):
-                notification["created_at"] = notification["created_at"].isoformat()
-            notifications.append(notification)
-        return {"notifications": notifications}
+        for notification in page:
+            notification["read"] = is_read(notification, state["watermark"])
+            notification.pop("unread_pinned", None)
+            notifications.append(serialize_notification(notification))
+        return {"notifications": notifications, "next_cursor": next_cursor, "unread_count": state["unread"]}
     except HTTPException as e:
         raise e
     except Exception as e:
         logger.error(f"Error fetching notifications: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-@router.websocket("/ws/{network_name}-events")
-async def websocket_network_events(websocket: WebSocket, network_name: str, db: Database = Depends(get_db)):
-    await websocket.accept()
-    notification_service = NotificationService(db)
-    
+@router.get("/notifications/unread-count")
+async def get_unread_notification_count(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    user = await get_user_from_token(token, db)
+    tenant_id = user.get("tenantId")
+    if not tenant_id:
+        raise HTTPException(status_code=401, detail="Invalid user: No tenantId")
+    return {"unread_count": await UnreadCounterService(db).get(tenant_id)}
+
+async def run_until_first_exits(*coroutines) -> None:
+    """Runs a socket's reader/writer coroutines as independent tasks. When one of
+    them returns or raises (e.g. WebSocketDisconnect), the others are cancelled
+    and its exception is re-raised."""
+    tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in done:
+        task.result()
+
+async def produce_network_event(db: Database, tenant_id: str, network_name: str, user_id: str) -> Optional[Dict[str, Any]]:
+    event_data = await generate_event(network_name, db, tenant_id)
+
+    if not event_data or not event_data.get("event"):
+        logger.warning(f"Skipping empty or invalid event for {network_name}")
+        return None
+
+    event_data["_id"] = ObjectId()
+    new_notification = build_event_notification(event_data, user_id)
+    event_writer.enqueue(db, event_data, new_notification)
+
+    full_event = serialize_event(event_data)
+    full_notification = {
+        **new_notification,
+        "_id": str(new_notification["_id"]),
+        "created_at": new_notification["created_at"].isoformat(),
+    }
+    return {"event": full_event, "notification": full_notification}
+
+event_hub = EventHub(produce_network_event, queue_size=settings.WS_CLIENT_QUEUE_SIZE)
+
+@router.get("/token-cache/stats")
+async def get_token_cache_stats(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    await get_user_from_token(token, db)
+    return token_cache.stats()
+
+@router.get("/ws/stats")
+async def get_websocket_stats(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    await get_user_from_token(token, db)
+    return {"hub": event_hub.stats(), "writer": event_writer.stats(), "bus": notification_bus.stats()}
+
+async def authenticate_websocket(websocket: WebSocket, db: Database, label: str) -> Optional[Dict[str, Any]]:
+    """Waits for the `{"token": ...}` handshake message. Returns the user and the
+    handshake message, or None after reporting the error and closing the socket."""
     try:
         data = await asyncio.wait_for(websocket.receive_json(), timeout=5.0)
         token = data.get("token")
         if not token:
-            logger.error(f"No token provided for {network_name} WebSocket")
+            logger.error(f"No token provided for {label} WebSocket")
             await websocket.send_json({"error": "No token provided"})
             await websocket.close(code=4001)
-            return
+            return None
 
         user = await get_user_from_token(token, db)
         tenant_id = user.get("tenantId")
         if not tenant_id:
-            logger.error(f"No tenantId found for user in {network_name} WebSocket")
+            logger.error(f"No tenantId found for user in {label} WebSocket")
             await websocket.send_json({"error": "Invalid user: No tenantId"})
             await websocket.close(code=4001)
-            return
-        user_id = str(user.get("_id", "user_id_from_token"))
-        logger.info(f"WebSocket authenticated for {network_name} with tenantId: {tenant_id}")
+            return None
+        logger.info(f"WebSocket authenticated for {label} with tenantId: {tenant_id}")
+        return {"user": user, "handshake": data}
     except asyncio.TimeoutError:
-        logger.error(f"Timeout waiting for token in {network_name} WebSocket")
+        logger.error(f"Timeout waiting for token in {label} WebSocket")
         await websocket.send_json({"error": "No token received within timeout"})
         await websocket.close(code=4001)
-        return
+        return None
     except HTTPException as e:
-        logger.error(f"Token validation failed for {network_name}: {e.detail}")
+        logger.error(f"Token validation failed for {label}: {e.detail}")
         await websocket.send_json({"error": str(e.detail)})
         await websocket.close(code=4001)
-        return
+        return None
     except Exception as e:
-        logger.error(f"Unexpected error in {network_name} WebSocket authentication: {str(e)}")
+        logger.error(f"Unexpected error in {label} WebSocket authentication: {str(e)}")
         await websocket.send_json({"error": "Unexpected authentication error"})
         await websocket.close(code=4001)
+        return None
+
+@router.websocket("/ws/events")
+async def websocket_multiplexed_events(websocket: WebSocket, db: Database = Depends(get_db)):
+    """One authenticated socket carrying events for many networks.
+
+    Control messages: `{"config": {"networks": [...], "frequency": ms}}` replaces the
+    subscribed set, `{"subscribe": [...]}` / `{"unsubscribe": [...]}` adjust it.
+    Each outgoing frame is tagged with its `network`. `config.encoding` and
+    `config.batchInterval` switch to batched frames (see services/ws_frames);
+    permessage-deflate is negotiated by the server (uvicorn --ws-per-message-deflate).
+    """
+    await websocket.accept()
+    auth = await authenticate_websocket(websocket, db, "multiplexed")
+    if auth is None:
         return
-
-    config = WebSocketConfig(frequency=50000, networks=[network_name])
-
-    try:
+    tenant_id = auth["user"]["tenantId"]
+    user_id = str(auth["user"].get("_id", "user_id_from_token"))
+
+    config = WebSocketConfig(frequency=50000, networks=[])
+    queue = event_hub.new_queue()
+    subscriptions: Dict[str, Any] = {}
+    encoder = FrameEncoder()
+
+    def push_notification(notification: Dict[str, Any]) -> None:
+        put_drop_oldest(queue, {"notification": notification})
+
+    def apply_networks(networks: List[str]) -> None:
+        for network in set(subscriptions) - set(networks):
+            event_hub.unsubscribe(subscriptions.pop(network))
+        for network in networks:
+            if network not in subscriptions:
+                subscriptions[network] = event_hub.subscribe(db, tenant_id, network, user_id, config.frequency, queue=queue)
+        config.networks = list(subscriptions)
+
+    def apply_control(data: Dict[str, Any]) -> None:
+        nonlocal encoder
+        if not isinstance(data, dict) or not isinstance(data.get("config") or {}, dict):
+            raise ValueError("Control messages must be JSON objects")
+        client_config = data.get("config") or {}
+        # Validate everything before applying anything, so a rejected message changes nothing.
+        frequency = parse_interval_ms(client_config, "frequency", FREQUENCY_RANGE)
+        for key, value in (("networks", client_config.get("networks")), ("subscribe", data.get("subscribe")),
+                           ("unsubscribe", data.get("unsubscribe"))):
+            if value is not None and not (isinstance(value, list) and all(isinstance(n, str) for n in value)):
+                raise ValueError(f"'{key}' must be a list of network names")
+        new_encoder = None
+        if "encoding" in client_config or "batchInterval" in client_config:
+            new_encoder = negotiate_encoder(client_config, encoder)
+        if new_encoder is not None:
+            encoder = new_encoder
+            config.encoding = encoder.encoding
+            config.batchInterval = round(encoder.batch_interval * 1000)
+        if frequency is not None:
+            config.frequency = frequency
+            for subscription in subscriptions.values():
+                event_hub.set_frequency(subscription, config.frequency)
+        if client_config.get("networks") is not None:
+            apply_networks(client_config["networks"])
+        if data.get("subscribe"):
+            apply_networks(config.networks + [n for n in data["subscribe"] if n not in subscriptions])
+        if data.get("unsubscribe"):
+            apply_networks([n for n in config.networks if n not in data["unsubscribe"]])
+
+    async def send_state():
+        await websocket.send_json({"subscribed": config.networks, **config.model_dump(exclude={"networks"})})
+
+    async def receive_control():
         while True:
             try:
-                data = await asyncio.wait_for(websocket.receive_json(), timeout=0.1)
-                if "config" in data:
-                    client_config = data["config"]
-                    if client_config.get("frequency", 0) >= 1000:
-                        config.frequency = client_config["frequency"]
-                    
-                    valid_networks = client_config.get("networks")
-                    if valid_networks is not None and network_name in valid_networks:
-                        config.networks = valid_networks
-            except asyncio.TimeoutError:
-                pass
-
-            event_data = await generate_event(network_name, db, tenant_id)
-            
-            if not event_data or not event_data.get("event"):
-                logger.warning(f"Skipping empty or invalid event for {network_name}")
-                await asyncio.sleep(config.frequency / 1000)
+                apply_control(await websocket.receive_json())
+            except ValueError as e:
+                await websocket.send_json({"error": str(e)})
                 continue
+            await send_state()
 
-            inserted_event = await db.get_collection("data").insert_one(event_data)
-            full_event = await db.get_collection("data").find_one({"_id": inserted_event.inserted_id})
-            
-            if full_event and "_id" in full_event: 
-                full_event["_id"] = str(full_event["_id"])
-
-            notification_message = generate_notification_message(event_data)
-
-            new_notification = {
-                "user_id": user_id,
-                "message": notification_message,
-                "type": event_data["event"],
-                "network": event_data["network"],
-                "amount": event_data.get("amount"),
-                "clicks": event_data.get("clicks"),
-                "status": event_data.get("status"),
-                "paymentMethodId": event_data.get("paymentMethodId"),
-                "created_at": datetime.now(),
-                "read": False,
-                "tenantId": tenant_id
-            }
-            
-            inserted_notification = await db.get_collection("notifications").insert_one(new_notification)
-            full_notification = await db.get_collection("notifications").find_one({"_id": inserted_notification.inserted_id})
-            
-            if full_notification and "_id" in full_notification:
-                full_notification["_id"] = str(full_notification["_id"])
-                if "created_at" in full_notification and isinstance(full_notification["created_at"], datetime):
-                    full_notification["created_at"] = full_notification["created_at"].isoformat()
+    async def send_events():
+        while True:
+            batch = await collect_batch(queue, encoder)
+            if not encoder.batched:
+                batch = [
+                    {"network": (combined_data.get("event") or combined_data["notification"]).get("network"), **combined_data}
+                    for combined_data in batch
+                ]
+            await encoder.send(websocket, tenant_id, batch)
+
+    notification_bus.subscribe(tenant_id, push_notification)
+    try:
+        try:
+            apply_control(auth["handshake"])
+        except ValueError as e:
+            await websocket.send_json({"error": str(e)})
+        await send_state()
+        await run_until_first_exits(receive_control(), send_events())
+    except WebSocketDisconnect:
+        logger.info(f"Client disconnected from multiplexed events: {websocket.client}")
+    except Exception as e:
+        logger.error(f"Error in multiplexed WebSocket: {e}")
+        try:
+            await websocket.send_json({"error": f"An unexpected error occurred: {str(e)}"})
+        except WebSocketDisconnect:
+            pass
+        await websocket.close(code=1000)
+    finally:
+        notification_bus.unsubscribe(tenant_id, push_notification)
+        for subscription in subscriptions.values():
+            event_hub.unsubscribe(subscription)
+
+@router.websocket("/ws/{network_name}-events")
+async def websocket_network_events(websocket: WebSocket, network_name: str, db: Database = Depends(get_db)):
+    await websocket.accept()
+    notification_service = NotificationService(db)
+
+    auth = await authenticate_websocket(websocket, db, network_name)
+    if auth is None:
+        return
+    tenant_id = auth["user"]["tenantId"]
+    user_id = str(auth["user"].get("_id", "user_id_from_token"))
+
+    config = WebSocketConfig(frequency=50000, networks=[network_name])
+    subscription = event_hub.subscribe(db, tenant_id, network_name, user_id, config.frequency)
+    encoder = FrameEncoder()
 
-            combined_data = {"event": full_event, "notification": full_notification}
-            await websocket.send_json(combined_data)
-            logger.info(f"Sent event for {network_name}: {event_data['event']} (tenantId: {tenant_id})")
+    def push_notification(notification: Dict[str, Any]) -> None:
+        put_drop_oldest(subscription.queue, {"notification": notification})
 
-            await asyncio.sleep(config.frequency / 1000)
+    notification_bus.subscribe(tenant_id, push_notification)
+
+    async def receive_config():
+        nonlocal encoder
+        while True:
+            data = await websocket.receive_json()
+            if isinstance(data, dict) and "config" in data:
+                client_config = data["config"]
+                if not isinstance(client_config, dict):
+                    await websocket.send_json({"error": "'config' must be a JSON object"})
+                    continue
+                if "encoding" in client_config or "batchInterval" in client_config:
+                    try:
+                        encoder = negotiate_encoder(client_config, encoder)
+                        config.encoding = encoder.encoding
+                        config.batchInterval = round(encoder.batch_interval * 1000)
+                    except ValueError as e:
+                        await websocket.send_json({"error": str(e)})
+                try:
+                    frequency = parse_interval_ms(client_config, "frequency", FREQUENCY_RANGE)
+                except ValueError as e:
+                    await websocket.send_json({"error": str(e)})
+                    frequency = None
+                if frequency is not None:
+                    config.frequency = frequency
+                    event_hub.set_frequency(subscription, config.frequency)
+                
+                valid_networks = client_config.get("networks")
+                if valid_networks is not None and network_name in valid_networks:
+                    config.networks = valid_networks
+
+    async def send_events():
+        while True:
+            batch = await collect_batch(subscription.queue, encoder)
+            await encoder.send(websocket, tenant_id, batch)
+            logger.info(f"Sent {len(batch)} event(s) for {network_name} (tenantId: {tenant_id})")
+
+    try:
+        await run_until_first_exits(receive_config(), send_events())
     except WebSocketDisconnect:
         logger.info(f"Client disconnected from {network_name}: {websocket.client}")
     except Exception as e:
@@ -562,25 +836,52 @@ async def websocket_network_events(websocket: WebSocket, network_name: str, db:
         except WebSocketDisconnect:
             pass
         await websocket.close(code=1000)
+    finally:
+        notification_bus.unsubscribe(tenant_id, push_notification)
+        event_hub.unsubscribe(subscription)
 
-@router.post("/notifications/mark-read")
-async def mark_notifications_as_read(request: MarkAsReadRequest, token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+async def apply_notification_state(db: Database, token: str, operations: List[Dict[str, Any]]) -> Dict[str, int]:
     try:
         user = await get_user_from_token(token, db)
         tenant_id = user.get("tenantId")
         if not tenant_id:
             raise HTTPException(status_code=401, detail="Invalid user: No tenantId")
-        result = await db.get_collection("notifications").update_many(
-            {"_id": {"$in": [ObjectId(id) for id in request.notification_ids]}, "tenantId": tenant_id},
-            {"$set": {"read": True}}
-        )
-        return {"message": f"{result.modified_count} notifications marked as read."}
+        return await NotificationStateService(db).apply(tenant_id, operations)
     except HTTPException as e:
         raise e
     except Exception as e:
-        logger.error(f"Error marking notifications as read: {str(e)}")
+        logger.error(f"Error updating notification state: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+@router.post("/notifications/mark-read")
+async def mark_notifications_as_read(request: MarkAsReadRequest, token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    result = await apply_notification_state(db, token, [{"action": "read", "notification_ids": request.notification_ids}])
+    return {"message": f"{result['modified']} notifications marked as read.", **result}
+
+@router.post("/notifications/mark-unread")
+async def mark_notifications_as_unread(request: MarkAsReadRequest, token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    result = await apply_notification_state(db, token, [{"action": "unread", "notification_ids": request.notification_ids}])
+    return {"message": f"{result['modified']} notifications marked as unread.", **result}
+
+@router.post("/notifications/delete")
+async def delete_notifications(request: MarkAsReadRequest, token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    result = await apply_notification_state(db, token, [{"action": "delete", "notification_ids": request.notification_ids}])
+    return {"message": f"{result['deleted']} notifications deleted.", **result}
+
+@router.post("/notifications/bulk")
+async def bulk_update_notifications(request: NotificationBulkRequest, token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    """Applies several read/unread/delete operations, in order, with one bulk_write."""
+    return await apply_notification_state(db, token, [operation.model_dump() for operation in request.operations])
+
+@router.post("/notifications/mark-all-read")
+async def mark_all_notifications_as_read(request: MarkAllReadRequest, token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)):
+    """Moves the tenant's read watermark: one counter write regardless of how many are unread."""
+    user = await get_user_from_token(token, db)
+    tenant_id = user.get("tenantId")
+    if not tenant_id:
+        raise HTTPException(status_code=401, detail="Invalid user: No tenantId")
+    return await NotificationStateService(db).mark_all_read(tenant_id, request.up_to)
+
 @router.get("/")
 async def root():
     return {"message": "Affiliate Command Center Real-Time Mock API Server Running"}
\ No newline at end of file
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from db.database import Database, get_db
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/db")
+async def database_health():
+    """Ping latency plus connection pool usage; 503 while MongoDB is unreachable."""
+    get_db()
+    body = {"status": "ok", "pool": Database.monitor.stats()}
+    try:
+        body["pingMs"] = round(await Database.ping(), 3)
+    except Exception as e:
+        body.update(status="unavailable", error=str(e))
+        return JSONResponse(status_code=503, content=body)
+    return body
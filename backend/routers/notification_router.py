@@ -1,24 +1,23 @@
 from fastapi import APIRouter, Depends
 from services.notification_service import NotificationService
 from db.database import get_db
-from fastapi.security import OAuth2PasswordBearer
+from routers.payment_router import get_current_user_and_tenant
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 class NotificationCreate(BaseModel):
     message: str
     type: str
 
 @router.post("/")
-async def create_notification(notification: NotificationCreate, token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+async def create_notification(notification: NotificationCreate, user_info: dict = Depends(get_current_user_and_tenant), db=Depends(get_db)):
     notification_service = NotificationService(db)
-    user_id = "user_id_from_token"  # Placeholder
-    return await notification_service.create_notification(user_id, notification.message, notification.type)
+    return await notification_service.create_notification(
+        user_info["user_id"], notification.message, notification.type, tenant_id=user_info["tenant_id"]
+    )
 
 @router.get("/")
-async def get_notifications(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+async def get_notifications(user_info: dict = Depends(get_current_user_and_tenant), db=Depends(get_db)):
     notification_service = NotificationService(db)
-    user_id = "user_id_from_token"  # Placeholder
-    return await notification_service.get_notifications(user_id)
\ No newline at end of file
+    return await notification_service.get_notifications(user_info["user_id"])
@@ -1,22 +1,25 @@
 # routers/payment_router.py
-from datetime import datetime
 import logging
 from bson import ObjectId
 from fastapi import APIRouter, Depends, HTTPException
-import stripe
 from routers.affiliate_router import generate_notification_message, get_user_from_token
-from services.payment_service import PaymentService, PaymentMethodRequest, TwoFactorVerification
+from services.event_store import bson_datetime, create_event_store, utc_now
+from services.rollup_service import RollupService
+from services.notification_bus import notification_bus
+from services.notification_service import serialize_notification
+from services.unread_counter import UnreadCounterService
+from services.payment_service import PaymentService, PaymentMethodRequest, TwoFactorVerification, get_stripe
 from db.database import get_db
 from pymongo.database import Database 
 from pydantic import BaseModel
-from config.settings import Settings 
+from config.settings import get_settings
 from fastapi.security import OAuth2PasswordBearer 
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 # --- Initialization & Setup ---
-settings = Settings()
+settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login") 
 
 class WithdrawalRequest(BaseModel):
@@ -37,7 +40,6 @@ async def get_current_user_and_tenant(token: str = Depends(oauth2_scheme), db: D
 
 @router.get("/config")
 async def get_stripe_config():
-    settings = Settings() 
     return {"publishableKey": settings.STRIPE_PUBLISHABLE_KEY}
 
 @router.get("/")
@@ -68,7 +70,8 @@ async def request_withdrawal(
     """Processes a withdrawal request for the authenticated user."""
     user_id = user_info["user_id"]
     tenant_id = user_info["tenant_id"]
-    now = datetime.utcnow()
+    now = utc_now()
+    stripe = get_stripe()
     
     # PaymentService is instantiated but not explicitly used in the final version's core logic
     # payment_service = PaymentService(db) 
@@ -137,12 +140,13 @@ async def request_withdrawal(
             "network": network_name, 
             "amount": withdrawal.amount * -1, # Payouts must be recorded as negative
             "status": withdrawal_status,
-            "date": now.isoformat(),
+            "date": bson_datetime(now),
             "paymentMethodId": withdrawal.method, # Corrected to use withdrawal.method
         }
         
-        event_result = await db.get_collection("data").insert_one(payout_event)
-        logger.info(f"Payout event recorded in 'data' collection. Event ID: {str(event_result.inserted_id)}")
+        event_id = await create_event_store(db).insert_one(payout_event)
+        await RollupService(db).record_event(payout_event)
+        logger.info(f"Payout event recorded. Event ID: {str(event_id)}")
 
         # --- Create and Record the Notification ---
         # NOTE: Assumes 'generate_notification_message' is imported/defined.
@@ -162,10 +166,12 @@ async def request_withdrawal(
         }
         
         notification_result = await db.get_collection("notifications").insert_one(new_notification)
+        await UnreadCounterService(db).increment(tenant_id)
+        await notification_bus.publish(tenant_id, serialize_notification(new_notification))
 
         # --- Return final success response ---
         return {
-            "id": str(event_result.inserted_id),
+            "id": str(event_id),
             "notification_id": str(notification_result.inserted_id),
             "message": f"Withdrawal of ${withdrawal.amount} to {payment_method.get('name', payment_method['type'])} processed successfully. Payout event created."
         }
@@ -209,6 +215,7 @@ class TestBalanceRequest(BaseModel):
 
 @router.post("/test/add-balance")
 async def add_test_balance(request: TestBalanceRequest):
+    stripe = get_stripe()
     try:
         # Create a charge using the provided token
         charge = stripe.Charge.create(
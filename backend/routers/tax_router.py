@@ -1,15 +1,11 @@
 from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
 from fastapi.responses import FileResponse
-from pdfrw import PdfReader, PdfWriter, PdfDict, PdfName
-from pdfrw.objects.pdfstring import PdfString
 import os
 from pathlib import Path
 from typing import Dict
 import logging
 from datetime import date
-from PIL import Image
 import io
-import fitz
 
 # Suppress all pymongo logs by setting level to CRITICAL
 logging.getLogger("pymongo").setLevel(logging.CRITICAL)
@@ -19,12 +15,15 @@ logging.basicConfig(
     level=logging.DEBUG,
     format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
     handlers=[
-        logging.FileHandler("tax_router.log"),
+        logging.FileHandler("tax_router.log", delay=True),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
+# pdfrw, Pillow and PyMuPDF are imported inside the handlers that use them;
+# together they dominate the app's import time.
+
 # Initialize router
 router = APIRouter(prefix="/api/tax", tags=["tax"])
 
@@ -41,6 +40,7 @@ FORM_PATHS = {
 
 def decode_field_name(field_raw) -> str:
     """Decode AcroForm field names from UTF-16BE hex to plain string."""
+    from pdfrw.objects.pdfstring import PdfString
     try:
         if isinstance(field_raw, PdfString):
             name = field_raw.to_unicode()
@@ -61,6 +61,8 @@ def add_signature_to_pdf(input_path: Path, output_path: Path, signature_image: b
     - output_path: Path to save signed PDF
     - signature_image: signature image bytes (PNG/JPG)
     """
+    import fitz
+    from PIL import Image
     try:
         # Open input PDF
         doc = fitz.open(str(input_path))
@@ -130,6 +132,7 @@ def add_signature_to_pdf(input_path: Path, output_path: Path, signature_image: b
 
 def fill_pdf(input_path: Path, output_path: Path, data: Dict, signature_image: bytes = None):
     """Fill AcroForm fields in a PDF with provided data and optionally add signature."""
+    from pdfrw import PdfReader, PdfWriter, PdfDict, PdfName
     logger.debug(f"Attempting to fill PDF at {input_path} with data: {data}")
 
     if not input_path.exists():
@@ -229,6 +232,7 @@ async def fill_pdf_endpoint(
         signature_image = await signature.read() if signature else None
         if signature_image:
             try:
+                from PIL import Image
                 Image.open(io.BytesIO(signature_image))  # validate image
             except Exception as e:
                 logger.error(f"Invalid signature image: {e}")
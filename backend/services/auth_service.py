@@ -2,19 +2,18 @@
 from jose import jwt
 from datetime import datetime, timedelta
 from fastapi import HTTPException, status
-from passlib.context import CryptContext
-from config.settings import Settings
+from config.settings import get_settings
 from models.user import User 
 from pymongo.database import Database
+from services.password_hasher import password_hasher
 import uuid 
 
 class AuthService:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     CLIENT_ID = "Test-123"
 
     def __init__(self, db: Database):
         self.db = db
-        self.settings = Settings()
+        self.settings = get_settings()
 
     def create_access_token(self, data: dict) -> str:
         to_encode = data.copy()
@@ -36,8 +35,7 @@ class AuthService:
                 "is_new_user": False
             }
         
-        safe_password = password[:72]
-        hashed_password = self.pwd_context.hash(safe_password)
+        hashed_password = await password_hasher.hash(password)
         new_tenant_id = self.generate_tenant_id()
         
         user_data = {
@@ -59,11 +57,17 @@ class AuthService:
     async def authenticate_user(self, email: str, password: str) -> dict:
         user = await self.db.users.find_one({"email": email})
         
-        safe_password = password[:72]
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
         
-        if not user or not self.pwd_context.verify(safe_password, user["password"]):
+        valid, new_hash = await password_hasher.verify_and_update(password, user["password"])
+        if not valid:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
         
+        if new_hash:
+            # Cost factor changed since this hash was stored; upgrade it in place.
+            await self.db.users.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+        
         access_token = self.create_access_token(data={"sub": email})
         
         return {
@@ -0,0 +1,119 @@
+# services/event_archive.py
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import bson
+from bson import Binary
+from pymongo.database import Database
+
+ARCHIVE_COLLECTION = "archives_monthly"
+ARCHIVE_STATE_COLLECTION = "archive_state"
+ARCHIVE_CODEC = "zlib+bson"
+
+# Maps a raw document to the key it is summed under and the counters it adds, or None.
+TotalsOf = Callable[[Dict[str, Any]], Optional[Tuple[Dict[str, Any], Dict[str, float]]]]
+
+def encode_archive(docs: List[Dict[str, Any]]) -> Binary:
+    return Binary(zlib.compress(bson.encode({"docs": docs}), 6))
+
+def decode_archive(archive: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return bson.decode(zlib.decompress(archive["payload"]))["docs"]
+
+def archive_totals(docs: Iterable[Dict[str, Any]], totals_of: TotalsOf) -> List[Dict[str, Any]]:
+    """Sums the counters `totals_of` maps each document to, one row per key."""
+    totals: Dict[tuple, Dict[str, Any]] = {}
+    for doc in docs:
+        summary = totals_of(doc)
+        if summary is None:
+            continue
+        key, counters = summary
+        row = totals.setdefault(tuple(sorted(key.items())), dict(key))
+        for field, value in counters.items():
+            row[field] = row.get(field, 0) + value
+    return list(totals.values())
+
+def build_archive_documents(collection: str, docs: Iterable[Dict[str, Any]],
+                            month_of: Callable[[Dict[str, Any]], Optional[str]],
+                            totals_of: Optional[TotalsOf] = None) -> List[Dict[str, Any]]:
+    """Packs raw documents into one compressed archive document per (tenantId, month).
+
+    The archive `_id` is derived from the first raw `_id` it holds, so re-archiving
+    the same batch after an interrupted run hits a duplicate key instead of storing
+    the documents twice. With `totals_of`, each archive also carries the summed
+    counters of its documents under `totals`, so aggregates can be read without
+    decoding the payload.
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+    for doc in docs:
+        groups[(doc.get("tenantId"), month_of(doc) or "unknown")].append(doc)
+
+    archived_at = datetime.utcnow()
+    archives = []
+    for (tenant_id, month), group in groups.items():
+        group.sort(key=lambda doc: doc["_id"])
+        archive = {
+            "_id": f"{collection}:{tenant_id}:{month}:{group[0]['_id']}",
+            "collection": collection,
+            "tenantId": tenant_id,
+            "month": month,
+            "count": len(group),
+            "codec": ARCHIVE_CODEC,
+            "payload": encode_archive(group),
+            "archived_at": archived_at,
+        }
+        if totals_of is not None:
+            archive["totals"] = archive_totals(group, totals_of)
+        archives.append(archive)
+    return archives
+
+async def iter_archived_totals(db: Database, collection: str, tenant_id: str,
+                               totals_of: TotalsOf) -> AsyncIterator[Dict[str, Any]]:
+    """Yields the stored `totals` rows of a tenant's archives of `collection`, oldest
+    month first. Archives written without totals are decoded once and given them."""
+    archives = db.get_collection(ARCHIVE_COLLECTION)
+    cursor = archives.find(
+        {"collection": collection, "tenantId": tenant_id}, {"payload": 0}
+    ).sort([("month", 1), ("_id", 1)])
+    async for archive in cursor:
+        totals = archive.get("totals")
+        if totals is None:
+            payload = await archives.find_one({"_id": archive["_id"]}, {"payload": 1})
+            totals = archive_totals(decode_archive(payload), totals_of)
+            await archives.update_one({"_id": archive["_id"]}, {"$set": {"totals": totals}})
+        for row in totals:
+            yield row
+
+async def archived_ids(db: Database, archive_ids: Iterable[str], tenant_id: Optional[str] = None) -> Set[Any]:
+    """The raw `_id`s held by the given archive documents (of one tenant only, if given)."""
+    query: Dict[str, Any] = {"_id": {"$in": list(archive_ids)}}
+    if tenant_id is not None:
+        query["tenantId"] = tenant_id
+    ids: Set[Any] = set()
+    async for archive in db.get_collection(ARCHIVE_COLLECTION).find(query):
+        ids.update(doc["_id"] for doc in decode_archive(archive))
+    return ids
+
+async def pending_archived_ids(db: Database, collections: Iterable[str], tenant_id: str) -> Set[Any]:
+    """The tenant's raw `_id`s archived by journaled batches of `collections` that have
+    not finished. A batch deletes its raw copies before dropping its journal entry, so
+    these are the only archived documents that may still be stored raw as well."""
+    archive_ids: List[str] = []
+    async for journal in db.get_collection(ARCHIVE_STATE_COLLECTION).find(
+        {"collection": {"$in": list(collections)}, "tenant_ids": tenant_id}, {"archive_ids": 1}
+    ):
+        archive_ids += journal.get("archive_ids", [])
+    return await archived_ids(db, archive_ids, tenant_id) if archive_ids else set()
+
+async def get_archived_through(db: Database, collection: str) -> Dict[str, datetime]:
+    """{type: date} such that every raw document of that type dated at or before the
+    date has been archived (its raw copy may not be deleted yet)."""
+    state = await db.get_collection(ARCHIVE_STATE_COLLECTION).find_one({"_id": collection}) or {}
+    return state.get("archived_through", {})
+
+async def advance_archived_through(db: Database, collection: str, doc_types: Iterable[str], through: datetime) -> None:
+    doc_types = [t for t in set(doc_types) if isinstance(t, str) and t and "." not in t and not t.startswith("$")]
+    if doc_types:
+        await db.get_collection(ARCHIVE_STATE_COLLECTION).update_one(
+            {"_id": collection}, {"$max": {f"archived_through.{t}": through for t in doc_types}}, upsert=True
+        )
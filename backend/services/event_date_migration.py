@@ -0,0 +1,172 @@
+# services/event_date_migration.py
+"""Converts ISO-string event dates to BSON datetimes in place.
+
+    python -m services.event_date_migration run --batch-size 5000
+    python -m services.event_date_migration status
+    python -m services.event_date_migration reset   # forget checkpoints
+
+Walks `data` (and `data_buckets`, whose compact records hold the date under "d")
+in `_id` order, one batch at a time, rewriting string dates with a single
+unordered bulk write per batch. The last `_id` of every finished batch is
+checkpointed in `migration_state`, so an interrupted run resumes where it
+stopped; documents are only matched while they still hold a string, so
+re-running a batch is harmless. Each update is conditioned on the value (or
+bucket size) it read, so a concurrent write is never overwritten; a completed
+pass clears the checkpoint so the next run picks such documents up again.
+Dates that do not parse are left as they are and counted as skipped. Archived
+events are not rewritten; readers accept both representations there.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.database import Database
+
+from services.event_store import BUCKET_COLLECTION, EVENT_COLLECTION, FIELD_ALIASES, as_datetime, bson_datetime
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_STATE_COLLECTION = "migration_state"
+MIGRATION_NAME = "event_dates"
+BUCKET_DATE_FIELD = f"events.{FIELD_ALIASES['date']}"
+
+class EventDateMigration:
+    """Batched, resumable string -> datetime conversion of event dates."""
+
+    def __init__(self, db: Database, batch_size: int = 5000, pause: float = 0.0):
+        self.db = db
+        self.batch_size = batch_size
+        self.pause = pause
+
+    @property
+    def state(self):
+        return self.db.get_collection(MIGRATION_STATE_COLLECTION)
+
+    def _state_id(self, collection: str) -> str:
+        return f"{MIGRATION_NAME}:{collection}"
+
+    async def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the checkpoint and remaining string-dated documents per collection."""
+        status = {}
+        for collection, date_field in ((EVENT_COLLECTION, "date"), (BUCKET_COLLECTION, BUCKET_DATE_FIELD)):
+            checkpoint = await self.state.find_one({"_id": self._state_id(collection)}) or {}
+            status[collection] = {
+                "last_id": checkpoint.get("last_id"),
+                "converted": checkpoint.get("converted", 0),
+                "skipped": checkpoint.get("skipped", 0),
+                "remaining": await self.db.get_collection(collection).count_documents({date_field: {"$type": "string"}}),
+                "updated_at": checkpoint.get("updated_at"),
+                "completed_at": checkpoint.get("completed_at"),
+            }
+        return status
+
+    async def reset(self) -> None:
+        await self.state.delete_many({"_id": {"$regex": f"^{MIGRATION_NAME}:"}})
+
+    async def run(self, max_batches: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """Migrates both layouts until no string dates remain past the checkpoints
+        (or `max_batches` per collection) and returns per-collection counts for this run."""
+        return {
+            EVENT_COLLECTION: await self._run_collection(EVENT_COLLECTION, "date", self._event_updates, max_batches),
+            BUCKET_COLLECTION: await self._run_collection(BUCKET_COLLECTION, BUCKET_DATE_FIELD, self._bucket_updates, max_batches),
+        }
+
+    async def _run_collection(self, collection: str, date_field: str, build_updates, max_batches: Optional[int]) -> Dict[str, int]:
+        source = self.db.get_collection(collection)
+        checkpoint = await self.state.find_one({"_id": self._state_id(collection)}) or {}
+        last_id = checkpoint.get("last_id")
+        totals = {"batches": 0, "converted": 0, "skipped": 0}
+        finished = False
+
+        while max_batches is None or totals["batches"] < max_batches:
+            query: Dict[str, Any] = {date_field: {"$type": "string"}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            docs = await source.find(query).sort("_id", ASCENDING).limit(self.batch_size).to_list(length=self.batch_size)
+            if not docs:
+                finished = True
+                break
+
+            operations, converted, skipped = build_updates(docs)
+            if operations:
+                await source.bulk_write(operations, ordered=False)
+            last_id = docs[-1]["_id"]
+            totals["batches"] += 1
+            totals["converted"] += converted
+            totals["skipped"] += skipped
+            await self.state.update_one(
+                {"_id": self._state_id(collection)},
+                {"$set": {"last_id": last_id, "updated_at": datetime.utcnow()},
+                 "$inc": {"converted": converted, "skipped": skipped}},
+                upsert=True,
+            )
+            logger.info(f"Migrated {collection} batch up to _id {last_id}: {converted} converted, {skipped} skipped")
+            if len(docs) < self.batch_size:
+                finished = True
+                break
+            if self.pause:
+                await asyncio.sleep(self.pause)
+
+        if finished:
+            await self.state.update_one(
+                {"_id": self._state_id(collection)},
+                {"$set": {"last_id": None, "completed_at": datetime.utcnow()}},
+                upsert=True,
+            )
+        return totals
+
+    @staticmethod
+    def _event_updates(docs: List[Dict[str, Any]]):
+        operations, skipped = [], 0
+        for doc in docs:
+            date = as_datetime(doc["date"])
+            if date is None:
+                skipped += 1
+                continue
+            operations.append(UpdateOne({"_id": doc["_id"], "date": doc["date"]}, {"$set": {"date": bson_datetime(date)}}))
+        return operations, len(operations), skipped
+
+    @staticmethod
+    def _bucket_updates(buckets: List[Dict[str, Any]]):
+        date_key = FIELD_ALIASES["date"]
+        operations, converted, skipped = [], 0, 0
+        for bucket in buckets:
+            records, changed = [], 0
+            for record in bucket.get("events", []):
+                date = as_datetime(record.get(date_key)) if isinstance(record.get(date_key), str) else None
+                if date is not None:
+                    record = {**record, date_key: bson_datetime(date)}
+                    changed += 1
+                elif isinstance(record.get(date_key), str):
+                    skipped += 1
+                records.append(record)
+            if changed:
+                # A bucket that took more events since it was read no longer matches and is retried next run.
+                operations.append(UpdateOne({"_id": bucket["_id"], "count": bucket.get("count")}, {"$set": {"events": records}}))
+                converted += changed
+        return operations, converted, skipped
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert ISO-string event dates to BSON datetimes.")
+    parser.add_argument("command", choices=["run", "status", "reset"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--max-batches", type=int, default=None, help="per collection; default: until done")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    args = parser.parse_args(argv)
+
+    from db.database import get_db
+
+    logging.basicConfig(level=logging.INFO)
+    migration = EventDateMigration(get_db(), args.batch_size, args.pause)
+    if args.command == "reset":
+        asyncio.run(migration.reset())
+        return
+    result = asyncio.run(migration.run(args.max_batches) if args.command == "run" else migration.get_status())
+    for collection, counts in result.items():
+        print(f"{collection}: {counts}")
+
+if __name__ == "__main__":
+    main()
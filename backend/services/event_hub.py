@@ -0,0 +1,123 @@
+# services/event_hub.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from pymongo.database import Database
+
+logger = logging.getLogger(__name__)
+
+def put_drop_oldest(queue: asyncio.Queue, payload: Dict[str, Any]) -> bool:
+    """Enqueues `payload`, discarding the oldest entry if the queue is full.
+    Returns True if something was dropped."""
+    dropped = queue.full()
+    if dropped:
+        queue.get_nowait()
+    queue.put_nowait(payload)
+    return dropped
+
+ProduceFn = Callable[[Database, str, str, str], Awaitable[Optional[Dict[str, Any]]]]
+
+class Subscription:
+    """A socket's view of one (tenant, network) stream: a bounded queue that drops
+    the oldest payload when the client falls behind. A multiplexed socket passes
+    the same queue to all of its subscriptions."""
+
+    def __init__(self, tenant_id: str, network: str, frequency: int, queue: asyncio.Queue):
+        self.tenant_id = tenant_id
+        self.network = network
+        self.frequency = frequency
+        self.queue = queue
+        self.dropped = 0
+
+    def put(self, payload: Dict[str, Any]) -> None:
+        if put_drop_oldest(self.queue, payload):
+            self.dropped += 1
+
+class EventHub:
+    """Runs one producer task per (tenant, network) and fans each payload out to
+    every subscribed socket. The producer starts with the first subscriber and is
+    cancelled when the last one leaves."""
+
+    def __init__(self, produce: ProduceFn, queue_size: int):
+        self._produce = produce
+        self.queue_size = queue_size
+        self._subscribers: Dict[Tuple[str, str], Set[Subscription]] = {}
+        self._producers: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._wakeups: Dict[Tuple[str, str], asyncio.Event] = {}
+
+    def new_queue(self) -> asyncio.Queue:
+        return asyncio.Queue(maxsize=self.queue_size)
+
+    def subscribe(self, db: Database, tenant_id: str, network: str, user_id: str, frequency: int,
+                  queue: Optional[asyncio.Queue] = None) -> Subscription:
+        key = (tenant_id, network)
+        subscription = Subscription(tenant_id, network, frequency, queue if queue is not None else self.new_queue())
+        self._subscribers.setdefault(key, set()).add(subscription)
+        if key not in self._producers:
+            self._wakeups[key] = asyncio.Event()
+            self._producers[key] = asyncio.create_task(self._run(key, db, user_id))
+            logger.info(f"Started producer for {network} (tenantId: {tenant_id})")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        key = (subscription.tenant_id, subscription.network)
+        subscribers = self._subscribers.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[key]
+            self._wakeups.pop(key, None)
+            producer = self._producers.pop(key, None)
+            if producer:
+                producer.cancel()
+            logger.info(f"Stopped producer for {subscription.network} (tenantId: {subscription.tenant_id})")
+
+    def set_frequency(self, subscription: Subscription, frequency: int) -> None:
+        subscription.frequency = frequency
+        wakeup = self._wakeups.get((subscription.tenant_id, subscription.network))
+        if wakeup:
+            wakeup.set()
+
+    async def _wait_for_next_tick(self, key: Tuple[str, str], produced_at: float) -> bool:
+        """Sleeps until the fastest subscriber's interval has elapsed since `produced_at`,
+        re-evaluating when a subscriber changes its frequency. Returns False once the
+        stream has no subscribers left."""
+        loop = asyncio.get_running_loop()
+        wakeup = self._wakeups[key]
+        while True:
+            subscribers = self._subscribers.get(key)
+            if not subscribers:
+                return False
+            remaining = produced_at + min(s.frequency for s in subscribers) / 1000 - loop.time()
+            if remaining <= 0:
+                return True
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return True
+
+    async def _run(self, key: Tuple[str, str], db: Database, user_id: str) -> None:
+        tenant_id, network = key
+        loop = asyncio.get_running_loop()
+        while self._subscribers.get(key):
+            produced_at = loop.time()
+            try:
+                payload = await self._produce(db, tenant_id, network, user_id)
+            except Exception as e:
+                logger.error(f"Producer for {network} (tenantId: {tenant_id}) failed: {e}")
+                payload = None
+            if payload is not None:
+                for subscription in self._subscribers.get(key, ()):
+                    subscription.put(payload)
+            if not await self._wait_for_next_tick(key, produced_at):
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        subscriptions = [s for subscribers in self._subscribers.values() for s in subscribers]
+        return {
+            "producers": len(self._producers),
+            "subscriptions": len(subscriptions),
+            "dropped": sum(s.dropped for s in subscriptions),
+        }
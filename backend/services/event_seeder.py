@@ -0,0 +1,165 @@
+# services/event_seeder.py
+"""Bulk-loads synthetic historical events for load-testing forecasts and analytics.
+
+    python -m services.event_seeder --tenant <tenantId> --events 1000000 \\
+        --start 2024-01-01 --end 2025-12-31 --seed 42
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from pymongo.database import Database
+
+logger = logging.getLogger(__name__)
+
+# Same mix as generate_event: 5 impressions : 2 clicks : 1 conversion : 1 commission : 1 payout.
+EVENT_TYPES = ["impression", "click", "conversion", "commission", "payout"]
+EVENT_WEIGHTS = [5, 2, 1, 1, 1]
+PAYOUT_STATUSES = ["Completed", "Pending", "Failed"]
+
+def _probabilities(weights: Sequence[float]) -> np.ndarray:
+    cumulative = np.cumsum(np.asarray(weights, dtype=np.float64))
+    return np.diff(cumulative, prepend=0.0) / cumulative[-1]
+
+class EventSeeder:
+    """Generates events in NumPy batches from the router's entity pools with
+    precomputed weight tables and a reproducible seed."""
+
+    def __init__(self, campaigns: List[Dict[str, Any]], products: List[Dict[str, Any]], payment_method_ids: List[str],
+                 networks: Sequence[str], start: datetime, end: datetime, seed: Optional[int] = None):
+        from services.event_store import as_datetime
+
+        self.campaign_names = np.array([c["name"] for c in campaigns], dtype=object)
+        self.campaign_p = _probabilities([c["weight"] for c in campaigns])
+        self.product_names = np.array([p["name"] for p in products], dtype=object)
+        self.product_p = _probabilities([p["weight"] for p in products])
+        self.event_types = np.array(EVENT_TYPES, dtype=object)
+        self.event_p = _probabilities(EVENT_WEIGHTS)
+        self.payment_method_ids = np.array(payment_method_ids, dtype=object)
+        self.networks = np.array(list(networks), dtype=object)
+        # Dates are generated and stored as naive UTC.
+        start, end = as_datetime(start), as_datetime(end)
+        self.start_us = int(np.datetime64(start, "us").astype(np.int64))
+        self.end_us = int(np.datetime64(end, "us").astype(np.int64))
+        self.rng = np.random.default_rng(seed)
+
+    def generate_batch(self, tenant_id: str, size: int) -> List[Dict[str, Any]]:
+        rng = self.rng
+        types = rng.choice(self.event_types, size=size, p=self.event_p)
+        networks = rng.choice(self.networks, size=size)
+        campaigns = rng.choice(self.campaign_names, size=size, p=self.campaign_p)
+        products = rng.choice(self.product_names, size=size, p=self.product_p)
+        timestamps = rng.integers(self.start_us, self.end_us, size=size).astype("datetime64[us]")
+        # Millisecond precision, as Mongo stores it; tolist() yields datetime objects.
+        dates = timestamps.astype("datetime64[ms]").tolist()
+
+        commission_amounts = np.round(rng.uniform(5, 55, size=size), 2)
+        conversion_amounts = np.round(rng.uniform(10, 80, size=size), 2)
+        payout_amounts = np.round(rng.uniform(100, 500, size=size), 2) * -1
+        clicks = rng.integers(1, 101, size=size)
+        impressions = rng.integers(100, 1001, size=size)
+        order_numbers = rng.integers(0, 1000000, size=size)
+        statuses = rng.choice(np.array(PAYOUT_STATUSES, dtype=object), size=size)
+        method_ids = rng.choice(self.payment_method_ids, size=size)
+
+        events = []
+        for i in range(size):
+            chosen_type = types[i]
+            network = networks[i]
+            event = {
+                "tenantId": tenant_id,
+                "event": chosen_type,
+                "network": network,
+                "campaign": campaigns[i],
+                "product": products[i],
+                "date": dates[i],
+            }
+            if chosen_type == "commission":
+                event["amount"] = float(commission_amounts[i])
+                event["orderId"] = f"{network[:3].upper()}{order_numbers[i]}"
+            elif chosen_type == "click":
+                event["clicks"] = int(clicks[i])
+            elif chosen_type == "conversion":
+                event["commissionAmount"] = float(conversion_amounts[i])
+                event["orderId"] = f"{network[:3].upper()}{order_numbers[i]}"
+            elif chosen_type == "payout":
+                event["amount"] = float(payout_amounts[i])
+                event["status"] = statuses[i]
+                event["paymentMethodId"] = method_ids[i]
+            else:
+                event["impressions"] = int(impressions[i])
+            events.append(event)
+        return events
+
+    def batches(self, tenant_id: str, total: int, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        for offset in range(0, total, batch_size):
+            yield self.generate_batch(tenant_id, min(batch_size, total - offset))
+
+def build_seed_notification(event: Dict[str, Any], user_id: str, message: str) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "message": message,
+        "type": event["event"],
+        "network": event["network"],
+        "amount": event.get("amount"),
+        "clicks": event.get("clicks"),
+        "status": event.get("status"),
+        "paymentMethodId": event.get("paymentMethodId"),
+        "created_at": event["date"],
+        "read": True,
+        "tenantId": event["tenantId"],
+    }
+
+async def seed_tenant(db: Database, seeder: EventSeeder, tenant_id: str, user_id: str, total: int,
+                      batch_size: int = 10000, notifications: bool = True) -> Tuple[int, float]:
+    """Bulk-loads `total` events (and optionally their notifications) for a tenant,
+    then rebuilds its rollups. Returns (events written, seconds elapsed)."""
+    from routers.affiliate_router import generate_notification_message
+    from services.event_store import create_event_store
+    from services.rollup_service import RollupService
+
+    event_store = create_event_store(db)
+    started = time.perf_counter()
+    written = 0
+    for events in seeder.batches(tenant_id, total, batch_size):
+        await event_store.insert_many(events)
+        if notifications:
+            await db.get_collection("notifications").insert_many(
+                [build_seed_notification(event, user_id, generate_notification_message(event)) for event in events],
+                ordered=False,
+            )
+        written += len(events)
+        logger.info(f"Seeded {written}/{total} events for tenantId: {tenant_id}")
+    await RollupService(db).rebuild_tenant(tenant_id)
+    return written, time.perf_counter() - started
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Seed a tenant with synthetic historical affiliate events.")
+    parser.add_argument("--tenant", required=True, help="tenantId to seed")
+    parser.add_argument("--user-id", default="seed_user", help="user_id stored on generated notifications")
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True, help="ISO start date")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None, help="ISO end date (default: now, UTC)")
+    parser.add_argument("--networks", default="amazon,cj,rakuten", help="comma-separated network names")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--no-notifications", action="store_true")
+    args = parser.parse_args(argv)
+
+    from db.database import get_db
+    from routers.affiliate_router import campaigns, products, payment_method_ids
+    from services.event_store import utc_now
+
+    logging.basicConfig(level=logging.INFO)
+    seeder = EventSeeder(campaigns, products, payment_method_ids, args.networks.split(","), args.start,
+                         args.end or utc_now(), args.seed)
+    written, elapsed = asyncio.run(seed_tenant(
+        get_db(), seeder, args.tenant, args.user_id, args.events, args.batch_size, not args.no_notifications
+    ))
+    print(f"Seeded {written} events in {elapsed:.1f}s ({written / elapsed:,.0f} events/s)")
+
+if __name__ == "__main__":
+    main()
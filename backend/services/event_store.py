@@ -0,0 +1,412 @@
+# services/event_store.py
+"""Storage layouts for affiliate events.
+
+"documents" keeps one document per event in `data`. "buckets" groups events per
+(tenantId, network, hour) into `data_buckets` documents that hold pre-summed
+counters and an array of compact event records, so the repeated tenant/network
+strings and per-document overhead are paid once per bucket instead of once per
+event. Both stores expose the same reader/writer interface and return events in
+the document layout's shape, so callers do not care which one is configured
+(EVENT_STORAGE_LAYOUT).
+
+Event dates are BSON datetimes in naive UTC. Documents written before that change
+hold ISO strings until `services.event_date_migration` converts them; readers
+accept both.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+from services.pagination import decode_cursor, keyset_filter
+
+EVENT_COLLECTION = "data"
+BUCKET_COLLECTION = "data_buckets"
+# Soft cap: a bucket is closed to new writes once it holds this many events.
+BUCKET_MAX_EVENTS = 1000
+# Upserts racing to open the same bucket: one wins the unique open-bucket key and the rest retry.
+BUCKET_UPSERT_ATTEMPTS = 3
+
+REVENUE_EVENTS = ("commission", "conversion")
+# Long field names -> compact record keys used inside bucket documents.
+FIELD_ALIASES = {
+    "event": "e", "date": "d", "campaign": "c", "product": "p", "amount": "a",
+    "commissionAmount": "ca", "clicks": "k", "impressions": "i", "status": "s",
+    "paymentMethodId": "m", "orderId": "o", "rollupGeneration": "rg",
+}
+FIELD_NAMES = {alias: name for name, alias in FIELD_ALIASES.items()}
+BUCKET_KEY_FIELDS = ("tenantId", "network")
+DUPLICATE_KEY = 11000
+
+class UnwrittenEventsError(Exception):
+    """Raised by `insert_many` when part of the batch was not written. `events`
+    holds the events to retry; everything else in the batch was stored."""
+
+    def __init__(self, events: List[Dict[str, Any]], cause: BulkWriteError):
+        super().__init__(f"{len(events)} events were not written: {cause}")
+        self.events = events
+
+def failed_write_indexes(error: BulkWriteError, duplicates_written: bool = True) -> List[int]:
+    """Indexes of the operations an unordered bulk write did not apply. For inserts
+    with caller-assigned `_id`s, a duplicate key means an earlier attempt already
+    wrote the document; for upserts it is a lost race and the write has to be retried."""
+    return sorted({
+        e["index"] for e in error.details.get("writeErrors", [])
+        if not (duplicates_written and e.get("code") == DUPLICATE_KEY)
+    })
+
+def utc_now() -> datetime:
+    """The current time as naive UTC, the form every stored date is compared in."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _naive_utc(value: datetime) -> datetime:
+    # Naive values are taken to be UTC already; aware ones are converted before dropping tzinfo.
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def as_datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return _naive_utc(value)
+    if isinstance(value, str):
+        try:
+            return _naive_utc(datetime.fromisoformat(value.replace('Z', '+00:00')))
+        except ValueError:
+            return None
+    return None
+
+def bson_datetime(value: Optional[datetime] = None) -> datetime:
+    """Converts to naive UTC and truncates to the millisecond precision Mongo stores,
+    so an in-memory event matches what a read-back returns. Defaults to now."""
+    value = _naive_utc(value) if value else utc_now()
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+def serialize_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-safe copy of a stored event document."""
+    serialized = {**event}
+    # Rollup bookkeeping, not part of the event.
+    serialized.pop("rollupGeneration", None)
+    if "_id" in serialized:
+        serialized["_id"] = str(serialized["_id"])
+    if isinstance(serialized.get("date"), datetime):
+        serialized["date"] = serialized["date"].isoformat()
+    return serialized
+
+def _date_sort_key(event: Dict[str, Any]) -> tuple:
+    return (as_datetime(event.get("date")) or datetime.min, event["_id"])
+
+def _bson_date_key(date: Any, event_id: ObjectId) -> tuple:
+    """Orders (date, _id) the way Mongo sorts the document layout: missing dates
+    below ISO strings, strings below BSON dates, then by value within a type."""
+    if isinstance(date, datetime):
+        return (2, date, event_id)
+    if isinstance(date, str):
+        return (1, date, event_id)
+    return (0, "", event_id)
+
+def event_hour(event: Dict[str, Any]) -> Optional[datetime]:
+    date = as_datetime(event.get("date"))
+    return date.replace(minute=0, second=0, microsecond=0) if date else None
+
+def campaign_totals_pipeline(tenant_id: str, campaign_names: Sequence[str], since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Sums revenue, commission count and clicks per campaign without shipping full
+    event documents. `since` (a datetime) limits the events to those dated on or after it."""
+    match: Dict[str, Any] = {
+        "tenantId": tenant_id,
+        "event": {"$in": ["commission", "conversion", "click"]},
+        "campaign": {"$in": list(campaign_names)},
+    }
+    if since is not None:
+        # Mongo only compares dates with dates, so unmigrated ISO-string dates need their own branch.
+        match["$or"] = [{"date": {"$gte": since}}, {"date": {"$gte": since.isoformat()}}]
+    return [
+        {"$match": match},
+        {"$project": {"_id": 0, "campaign": 1, "event": 1, "amount": 1, "commissionAmount": 1, "clicks": 1}},
+        {"$group": {"_id": "$campaign", **_totals_accumulators()}},
+    ]
+
+def monthly_totals_pipeline(tenant_id: str, before: Optional[datetime] = None,
+                            archived_through: Optional[Dict[str, datetime]] = None,
+                            generation: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Sums revenue, commission count and clicks per (month, campaign) on the server,
+    optionally only for events dated before `before` (with `generation`: events stamped
+    with an older `rollupGeneration`, and unstamped ones dated before `before`), and
+    leaving out events of a type dated at or before its `archived_through` date (those
+    are read from the archives). Only events with BSON dates are bucketed; ISO-string
+    dates are left to the caller."""
+    date_match: Dict[str, Any] = {"$type": "date"}
+    match: Dict[str, Any] = {
+        "tenantId": tenant_id,
+        "event": {"$in": list(REVENUE_EVENTS) + ["click"]},
+        "date": date_match,
+    }
+    if generation is not None:
+        match["$or"] = [
+            {"rollupGeneration": {"$lt": generation}},
+            {"rollupGeneration": {"$exists": False}, **({"date": {"$lt": before}} if before is not None else {})},
+        ]
+    elif before is not None:
+        date_match["$lt"] = before
+    if archived_through:
+        match["$nor"] = [{"event": event_type, "date": {"$lte": through}} for event_type, through in archived_through.items()]
+    return [
+        {"$match": match},
+        {"$project": {"_id": 0, "campaign": 1, "event": 1, "date": 1, "amount": 1, "commissionAmount": 1, "clicks": 1}},
+        {"$group": {
+            "_id": {"month": {"$dateToString": {"format": "%Y-%m", "date": "$date"}}, "campaign": "$campaign"},
+            **_totals_accumulators(),
+        }},
+    ]
+
+def _totals_accumulators() -> Dict[str, Any]:
+    amount = {"$ifNull": ["$commissionAmount", {"$ifNull": ["$amount", 0]}]}
+    is_revenue = {"$and": [{"$in": ["$event", list(REVENUE_EVENTS)]}, {"$isNumber": amount}]}
+    is_click = {"$and": [{"$eq": ["$event", "click"]}, {"$isNumber": "$clicks"}]}
+    return {
+        "revenue": {"$sum": {"$cond": [is_revenue, amount, 0]}},
+        "commissions": {"$sum": {"$cond": [is_revenue, 1, 0]}},
+        "clicks": {"$sum": {"$cond": [is_click, "$clicks", 0]}},
+    }
+
+class DocumentEventStore:
+    """One document per event in `data` (the original layout)."""
+    layout = "documents"
+
+    def __init__(self, db: Database, collection: str = EVENT_COLLECTION):
+        self.db = db
+        self.collection = db.get_collection(collection)
+
+    async def insert_one(self, event: Dict[str, Any]) -> ObjectId:
+        result = await self.collection.insert_one(event)
+        return result.inserted_id
+
+    async def insert_many(self, events: List[Dict[str, Any]]) -> None:
+        if not events:
+            return
+        try:
+            await self.collection.insert_many(events, ordered=False)
+        except BulkWriteError as e:
+            failed = failed_write_indexes(e)
+            if failed:
+                raise UnwrittenEventsError([events[i] for i in failed], e) from e
+
+    async def iter_events(self, tenant_id: str, event_types: Optional[Sequence[str]] = None,
+                          string_dates: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """Yields the tenant's events oldest first; with `string_dates`, only those whose
+        date is still an unmigrated ISO string."""
+        query: Dict[str, Any] = {"tenantId": tenant_id}
+        if event_types is not None:
+            query["event"] = {"$in": list(event_types)}
+        if string_dates:
+            query["date"] = {"$type": "string"}
+        async for event in self.collection.find(query).sort("date", 1):
+            yield event
+
+    async def iter_newest(self, tenant_id: str, after: Optional[str] = None, limit: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yields the tenant's events newest first on (date, _id), starting after the keyset cursor."""
+        cursor = self.collection.find(keyset_filter({"tenantId": tenant_id}, "date", after)).sort([("date", -1), ("_id", -1)])
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        async for event in cursor:
+            yield event
+
+    def campaign_totals_pipeline(self, tenant_id: str, campaign_names: Sequence[str], since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        return campaign_totals_pipeline(tenant_id, campaign_names, since)
+
+    async def campaign_totals(self, tenant_id: str, campaign_names: Sequence[str], since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        return await self.collection.aggregate(self.campaign_totals_pipeline(tenant_id, campaign_names, since)).to_list(None)
+
+    async def monthly_totals(self, tenant_id: str, before: Optional[datetime] = None,
+                             archived_through: Optional[Dict[str, datetime]] = None,
+                             generation: Optional[int] = None) -> List[Dict[str, Any]]:
+        pipeline = monthly_totals_pipeline(tenant_id, before, archived_through, generation)
+        return await self.collection.aggregate(pipeline).to_list(None)
+
+class BucketedEventStore:
+    """Events grouped per (tenantId, network, hour) into bucket documents. Writes go
+    to the key's one `open` bucket; it is closed once full and the next write opens another."""
+    layout = "buckets"
+
+    def __init__(self, db: Database, collection: str = BUCKET_COLLECTION, max_events: int = BUCKET_MAX_EVENTS):
+        self.db = db
+        self.collection = db.get_collection(collection)
+        self.max_events = max_events
+
+    @staticmethod
+    def compact(event: Dict[str, Any]) -> Dict[str, Any]:
+        record = {"_id": event["_id"]}
+        for field, value in event.items():
+            if field != "_id" and field not in BUCKET_KEY_FIELDS and value is not None:
+                record[FIELD_ALIASES.get(field, field)] = value
+        return record
+
+    @staticmethod
+    def expand(bucket: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+        event = {"_id": record["_id"], "tenantId": bucket["tenantId"], "network": bucket["network"]}
+        for key, value in record.items():
+            if key != "_id":
+                event[FIELD_NAMES.get(key, key)] = value
+        return event
+
+    async def insert_one(self, event: Dict[str, Any]) -> ObjectId:
+        await self.insert_many([event])
+        return event["_id"]
+
+    async def insert_many(self, events: List[Dict[str, Any]]) -> None:
+        groups: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for event in events:
+            event.setdefault("_id", ObjectId())
+            groups[(event.get("tenantId"), event.get("network"), event_hour(event))].append(event)
+
+        keys, operations, op_groups = [], [], []
+        for (tenant_id, network, hour), group in groups.items():
+            inc: Dict[str, float] = {"count": len(group)}
+            for event in group:
+                inc[f"totals.{event.get('event')}"] = inc.get(f"totals.{event.get('event')}", 0) + 1
+                if event.get("event") in REVENUE_EVENTS:
+                    amount = event.get("commissionAmount", event.get("amount", 0))
+                    if isinstance(amount, (int, float)):
+                        inc["totals.revenue"] = inc.get("totals.revenue", 0) + amount
+                elif event.get("event") == "click" and isinstance(event.get("clicks"), (int, float)):
+                    inc["totals.clicks"] = inc.get("totals.clicks", 0) + event["clicks"]
+            # At most one bucket per key is open (a partial unique index), so concurrent
+            # upserts cannot each insert their own copy of a new bucket.
+            keys.append({"tenantId": tenant_id, "network": network, "hour": hour, "open": True})
+            operations.append(UpdateOne(
+                keys[-1],
+                {"$push": {"events": {"$each": [self.compact(event) for event in group]}}, "$inc": inc},
+                upsert=True,
+            ))
+            op_groups.append(group)
+
+        for attempt in range(BUCKET_UPSERT_ATTEMPTS):
+            if not operations:
+                return
+            try:
+                await self.collection.bulk_write(operations, ordered=False)
+                failed = []
+            except BulkWriteError as e:
+                failed = failed_write_indexes(e, duplicates_written=False)
+                duplicates = {w["index"] for w in e.details.get("writeErrors", []) if w.get("code") == DUPLICATE_KEY}
+                if attempt == BUCKET_UPSERT_ATTEMPTS - 1 or not set(failed) <= duplicates:
+                    raise UnwrittenEventsError([event for i in failed for event in op_groups[i]], e) from e
+            await self._close_full([key for i, key in enumerate(keys) if i not in failed])
+            # A lost race means another writer just opened the bucket; the retry appends to it.
+            keys = [keys[i] for i in failed]
+            operations = [operations[i] for i in failed]
+            op_groups = [op_groups[i] for i in failed]
+
+    async def _close_full(self, keys: List[Dict[str, Any]]) -> None:
+        """Closes the open buckets that reached `max_events`, so the next write for the key opens a new one."""
+        if keys:
+            await self.collection.update_many({"$or": keys, "count": {"$gte": self.max_events}}, {"$set": {"open": False}})
+
+    async def _hour_groups(self, query: Dict[str, Any], descending: bool) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yields the expanded events of all buckets sharing an hour, one hour at a time."""
+        direction = -1 if descending else 1
+        current_hour, events = None, []
+        # Both keys in the same direction so tenant_hour_network serves the sort either way.
+        async for bucket in self.collection.find(query).sort([("hour", direction), ("network", direction)]):
+            if bucket["hour"] != current_hour and events:
+                yield events
+                events = []
+            current_hour = bucket["hour"]
+            events.extend(self.expand(bucket, record) for record in bucket.get("events", []))
+        if events:
+            yield events
+
+    async def iter_events(self, tenant_id: str, event_types: Optional[Sequence[str]] = None,
+                          string_dates: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        wanted = set(event_types) if event_types is not None else None
+        query: Dict[str, Any] = {"tenantId": tenant_id}
+        if string_dates:
+            query[f"events.{FIELD_ALIASES['date']}"] = {"$type": "string"}
+        async for events in self._hour_groups(query, descending=False):
+            events.sort(key=_date_sort_key)
+            for event in events:
+                if wanted is not None and event.get("event") not in wanted:
+                    continue
+                if string_dates and not isinstance(event.get("date"), str):
+                    continue
+                yield event
+
+    async def iter_newest(self, tenant_id: str, after: Optional[str] = None, limit: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yields the tenant's events in the document layout's (date DESC, _id DESC)
+        order: BSON dates hour by hour, then the unmigrated string and missing dates,
+        which cannot be placed by bucket hour and are sorted together."""
+        last = _bson_date_key(*decode_cursor(after)) if after else None
+        yielded = 0
+
+        async def newest(events):
+            nonlocal yielded
+            for event in sorted(events, key=lambda event: _bson_date_key(event.get("date"), event["_id"]), reverse=True):
+                if last is not None and _bson_date_key(event.get("date"), event["_id"]) >= last:
+                    continue
+                yield event
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+
+        if last is None or isinstance(last[1], datetime):
+            query: Dict[str, Any] = {"tenantId": tenant_id}
+            if last is not None:
+                query["hour"] = {"$lte": last[1].replace(minute=0, second=0, microsecond=0)}
+            async for events in self._hour_groups(query, descending=True):
+                async for event in newest(event for event in events if isinstance(event.get("date"), datetime)):
+                    yield event
+                if limit is not None and yielded >= limit:
+                    return
+
+        date = f"events.{FIELD_ALIASES['date']}"
+        undated = [
+            self.expand(bucket, record)
+            async for bucket in self.collection.find({"tenantId": tenant_id, "$or": [{date: {"$type": "string"}}, {date: None}]})
+            for record in bucket.get("events", [])
+            if not isinstance(record.get(FIELD_ALIASES["date"]), datetime)
+        ]
+        async for event in newest(undated):
+            yield event
+
+    @staticmethod
+    def _unwound(bucket_match: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Pipeline prefix turning matching buckets back into one document per event
+        (only the fields the totals pipelines read)."""
+        return [
+            {"$match": bucket_match},
+            {"$unwind": "$events"},
+            {"$project": {
+                "_id": 0, "tenantId": 1,
+                **{name: f"$events.{alias}" for name, alias in FIELD_ALIASES.items()
+                   if name in ("event", "date", "campaign", "amount", "commissionAmount", "clicks", "rollupGeneration")},
+            }},
+        ]
+
+    def campaign_totals_pipeline(self, tenant_id: str, campaign_names: Sequence[str], since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        bucket_match: Dict[str, Any] = {"tenantId": tenant_id}
+        since_hour = event_hour({"date": since}) if since is not None else None
+        if since_hour is not None:
+            bucket_match["hour"] = {"$gte": since_hour}
+        return self._unwound(bucket_match) + campaign_totals_pipeline(tenant_id, campaign_names, since)
+
+    async def campaign_totals(self, tenant_id: str, campaign_names: Sequence[str], since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        return await self.collection.aggregate(self.campaign_totals_pipeline(tenant_id, campaign_names, since)).to_list(None)
+
+    async def monthly_totals(self, tenant_id: str, before: Optional[datetime] = None,
+                             archived_through: Optional[Dict[str, datetime]] = None,
+                             generation: Optional[int] = None) -> List[Dict[str, Any]]:
+        # Buckets the compactor has archived but not yet deleted are counted from the archives.
+        bucket_match: Dict[str, Any] = {"tenantId": tenant_id, "archived": {"$ne": True}}
+        if before is not None and generation is None:
+            bucket_match["hour"] = {"$lte": before}
+        pipeline = self._unwound(bucket_match) + monthly_totals_pipeline(tenant_id, before, archived_through, generation)
+        return await self.collection.aggregate(pipeline).to_list(None)
+
+def create_event_store(db: Database, layout: Optional[str] = None):
+    if layout is None:
+        from config.settings import get_settings
+        layout = get_settings().EVENT_STORAGE_LAYOUT
+    if layout == "buckets":
+        return BucketedEventStore(db)
+    if layout == "documents":
+        return DocumentEventStore(db)
+    raise ValueError(f"Unknown event storage layout: {layout}")
@@ -0,0 +1,121 @@
+# services/event_store_benchmark.py
+"""Compares the document and bucketed event layouts on the same synthetic history.
+
+    python -m services.event_store_benchmark --events 200000 --tenants 4 --seed 42
+
+Loads identical events into scratch collections (`bench_data` and
+`bench_data_buckets`), then reports document count, data/storage/index bytes
+from collStats, and the time to scan a tenant's history oldest first, page the
+newest 500 events and aggregate campaign totals. The scratch collections are
+dropped afterwards unless --keep is given.
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.database import Database
+
+from services.event_store import BucketedEventStore, DocumentEventStore, utc_now
+
+SCRATCH_COLLECTIONS = {"documents": "bench_data", "buckets": "bench_data_buckets"}
+
+async def _prepare(db: Database) -> None:
+    await db.get_collection(SCRATCH_COLLECTIONS["documents"]).create_indexes([
+        IndexModel([("tenantId", ASCENDING), ("event", ASCENDING), ("date", ASCENDING)]),
+        IndexModel([("tenantId", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+    ])
+    await db.get_collection(SCRATCH_COLLECTIONS["buckets"]).create_indexes([
+        IndexModel([("tenantId", ASCENDING), ("hour", ASCENDING), ("network", ASCENDING)]),
+        IndexModel([("tenantId", ASCENDING), ("network", ASCENDING), ("hour", ASCENDING)],
+                   unique=True, partialFilterExpression={"open": True}),
+    ])
+
+async def _timed(coroutine_factory, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await coroutine_factory()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+async def run_benchmark(db: Database, seeder, tenant_ids: List[str], events_per_tenant: int,
+                        campaign_names: List[str], repeats: int, keep: bool) -> Dict[str, Dict[str, Any]]:
+    stores = {
+        "documents": DocumentEventStore(db, SCRATCH_COLLECTIONS["documents"]),
+        "buckets": BucketedEventStore(db, SCRATCH_COLLECTIONS["buckets"]),
+    }
+    for name in SCRATCH_COLLECTIONS.values():
+        await db.drop_collection(name)
+    await _prepare(db)
+
+    for tenant_id in tenant_ids:
+        for events in seeder.batches(tenant_id, events_per_tenant, 10000):
+            await stores["documents"].insert_many([dict(event) for event in events])
+            await stores["buckets"].insert_many([dict(event) for event in events])
+
+    tenant_id = tenant_ids[0]
+    since = utc_now() - timedelta(days=90)
+    results: Dict[str, Dict[str, Any]] = {}
+    for layout, store in stores.items():
+        stats = await db.command("collStats", SCRATCH_COLLECTIONS[layout])
+
+        async def scan():
+            return [event async for event in store.iter_events(tenant_id)]
+
+        async def newest_page():
+            return [event async for event in store.iter_newest(tenant_id, limit=500)]
+
+        async def totals():
+            return await store.campaign_totals(tenant_id, campaign_names, since)
+
+        results[layout] = {
+            "documents": stats["count"],
+            "data MB": stats["size"] / 2**20,
+            "storage MB": stats["storageSize"] / 2**20,
+            "index MB": stats["totalIndexSize"] / 2**20,
+            "scan ms": await _timed(scan, repeats),
+            "newest 500 ms": await _timed(newest_page, repeats),
+            "campaign totals ms": await _timed(totals, repeats),
+        }
+
+    if not keep:
+        for name in SCRATCH_COLLECTIONS.values():
+            await db.drop_collection(name)
+    return results
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the document vs bucketed event storage layouts.")
+    parser.add_argument("--events", type=int, default=100000, help="total events across all tenants")
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--days", type=int, default=365, help="history length")
+    parser.add_argument("--networks", default="amazon,cj,rakuten")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=3, help="best-of-N timing")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collections")
+    args = parser.parse_args(argv)
+
+    from db.database import get_db
+    from routers.affiliate_router import campaigns, products, payment_method_ids
+    from services.event_seeder import EventSeeder
+
+    end = utc_now()
+    seeder = EventSeeder(campaigns, products, payment_method_ids, args.networks.split(","),
+                         end - timedelta(days=args.days), end, args.seed)
+    tenant_ids = [f"bench-tenant-{i}" for i in range(args.tenants)]
+    results = asyncio.run(run_benchmark(
+        get_db(), seeder, tenant_ids, args.events // args.tenants, [c["name"] for c in campaigns], args.repeats, args.keep
+    ))
+
+    metrics = list(next(iter(results.values())))
+    print(f"{'':<20}" + "".join(f"{layout:>14}" for layout in results))
+    for metric in metrics:
+        print(f"{metric:<20}" + "".join(
+            f"{row[metric]:>14,.1f}" if isinstance(row[metric], float) else f"{row[metric]:>14,}"
+            for row in results.values()
+        ))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# services/event_writer.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+from config.settings import get_settings
+from services.forecast_cache import forecast_cache
+from services.event_store import UnwrittenEventsError, create_event_store, failed_write_indexes
+from services.rollup_service import RollupService
+from services.unread_counter import UnreadCounterService
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of the pause between flush attempts while writes keep failing.
+MAX_RETRY_BACKOFF_SECONDS = 30.0
+
+class EventWriter:
+    """Write-behind buffer for generated events and their notifications.
+
+    Documents are given their `_id` by the caller before being enqueued, so the
+    outgoing payload can be built without reading them back. Buffers from every
+    socket are flushed together with `insert_many(ordered=False)` once `max_batch`
+    documents are pending or every `flush_interval` seconds.
+
+    Events and notifications are written independently. Whatever a flush could
+    not write goes back to the front of its buffer and is retried after an
+    exponential backoff capped at MAX_RETRY_BACKOFF_SECONDS; since `_id`s are
+    assigned up front, a retried insert that already landed is not duplicated.
+    Each buffer holds at most `max_pending` documents, so an outage cannot grow
+    it without bound: past the cap the oldest are dropped, with a warning.
+    When a derived counter (rollups, unread badge) cannot be updated for written
+    documents, the tenant is marked stale so its next read rebuilds it, and the
+    marking itself is retried on later flushes until it succeeds.
+    """
+
+    def __init__(self, max_batch: int, flush_interval: float, max_pending: int):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.written = 0
+        self.dropped = 0
+        self._db: Optional[Database] = None
+        self._events: List[Dict[str, Any]] = []
+        self._notifications: List[Dict[str, Any]] = []
+        self._stale_rollups: Set[str] = set()
+        self._stale_counters: Set[str] = set()
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._size_flush: Optional[asyncio.Task] = None
+
+    def pending(self) -> int:
+        return len(self._events) + len(self._notifications)
+
+    def enqueue(self, db: Database, event: Dict[str, Any], notification: Optional[Dict[str, Any]] = None) -> None:
+        self._db = db
+        self._events.append(event)
+        if notification is not None:
+            self._notifications.append(notification)
+        self._drop_overflow()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if (self.pending() >= self.max_batch and time.monotonic() >= self._retry_at
+                and (self._size_flush is None or self._size_flush.done())):
+            self._size_flush = asyncio.create_task(self._safe_flush())
+
+    def _drop_overflow(self) -> None:
+        dropped_events = max(0, len(self._events) - self.max_pending)
+        dropped_notifications = max(0, len(self._notifications) - self.max_pending)
+        if not dropped_events and not dropped_notifications:
+            return
+        # Oldest first: they are the ones that have already failed the most attempts.
+        del self._events[:dropped_events]
+        del self._notifications[:dropped_notifications]
+        self.dropped += dropped_events + dropped_notifications
+        logger.warning(
+            f"Write-behind buffer full ({self.max_pending}), dropped the oldest {dropped_events} events "
+            f"and {dropped_notifications} notifications"
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.flush_interval, self._retry_at - time.monotonic()))
+            await self._safe_flush()
+
+    async def _safe_flush(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Event write-behind flush failed: {str(e)}")
+
+    async def flush(self) -> None:
+        async with self._lock:
+            events, self._events = self._events, []
+            notifications, self._notifications = self._notifications, []
+            if not events and not notifications and not self._stale_rollups and not self._stale_counters:
+                return
+            unwritten_events = await self._write_events(events) if events else []
+            unwritten_notifications = await self._write_notifications(notifications) if notifications else []
+            await self._mark_stale()
+
+            # Anything not written goes back ahead of what was enqueued meanwhile.
+            self._events[:0] = unwritten_events
+            self._notifications[:0] = unwritten_notifications
+            self._drop_overflow()
+            self.flushes += 1
+            self.written += len(events) - len(unwritten_events) + len(notifications) - len(unwritten_notifications)
+            if unwritten_events or unwritten_notifications:
+                self.failed_flushes += 1
+                self._consecutive_failures += 1
+                backoff = min(MAX_RETRY_BACKOFF_SECONDS, self.flush_interval * 2 ** self._consecutive_failures)
+                self._retry_at = time.monotonic() + backoff
+                logger.warning(
+                    f"Requeued {len(unwritten_events)} events and {len(unwritten_notifications)} notifications, "
+                    f"retrying in {backoff:.1f}s"
+                )
+            else:
+                self._consecutive_failures = 0
+                self._retry_at = 0.0
+
+    async def _write_events(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Inserts the events and updates their rollups; returns the events to retry."""
+        try:
+            await RollupService(self._db).stamp_generations(events)
+            await create_event_store(self._db).insert_many(events)
+            unwritten: List[Dict[str, Any]] = []
+        except UnwrittenEventsError as e:
+            logger.error(f"Event write-behind insert failed: {str(e)}")
+            unwritten = e.events
+        except Exception as e:
+            logger.error(f"Event write-behind insert failed: {str(e)}")
+            return events
+
+        unwritten_ids = {event["_id"] for event in unwritten}
+        written = [event for event in events if event["_id"] not in unwritten_ids]
+        if written:
+            try:
+                await RollupService(self._db).record_events(written)
+            except Exception as e:
+                logger.error(f"Rollup update failed, marking tenants for rebuild: {str(e)}")
+                self._stale_rollups.update(event.get("tenantId") for event in written if event.get("tenantId"))
+            forecast_cache.record_events(written)
+        return unwritten
+
+    async def _write_notifications(self, notifications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Inserts the notifications and counts them as unread; returns the notifications to retry."""
+        try:
+            await self._db.get_collection("notifications").insert_many(notifications, ordered=False)
+            unwritten: List[Dict[str, Any]] = []
+        except BulkWriteError as e:
+            logger.error(f"Notification write-behind insert failed: {str(e)}")
+            unwritten = [notifications[i] for i in failed_write_indexes(e)]
+        except Exception as e:
+            logger.error(f"Notification write-behind insert failed: {str(e)}")
+            return notifications
+
+        unwritten_ids = {notification["_id"] for notification in unwritten}
+        written = [notification for notification in notifications if notification["_id"] not in unwritten_ids]
+        if written:
+            try:
+                await UnreadCounterService(self._db).record_notifications(written)
+            except Exception as e:
+                logger.error(f"Unread counter update failed, marking tenants for recount: {str(e)}")
+                self._stale_counters.update(n.get("tenantId") for n in written if n.get("tenantId"))
+        return unwritten
+
+    async def _mark_stale(self) -> None:
+        for tenant_id in list(self._stale_rollups):
+            try:
+                await RollupService(self._db).mark_stale(tenant_id)
+                self._stale_rollups.discard(tenant_id)
+            except Exception as e:
+                logger.error(f"Could not mark rollups stale for tenantId {tenant_id}: {str(e)}")
+        if self._stale_counters:
+            try:
+                await UnreadCounterService(self._db).mark_stale(self._stale_counters)
+                self._stale_counters.clear()
+            except Exception as e:
+                logger.error(f"Could not mark unread counters stale: {str(e)}")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._db is not None:
+            await self.flush()
+            if self.pending():
+                logger.error(f"Shutting down with {self.pending()} unwritten events and notifications")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pendingEvents": len(self._events),
+            "pendingNotifications": len(self._notifications),
+            "flushes": self.flushes,
+            "failedFlushes": self.failed_flushes,
+            "written": self.written,
+            "dropped": self.dropped,
+            "staleRollupTenants": len(self._stale_rollups),
+        }
+
+_settings = get_settings()
+event_writer = EventWriter(
+    max_batch=_settings.EVENT_WRITE_BATCH_SIZE,
+    flush_interval=_settings.EVENT_WRITE_FLUSH_INTERVAL_MS / 1000,
+    max_pending=_settings.EVENT_WRITE_MAX_PENDING,
+)
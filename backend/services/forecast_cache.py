@@ -0,0 +1,43 @@
+# services/forecast_cache.py
+from typing import Any, Dict, Iterable, Optional
+from config.settings import get_settings
+from services.cache import TTLCache
+from services.event_store import REVENUE_EVENTS
+
+# Event types a forecast is computed from: revenue history, plus clicks for the
+# campaign conversion rates. Anything else (payouts, ...) leaves it valid.
+FORECAST_EVENTS = frozenset(REVENUE_EVENTS + ("click",))
+
+class ForecastCache:
+    """Caches revenue forecasts per tenant. Entries are keyed by the tenant's data
+    version, so bumping the version on every relevant insert makes stale entries unreachable."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions: Dict[str, int] = {}
+
+    def version(self, tenant_id: str) -> int:
+        return self._versions.get(tenant_id, 0)
+
+    def bump_version(self, tenant_id: str) -> None:
+        self._versions[tenant_id] = self.version(tenant_id) + 1
+
+    def record_events(self, events: Iterable[Dict[str, Any]]) -> None:
+        """Bumps the version of every tenant with a forecast input among `events`."""
+        for tenant_id in {event.get("tenantId") for event in events if event.get("event") in FORECAST_EVENTS}:
+            self.bump_version(tenant_id)
+
+    def get(self, tenant_id: str, variant: Any = None) -> Optional[Any]:
+        return self._cache.get((tenant_id, self.version(tenant_id), variant))
+
+    def set(self, tenant_id: str, forecast: Any, variant: Any = None) -> None:
+        self._cache.set((tenant_id, self.version(tenant_id), variant), forecast)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "trackedTenants": len(self._versions)}
+
+_settings = get_settings()
+forecast_cache = ForecastCache(
+    maxsize=_settings.FORECAST_CACHE_MAX_ENTRIES,
+    ttl=_settings.FORECAST_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,195 @@
+# services/forecast_engine.py
+from datetime import datetime
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from models.forecast import RevenueForecastResponse
+from services.event_store import utc_now
+
+FORECAST_MONTHS = 6
+QUARTERS = 4
+
+SCENARIOS: List[Dict[str, Any]] = [
+    {"name": "Conservative", "description": "Based on current performance with minimal growth", "probability": 85},
+    {"name": "Optimistic", "description": "Assuming successful implementation of optimization suggestions", "probability": 65},
+    {"name": "Aggressive", "description": "With new market expansion and increased ad spend", "probability": 35},
+]
+
+def campaign_indicators(campaign_metrics: Dict[str, Dict[str, float]]) -> Tuple[List[str], List[str]]:
+    """Returns the (positive indicators, risk factors) shown alongside a forecast."""
+    sorted_campaigns = sorted(
+        campaign_metrics.items(),
+        key=lambda item: item[1]['revenue'],
+        reverse=True
+    )
+
+    positive_indicators = [
+        f"{name} contributing ${metrics['revenue']:,.0f} in revenue"
+        for name, metrics in sorted_campaigns[:3]
+    ] or ["No significant revenue drivers yet"]
+
+    risk_factors = [
+        f"Low performance in {name} ({metrics.get('conversionRate', 0):.1f}% conversion rate)"
+        for name, metrics in sorted_campaigns[-2:] if len(sorted_campaigns) > 2
+    ] or ["Insufficient data to identify risks"]
+
+    return positive_indicators, risk_factors
+
+def finalize_campaign_metrics(campaign_metrics: Dict[str, Dict[str, float]], campaign_clicks: Dict[str, int]) -> Dict[str, Dict[str, float]]:
+    final_metrics = {}
+    for name, metrics in campaign_metrics.items():
+        clicks = campaign_clicks.get(name, 0)
+        commissions = metrics['commissions']
+        conversion_rate = (commissions / clicks * 100) if clicks > 0 else 0
+        final_metrics[name] = {
+            "revenue": round(metrics['revenue'], 2),
+            "commissions": commissions,
+            "clicks": clicks,
+            "conversionRate": round(conversion_rate, 2)
+        }
+
+    return final_metrics
+
+def campaign_metrics_from_rollups(rollups: List[Dict[str, Any]], campaign_names: Sequence[str]) -> Dict[str, Dict[str, float]]:
+    campaign_metrics: Dict[str, Dict[str, float]] = {name: {"revenue": 0.0, "commissions": 0.0, "clicks": 0.0} for name in campaign_names}
+    campaign_clicks: Dict[str, int] = {name: 0 for name in campaign_names}
+
+    for bucket in rollups:
+        campaign_name = bucket.get("campaign")
+        if not campaign_name or campaign_name not in campaign_metrics:
+            continue
+        campaign_metrics[campaign_name]["revenue"] += bucket.get("revenue", 0)
+        campaign_metrics[campaign_name]["commissions"] += bucket.get("commissions", 0)
+        campaign_clicks[campaign_name] += bucket.get("clicks", 0)
+
+    return finalize_campaign_metrics(campaign_metrics, campaign_clicks)
+
+def rollups_since(rollups: List[Dict[str, Any]], since: datetime) -> List[Dict[str, Any]]:
+    """Keeps the buckets from the month containing `since` onwards. Rollups are monthly,
+    so a lookback window is applied at month granularity."""
+    first_month = since.strftime('%Y-%m')
+    return [bucket for bucket in rollups if bucket["month"] >= first_month]
+
+def monthly_revenue_from_rollups(rollups: List[Dict[str, Any]]) -> Dict[str, float]:
+    monthly_data: Dict[str, float] = {}
+    for bucket in sorted(rollups, key=lambda b: b["month"]):
+        if bucket.get("commissions", 0) > 0:
+            monthly_data[bucket["month"]] = monthly_data.get(bucket["month"], 0) + bucket.get("revenue", 0)
+    return monthly_data
+
+def revenue_matrix(monthly_series: Sequence[Dict[str, float]]) -> Tuple[np.ndarray, List[str]]:
+    """Stacks per-tenant {YYYY-MM: revenue} dicts into a tenants x months matrix over
+    the union of their months. Months a tenant has no revenue events in are NaN."""
+    months = sorted({month for series in monthly_series for month in series})
+    column = {month: i for i, month in enumerate(months)}
+    matrix = np.full((len(monthly_series), len(months)), np.nan)
+    for row, series in enumerate(monthly_series):
+        for month, revenue in series.items():
+            matrix[row, column[month]] = revenue
+    return matrix, months
+
+def _left_justify(matrix: np.ndarray) -> np.ndarray:
+    """Packs each row's non-NaN values to the left, preserving their order, so
+    consecutive columns hold consecutive observed months."""
+    order = np.argsort(np.isnan(matrix), axis=1, kind="stable")
+    return np.take_along_axis(matrix, order, axis=1)
+
+def _sequential_sum(matrix: np.ndarray) -> np.ndarray:
+    # cumsum accumulates left to right, matching the rounding of Python's sum();
+    # NaN cells contribute an exact +0.0.
+    if matrix.shape[1] == 0:
+        return np.zeros(matrix.shape[0])
+    return np.nancumsum(matrix, axis=1)[:, -1]
+
+def forecast_matrix(revenue: np.ndarray) -> Dict[str, np.ndarray]:
+    """Vectorized forecast for a tenants x months revenue matrix (NaN = no data).
+
+    Returns per-tenant arrays: `predicted` (tenants x 6), `confidence` (tenants),
+    `quarterly` (tenants x scenarios x 4) and `growthRate` (tenants). Results are
+    identical to the single-tenant `build_forecast` in routers/affiliate_router.
+    """
+    revenue = _left_justify(np.asarray(revenue, dtype=np.float64))
+    observed = ~np.isnan(revenue)
+    counts = observed.sum(axis=1)
+    has_data = counts > 0
+    safe_counts = np.where(has_data, counts, 1)
+
+    mean = np.where(has_data, _sequential_sum(revenue) / safe_counts, 0.0)
+
+    prev, curr = revenue[:, :-1], revenue[:, 1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        valid = observed[:, :-1] & observed[:, 1:] & (prev > 0)
+        growth = np.where(valid, ((curr - prev) / prev) * 100, np.nan)
+    growth_counts = valid.sum(axis=1)
+    growth_rate = np.where(growth_counts > 0, _sequential_sum(growth) / np.where(growth_counts > 0, growth_counts, 1), 0.0)
+
+    deviations = np.where(observed, revenue - mean[:, None], np.nan)
+    variance = np.where(has_data, _sequential_sum(deviations * deviations) / safe_counts, 0.0)
+    std_dev = np.sqrt(variance)
+    base_confidence = np.where(counts >= 3, 90, np.where(counts >= 1, 80, 70))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        confidence_adjustment = np.where(mean > 0, np.minimum(20, (std_dev / mean) * 100), 0.0)
+    confidence = np.maximum(70, np.rint(base_confidence - confidence_adjustment)).astype(np.int64)
+
+    base_revenue = np.where(mean > 0, mean, 1000.0)
+    multiplier = 1 + growth_rate / 100
+    # Rounded values stay float64 (like Python's round() before int conversion) so
+    # runaway growth rates cannot overflow int64.
+    predicted = np.empty((revenue.shape[0], FORECAST_MONTHS))
+    last_revenue = base_revenue
+    for i in range(FORECAST_MONTHS):
+        predicted[:, i] = np.rint(last_revenue * multiplier)
+        last_revenue = predicted[:, i]
+
+    scenario_growth = np.stack([np.maximum(0, growth_rate * 0.5), growth_rate * 1.0, growth_rate * 2.0], axis=1)
+    exponents = np.arange(QUARTERS, dtype=np.float64)
+    quarterly = np.rint(
+        base_revenue[:, None, None] * np.power(1 + scenario_growth[:, :, None] / 100, exponents) * 3
+    )
+
+    return {
+        "predicted": predicted,
+        "confidence": confidence,
+        "quarterly": quarterly,
+        "growthRate": growth_rate,
+    }
+
+def build_forecasts(
+    monthly_series: Sequence[Dict[str, float]],
+    campaign_metrics: Sequence[Dict[str, Dict[str, float]]],
+) -> List[RevenueForecastResponse]:
+    """Builds one RevenueForecastResponse per tenant from a single vectorized pass."""
+    matrix, _ = revenue_matrix(monthly_series)
+    result = forecast_matrix(matrix)
+
+    start_date = utc_now().replace(day=1) + relativedelta(months=1)
+    month_labels = [(start_date + relativedelta(months=i)).strftime('%B %Y') for i in range(FORECAST_MONTHS)]
+
+    responses = []
+    for row, metrics in enumerate(campaign_metrics):
+        confidence = int(result["confidence"][row])
+        forecasts = [
+            {"month": label, "predicted": int(result["predicted"][row, i]), "confidence": confidence, "actual": None}
+            for i, label in enumerate(month_labels)
+        ]
+        scenarios = []
+        for index, scenario in enumerate(SCENARIOS):
+            projections = [int(q) for q in result["quarterly"][row, index]]
+            scenarios.append({
+                "name": scenario["name"],
+                "description": scenario["description"],
+                "q1": projections[0],
+                "q2": projections[1],
+                "q3": projections[2],
+                "q4": projections[3],
+                "total": sum(projections),
+                "probability": scenario["probability"],
+            })
+        positive_indicators, risk_factors = campaign_indicators(metrics)
+        responses.append(RevenueForecastResponse(
+            forecastData=forecasts,
+            scenarios=scenarios,
+            positiveIndicators=positive_indicators,
+            riskFactors=risk_factors
+        ))
+    return responses
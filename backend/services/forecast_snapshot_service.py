@@ -0,0 +1,95 @@
+# services/forecast_snapshot_service.py
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pymongo import ReplaceOne
+from pymongo.database import Database
+from models.forecast import RevenueForecastResponse
+from services.forecast_engine import build_forecasts, campaign_metrics_from_rollups, monthly_revenue_from_rollups
+from services.rollup_service import RollupService
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_COLLECTION = "forecast_snapshots"
+
+def compute_snapshot_batch(rollups_by_tenant: Dict[str, List[Dict[str, Any]]], campaign_names: List[str]) -> List[Dict[str, Any]]:
+    """Runs in a worker process: forecasts and campaign metrics for a batch of tenants."""
+    tenant_ids = list(rollups_by_tenant)
+    monthly_series = [monthly_revenue_from_rollups(rollups_by_tenant[tenant_id]) for tenant_id in tenant_ids]
+    campaign_metrics = [campaign_metrics_from_rollups(rollups_by_tenant[tenant_id], campaign_names) for tenant_id in tenant_ids]
+    forecasts = build_forecasts(monthly_series, campaign_metrics)
+    return [
+        {"_id": tenant_id, "forecast": forecast.model_dump(exclude={"generatedAt"}), "campaignMetrics": metrics}
+        for tenant_id, forecast, metrics in zip(tenant_ids, forecasts, campaign_metrics)
+    ]
+
+class ForecastSnapshotService:
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def get_forecast(self, tenant_id: str) -> Optional[RevenueForecastResponse]:
+        snapshot = await self.db.get_collection(SNAPSHOT_COLLECTION).find_one({"_id": tenant_id})
+        if not snapshot:
+            return None
+        return RevenueForecastResponse(**snapshot["forecast"], generatedAt=snapshot["computed_at"])
+
+    async def save(self, snapshots: List[Dict[str, Any]], computed_at: datetime) -> None:
+        if not snapshots:
+            return
+        await self.db.get_collection(SNAPSHOT_COLLECTION).bulk_write([
+            ReplaceOne({"_id": snapshot["_id"]}, {**snapshot, "computed_at": computed_at}, upsert=True)
+            for snapshot in snapshots
+        ], ordered=False)
+
+class ForecastSnapshotJob:
+    """Periodically precomputes forecast snapshots for every tenant in a process pool."""
+
+    def __init__(self, db: Database, campaign_names: List[str], interval: float, batch_size: int, workers: int):
+        self.db = db
+        self.campaign_names = campaign_names
+        self.interval = interval
+        self.batch_size = batch_size
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Forecast snapshot run failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        tenant_ids = [tenant_id for tenant_id in await self.db.get_collection("users").distinct("tenantId") if tenant_id]
+        rollup_service = RollupService(self.db)
+        snapshot_service = ForecastSnapshotService(self.db)
+        loop = asyncio.get_running_loop()
+
+        for start in range(0, len(tenant_ids), self.batch_size):
+            batch = tenant_ids[start:start + self.batch_size]
+            rollups = await rollup_service.get_rollups_for_tenants(batch)
+            snapshots = await loop.run_in_executor(self._pool, compute_snapshot_batch, rollups, self.campaign_names)
+            await snapshot_service.save(snapshots, datetime.utcnow())
+
+        logger.info(f"Computed forecast snapshots for {len(tenant_ids)} tenants")
+        return len(tenant_ids)
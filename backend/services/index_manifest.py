@@ -0,0 +1,231 @@
+# services/index_manifest.py
+"""Index manifest for every hot query pattern, plus an explain() report.
+
+    python -m services.index_manifest apply     # create missing indexes
+    python -m services.index_manifest explain   # flag queries that still COLLSCAN
+
+Indexes are applied at startup when APPLY_INDEXES_ON_STARTUP is set. Creating
+an index that already exists with the same keys and options is a no-op, so
+applying the manifest is idempotent. Indexes that an earlier manifest created and
+a newer one replaced are listed in DROPPED_INDEXES and removed on apply.
+"""
+import argparse
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.database import Database
+from pymongo.errors import OperationFailure, PyMongoError
+
+from services.event_archive import ARCHIVE_COLLECTION
+from services.event_store import BUCKET_COLLECTION, create_event_store
+from services.rollup_service import ROLLUP_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+INDEX_NOT_FOUND = 27
+
+# Field order follows equality -> sort -> range, so each index also serves the
+# route's sort without an in-memory SORT stage.
+INDEX_MANIFEST: Dict[str, List[IndexModel]] = {
+    "data": [
+        # fetch_all_events, campaign metrics pipeline (date lookback), rollup rebuild
+        IndexModel([("tenantId", ASCENDING), ("event", ASCENDING), ("date", ASCENDING)], name="tenant_event_date"),
+        # /events keyset pagination, newest first
+        IndexModel([("tenantId", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="tenant_date_id"),
+        # retention compactor: expired events of one type across tenants
+        IndexModel([("event", ASCENDING), ("date", ASCENDING)], name="event_date"),
+    ],
+    BUCKET_COLLECTION: [
+        # per-tenant hour scans in either direction
+        IndexModel([("tenantId", ASCENDING), ("hour", ASCENDING), ("network", ASCENDING)], name="tenant_hour_network"),
+        # the bucket upsert key; unique among open buckets so concurrent upserts cannot fork a bucket
+        IndexModel(
+            [("tenantId", ASCENDING), ("network", ASCENDING), ("hour", ASCENDING)], name="open_bucket_key",
+            unique=True, partialFilterExpression={"open": True},
+        ),
+        # retention compactor: expired buckets across tenants, oldest hour first
+        IndexModel([("hour", ASCENDING)], name="hour"),
+    ],
+    "notifications": [
+        # /notifications keyset pagination, newest first
+        IndexModel([("tenantId", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="tenant_created_at_id"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+        # retention compactor
+        IndexModel([("type", ASCENDING), ("created_at", ASCENDING)], name="type_created_at"),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "payment_methods": [
+        # list by user_id (prefix) and the pending-PayPal lookup in 2FA verification
+        IndexModel(
+            [("user_id", ASCENDING), ("status", ASCENDING), ("type", ASCENDING), ("added_date", DESCENDING)],
+            name="user_status_type_added_date",
+        ),
+    ],
+    "payments": [
+        # payment history and the analytics created_at range
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+    ],
+    "networks": [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    ARCHIVE_COLLECTION: [
+        # rollup rebuilds read a tenant's archived events month by month
+        IndexModel([("collection", ASCENDING), ("tenantId", ASCENDING), ("month", ASCENDING)], name="collection_tenant_month"),
+    ],
+    ROLLUP_COLLECTION: [
+        # the upsert key for $inc rollups; unique so concurrent upserts cannot fork a bucket
+        IndexModel([("tenantId", ASCENDING), ("month", ASCENDING), ("campaign", ASCENDING)], name="tenant_month_campaign", unique=True),
+    ],
+}
+
+# Superseded indexes, by name; each costs a write per insert while nothing uses it.
+DROPPED_INDEXES: Dict[str, List[str]] = {
+    # replaced by tenant_created_at_id for the (created_at, _id) keyset pagination
+    "notifications": ["tenant_created_at"],
+}
+
+def _event_queries(store, tenant_id: str) -> List[Dict[str, Any]]:
+    """The event routes' queries against the configured storage layout's collection."""
+    from routers.affiliate_router import campaigns, lookback_since
+
+    collection = store.collection.name
+    metrics = store.campaign_totals_pipeline(tenant_id, [c["name"] for c in campaigns], lookback_since(90))
+    if store.layout == "buckets":
+        return [
+            {"route": "GET /events", "collection": collection,
+             "filter": {"tenantId": tenant_id}, "sort": {"hour": -1, "network": -1}},
+            {"route": "fetch_all_events", "collection": collection,
+             "filter": {"tenantId": tenant_id}, "sort": {"hour": 1, "network": 1}},
+            {"route": "GET /revenue-forecast (metrics)", "collection": collection, "pipeline": metrics},
+        ]
+    return [
+        {"route": "GET /events", "collection": collection,
+         "filter": {"tenantId": tenant_id}, "sort": {"date": -1, "_id": -1}},
+        {"route": "fetch_all_events", "collection": collection,
+         "filter": {"tenantId": tenant_id, "event": {"$in": ["commission", "conversion", "click", "payout"]}}, "sort": {"date": 1}},
+        {"route": "GET /revenue-forecast (metrics)", "collection": collection, "pipeline": metrics},
+    ]
+
+def _sample_queries(db: Database) -> List[Dict[str, Any]]:
+    """The routes' queries with placeholder values; plan selection does not depend on them."""
+    tenant_id, user_id = "explain-tenant", "explain-user"
+    return _event_queries(create_event_store(db), tenant_id) + [
+        {"route": "GET /notifications", "collection": "notifications",
+         "filter": {"tenantId": tenant_id}, "sort": {"created_at": -1, "_id": -1}},
+        {"route": "GET /notifications?type=", "collection": "notifications",
+         "filter": {"tenantId": tenant_id, "type": "commission"}, "sort": {"created_at": -1, "_id": -1}},
+        {"route": "GET /notifications (user)", "collection": "notifications",
+         "filter": {"user_id": user_id}, "sort": {"created_at": -1}},
+        {"route": "POST /auth/login", "collection": "users",
+         "filter": {"email": "explain@example.com"}},
+        {"route": "GET /payments/methods", "collection": "payment_methods",
+         "filter": {"user_id": user_id}},
+        {"route": "POST /payments/method/verify-2fa", "collection": "payment_methods",
+         "filter": {"user_id": user_id, "status": "pending", "type": "paypal"}, "sort": {"added_date": -1}},
+        {"route": "GET /payments", "collection": "payments",
+         "filter": {"user_id": user_id}},
+        {"route": "GET /networks", "collection": "networks",
+         "filter": {"user_id": user_id}},
+        {"route": "rollups by tenant", "collection": ROLLUP_COLLECTION,
+         "filter": {"tenantId": tenant_id}},
+    ]
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Collects every stage name in an explain document, skipping rejected plans."""
+    stages: List[str] = []
+    if isinstance(plan, dict):
+        for key, value in plan.items():
+            if key == "rejectedPlans":
+                continue
+            if key == "stage" and isinstance(value, str):
+                stages.append(value)
+            else:
+                stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+async def drop_superseded_indexes(db: Database) -> Dict[str, List[str]]:
+    """Drops the indexes in DROPPED_INDEXES that still exist; returns what was dropped."""
+    dropped: Dict[str, List[str]] = {}
+    for collection_name, names in DROPPED_INDEXES.items():
+        for name in names:
+            try:
+                await db.get_collection(collection_name).drop_index(name)
+                dropped.setdefault(collection_name, []).append(name)
+            except OperationFailure as e:
+                if e.code != INDEX_NOT_FOUND and "index not found" not in str(e):
+                    logger.error(f"Could not drop index {name} on {collection_name}: {e}")
+    return dropped
+
+async def apply_indexes(db: Database) -> Dict[str, List[str]]:
+    """Creates every index in the manifest, then drops superseded ones. Failures
+    (e.g. duplicate emails blocking a unique index) are logged per collection rather
+    than aborting startup; if the server is unreachable the remaining collections
+    are skipped."""
+    applied: Dict[str, List[str]] = {}
+    for collection_name, indexes in INDEX_MANIFEST.items():
+        try:
+            applied[collection_name] = await db.get_collection(collection_name).create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error(f"Could not apply indexes on {collection_name}: {e}")
+        except PyMongoError as e:
+            logger.error(f"Skipping index manifest, database unavailable: {e}")
+            break
+    else:
+        for collection_name, names in (await drop_superseded_indexes(db)).items():
+            logger.info(f"Dropped superseded indexes on {collection_name}: {', '.join(names)}")
+    logger.info(f"Applied index manifest to {len(applied)}/{len(INDEX_MANIFEST)} collections")
+    return applied
+
+async def explain_report(db: Database) -> List[Dict[str, Any]]:
+    """Runs explain() on each route's query and flags collection scans and blocking sorts.
+    Event queries are planned against the configured layout's collection (EVENT_STORAGE_LAYOUT)."""
+    report = []
+    for query in _sample_queries(db):
+        if "pipeline" in query:
+            command = {"aggregate": query["collection"], "pipeline": query["pipeline"], "cursor": {}}
+        else:
+            command = {"find": query["collection"], "filter": query["filter"]}
+            if query.get("sort"):
+                command["sort"] = query["sort"]
+        explained = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        stages = _plan_stages(explained.get("queryPlanner", explained))
+        report.append({
+            "route": query["route"],
+            "collection": query["collection"],
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+            "inMemorySort": "SORT" in stages,
+        })
+    return report
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Apply the index manifest or explain the app's hot queries.")
+    parser.add_argument("command", choices=["apply", "explain"])
+    args = parser.parse_args(argv)
+
+    from db.database import get_db
+
+    logging.basicConfig(level=logging.INFO)
+    db = get_db()
+    if args.command == "apply":
+        applied = asyncio.run(apply_indexes(db))
+        for collection_name, names in applied.items():
+            print(f"{collection_name}: {', '.join(names)}")
+        return
+
+    report = asyncio.run(explain_report(db))
+    for row in report:
+        flag = "COLLSCAN" if row["collscan"] else ("SORT" if row["inMemorySort"] else "ok")
+        print(f"{flag:>8}  {row['route']:<36} {row['collection']:<16} {' > '.join(row['stages'])}")
+    if any(row["collscan"] for row in report):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
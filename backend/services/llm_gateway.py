@@ -0,0 +1,183 @@
+# services/llm_gateway.py
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+from config.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+class LLMUnavailableError(Exception):
+    """Raised when a call is rejected by the circuit breaker or misses its deadline."""
+
+class GroqBackend:
+    name = "groq"
+
+    def __init__(self, api_key: str, model_name: str, temperature: float, timeout: float):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.temperature = temperature
+        self.timeout = timeout
+        self._llm = None
+
+    def _client(self):
+        # One client (and its HTTP connection pool) is shared by every request.
+        if self._llm is None:
+            from langchain_groq import ChatGroq
+            self._llm = ChatGroq(
+                api_key=self.api_key,
+                model_name=self.model_name,
+                temperature=self.temperature,
+                timeout=self.timeout,
+                max_retries=0,
+            )
+        return self._llm
+
+    async def complete(self, prompt: str) -> str:
+        response = await self._client().ainvoke(prompt)
+        return response.content
+
+class StubBackend:
+    """Offline backend returning canned suggestions, for load tests without network access."""
+    name = "stub"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def complete(self, prompt: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return json.dumps([
+            {"id": "stub-1", "type": "campaign", "title": "Increase Budget", "description": "Shift budget toward the highest revenue campaign.",
+             "impact": "high", "estimatedRevenue": 2500.0, "effort": "low"},
+            {"id": "stub-2", "type": "creative", "title": "Refresh Creatives", "description": "Rotate creatives on campaigns with low conversion rates.",
+             "impact": "medium", "estimatedRevenue": 1200.0, "effort": "medium"},
+            {"id": "stub-3", "type": "audience", "title": "Retarget Clickers", "description": "Retarget users who clicked but did not convert.",
+             "impact": "medium", "estimatedRevenue": 900.0, "effort": "medium"},
+        ])
+
+class LLMGateway:
+    """Process-wide entry point for LLM calls: bounds in-flight calls, applies a
+    per-call deadline and retry budget, trips a circuit breaker after repeated
+    failures and records latency metrics."""
+
+    def __init__(self, backend, max_concurrency: int, timeout: float, max_retries: int,
+                 failure_threshold: int, reset_after: float):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight = 0
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._latencies: deque = deque(maxlen=1000)
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    @property
+    def model_name(self) -> str:
+        return f"{self.backend.name}:{getattr(self.backend, 'model_name', '')}"
+
+    def _admit(self) -> bool:
+        """Raises if the circuit rejects the call; returns whether the call is the
+        half-open trial, of which only one is let through at a time."""
+        if self._opened_at is None:
+            return False
+        if not self._probing and time.monotonic() - self._opened_at >= self.reset_after:
+            self._probing = True
+            return True
+        self.rejected += 1
+        raise LLMUnavailableError("LLM circuit breaker is open")
+
+    def _record_failure(self) -> None:
+        self.failures += 1
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            logger.warning(f"LLM circuit opened after {self._consecutive_failures} consecutive failures")
+
+    async def _call(self, prompt: str) -> str:
+        async with self._semaphore:
+            self._inflight += 1
+            try:
+                return await self.backend.complete(prompt)
+            finally:
+                self._inflight -= 1
+
+    async def complete(self, prompt: str) -> str:
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            probe = self._admit()
+            self.calls += 1
+            started = time.monotonic()
+            try:
+                # The deadline covers waiting for a slot as well as the call itself.
+                content = await asyncio.wait_for(self._call(prompt), timeout=self.timeout)
+                self._latencies.append(time.monotonic() - started)
+                self._consecutive_failures = 0
+                self._opened_at = None
+                return content
+            except asyncio.TimeoutError as e:
+                self.timeouts += 1
+                last_error = e
+            except Exception as e:
+                last_error = e
+            finally:
+                if probe:
+                    self._probing = False
+            self._record_failure()
+            logger.warning(f"LLM call failed (attempt {attempt + 1}/{self.max_retries + 1}): {last_error!r}")
+            if attempt < self.max_retries:
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        if isinstance(last_error, asyncio.TimeoutError):
+            raise LLMUnavailableError(f"LLM call exceeded {self.timeout}s deadline")
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4)
+
+        return {
+            "backend": self.backend.name,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "inflight": self._inflight,
+            "circuitOpen": self._opened_at is not None,
+            "latencyP50": percentile(0.5),
+            "latencyP95": percentile(0.95),
+            "latencyP99": percentile(0.99),
+        }
+
+def create_llm_gateway(settings: Settings) -> LLMGateway:
+    if settings.LLM_BACKEND == "stub":
+        backend = StubBackend(latency=settings.LLM_STUB_LATENCY_MS / 1000)
+    else:
+        backend = GroqBackend(
+            api_key=settings.GROQ_API_KEY,
+            model_name=settings.LLM_MODEL_NAME,
+            temperature=0.7,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+        )
+    return LLMGateway(
+        backend,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+        reset_after=settings.LLM_CIRCUIT_RESET_SECONDS,
+    )
+
+llm_gateway = create_llm_gateway(get_settings())
@@ -0,0 +1,96 @@
+# services/login_benchmark.py
+"""Measures login latency and event-loop lag during a burst of concurrent logins.
+
+    python -m services.login_benchmark --logins 200 --concurrency 50 --rounds 12
+
+Runs the burst twice: once verifying inline on the event loop (the old
+behaviour) and once through PasswordHasher's thread pool, and prints p50/p99
+login latency plus the worst delay seen by a 10 ms heartbeat task, which is
+what every open WebSocket on the worker experiences.
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from services.password_hasher import PasswordHasher
+
+HEARTBEAT_INTERVAL = 0.01
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def _heartbeat(lags: List[float], stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + HEARTBEAT_INTERVAL
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected))
+
+async def run_burst(hasher: PasswordHasher, hashed: str, logins: int, concurrency: int, inline: bool) -> Dict[str, float]:
+    latencies: List[float] = []
+    lags: List[float] = []
+    rejected = 0
+    gate = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+
+    async def login() -> None:
+        nonlocal rejected
+        async with gate:
+            started = time.perf_counter()
+            try:
+                if inline:
+                    hasher.pwd_context.verify("benchmark-password", hashed)
+                    await asyncio.sleep(0)
+                else:
+                    await hasher.verify_and_update("benchmark-password", hashed)
+            except HTTPException:
+                rejected += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    heartbeat = asyncio.create_task(_heartbeat(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+
+    return {
+        "logins/s": len(latencies) / elapsed,
+        "p50 ms": _percentile(latencies, 50) * 1000,
+        "p99 ms": _percentile(latencies, 99) * 1000,
+        "max loop lag ms": max(lags, default=elapsed) * 1000,
+        "p99 loop lag ms": _percentile(lags, 99) * 1000,
+        "rejected": rejected,
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark bcrypt login latency and event-loop lag.")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="logins in flight at once")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=4, help="hashing thread pool size")
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    hasher = PasswordHasher(rounds=args.rounds, workers=args.workers, max_pending=args.max_pending)
+    hashed = hasher.pwd_context.hash("benchmark-password")
+    try:
+        for label, inline in (("inline", True), ("thread pool", False)):
+            result = asyncio.run(run_burst(hasher, hashed, args.logins, args.concurrency, inline))
+            print(f"{label:>11}: " + ", ".join(
+                f"{key} {value:,.1f}" if isinstance(value, float) else f"{key} {value}"
+                for key, value in result.items()
+            ))
+    finally:
+        hasher.close()
+
+if __name__ == "__main__":
+    main()
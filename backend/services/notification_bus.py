@@ -0,0 +1,155 @@
+# services/notification_bus.py
+import asyncio
+import logging
+import os
+import uuid
+from typing import Any, Callable, Dict, Optional, Set
+from pymongo import CursorType
+from pymongo.database import Database
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+Dispatch = Callable[[str, Dict[str, Any]], None]
+Sink = Callable[[Dict[str, Any]], None]
+
+class LocalBusBackend:
+    """Delivers published notifications to subscribers in this process only."""
+    name = "local"
+
+    def __init__(self, dispatch: Optional[Dispatch] = None):
+        self._dispatch = dispatch
+
+    async def start(self, dispatch: Dispatch) -> None:
+        self._dispatch = dispatch
+
+    async def publish(self, tenant_id: str, notification: Dict[str, Any]) -> None:
+        self._dispatch(tenant_id, notification)
+
+    async def stop(self) -> None:
+        pass
+
+class MongoBusBackend:
+    """Shared transport for multi-worker deployments: publishes into a capped
+    collection that every worker tails with a tailable-await cursor. A worker
+    delivers its own notifications locally and skips them (by `origin`) on the bus."""
+    name = "mongo"
+
+    def __init__(self, db: Database, collection: str = "notification_bus", size_bytes: int = 16 * 1024 * 1024):
+        self.db = db
+        self.collection_name = collection
+        self.size_bytes = size_bytes
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._dispatch: Optional[Dispatch] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, dispatch: Dispatch) -> None:
+        try:
+            await self.db.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass
+        self._dispatch = dispatch
+        self._task = asyncio.create_task(self._tail(dispatch))
+
+    async def publish(self, tenant_id: str, notification: Dict[str, Any]) -> None:
+        self._dispatch(tenant_id, notification)
+        await self.db.get_collection(self.collection_name).insert_one(
+            {"tenantId": tenant_id, "notification": notification, "origin": self.origin}
+        )
+
+    async def _tail(self, dispatch: Dispatch) -> None:
+        collection = self.db.get_collection(self.collection_name)
+        foreign = {"origin": {"$ne": self.origin}}
+        last = await collection.find_one(foreign, sort=[("$natural", -1)])
+        last_id = last["_id"] if last else None
+        while True:
+            cursor = None
+            try:
+                # `_id`s from different workers are not ordered by insertion, but a capped
+                # collection is: a new cursor replays it in natural order and skips up to
+                # the last message seen. If that one has been overwritten, everything left
+                # was inserted after it.
+                if last_id is not None and await collection.count_documents({"_id": last_id}) == 0:
+                    last_id = None
+                caught_up = last_id is None
+                cursor = collection.find(foreign, cursor_type=CursorType.TAILABLE_AWAIT)
+                # `async for` ends on every empty getMore while the cursor stays open, so
+                # keep iterating the same cursor until the server actually kills it.
+                while cursor.alive:
+                    async for message in cursor:
+                        if not caught_up:
+                            caught_up = message["_id"] == last_id
+                            continue
+                        last_id = message["_id"]
+                        dispatch(message["tenantId"], message["notification"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification bus tail failed: {str(e)}")
+            finally:
+                if cursor is not None:
+                    await cursor.close()
+            # A tailable cursor dies on an empty collection; retry shortly.
+            await asyncio.sleep(1)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+class NotificationBus:
+    """Per-tenant pub/sub for notifications created outside the event generator
+    (withdrawals, NotificationService). Open sockets subscribe with a sink that is
+    called for every notification published to their tenant."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Sink]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.backend = LocalBusBackend(self._dispatch)
+
+    async def use_backend(self, backend) -> None:
+        await self.backend.stop()
+        self.backend = backend
+        await backend.start(self._dispatch)
+        logger.info(f"Notification bus using {backend.name} backend")
+
+    def subscribe(self, tenant_id: str, sink: Sink) -> None:
+        self._subscribers.setdefault(tenant_id, set()).add(sink)
+
+    def unsubscribe(self, tenant_id: str, sink: Sink) -> None:
+        sinks = self._subscribers.get(tenant_id)
+        if sinks is not None:
+            sinks.discard(sink)
+            if not sinks:
+                del self._subscribers[tenant_id]
+
+    async def publish(self, tenant_id: str, notification: Dict[str, Any]) -> None:
+        self.published += 1
+        try:
+            await self.backend.publish(tenant_id, notification)
+        except Exception as e:
+            # Live push is best effort; the notification is already persisted.
+            logger.error(f"Failed to publish notification for tenantId {tenant_id}: {str(e)}")
+
+    def _dispatch(self, tenant_id: str, notification: Dict[str, Any]) -> None:
+        for sink in list(self._subscribers.get(tenant_id, ())):
+            sink(notification)
+            self.delivered += 1
+
+    async def close(self) -> None:
+        await self.backend.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "tenants": len(self._subscribers),
+            "subscribers": sum(len(sinks) for sinks in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+        }
+
+notification_bus = NotificationBus()
@@ -1,17 +1,36 @@
 from pymongo.database import Database
 from models.notification import Notification
-from typing import List, Dict
+from services.notification_bus import notification_bus
+from services.unread_counter import UnreadCounterService
+from typing import Any, List, Dict, Optional
 from datetime import datetime
 
+def serialize_notification(notification: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-safe copy of a stored notification document."""
+    serialized = {**notification}
+    if "_id" in serialized:
+        serialized["_id"] = str(serialized["_id"])
+    if "read" not in serialized:
+        serialized["read"] = False
+    if isinstance(serialized.get("created_at"), datetime):
+        serialized["created_at"] = serialized["created_at"].isoformat()
+    return serialized
+
 class NotificationService:
     def __init__(self, db: Database):
         self.db = db
 
-    async def create_notification(self, user_id: str, message: str, type: str) -> Dict:
+    async def create_notification(self, user_id: str, message: str, type: str, tenant_id: Optional[str] = None) -> Dict:
         notification = Notification(user_id=user_id, message=message, type=type, created_at=datetime.utcnow())
-        result = await self.db.notifications.insert_one(notification.dict())
+        document = notification.dict()
+        if tenant_id:
+            document.update({"tenantId": tenant_id, "read": False})
+        result = await self.db.notifications.insert_one(document)
+        if tenant_id:
+            await UnreadCounterService(self.db).increment(tenant_id)
+            await notification_bus.publish(tenant_id, serialize_notification(document))
         return {"id": str(result.inserted_id), "message": "Notification created"}
 
     async def get_notifications(self, user_id: str) -> List[Dict]:
         notifications = await self.db.notifications.find({"user_id": user_id}).sort("created_at", -1).limit(50).to_list(None)
-        return notifications
\ No newline at end of file
+        return [serialize_notification(notification) for notification in notifications]
\ No newline at end of file
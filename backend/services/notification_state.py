@@ -0,0 +1,116 @@
+# services/notification_state.py
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+from pymongo import DeleteMany, UpdateMany
+from pymongo.database import Database
+from services.unread_counter import UNREAD_COUNTER_COLLECTION, UnreadCounterService, unread_filter
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_ACTIONS = ("read", "unread", "delete")
+MAX_BULK_NOTIFICATION_IDS = 1000
+
+def _object_ids(notification_ids: List[str]) -> List[ObjectId]:
+    try:
+        return [ObjectId(notification_id) for notification_id in notification_ids]
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid notification id")
+
+class NotificationStateService:
+    """Read/unread/delete for a tenant's notifications, plus a read watermark.
+
+    Per-id changes from one request are sent as a single ordered `bulk_write`, and
+    the unread counter is adjusted by how many of the touched notifications went
+    from unread to read (or back). "Mark all read up to T" only moves the tenant's
+    watermark in its counter document; notifications created at or before T are
+    read unless marked unread afterwards (`unread_pinned`).
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.counter = UnreadCounterService(db)
+
+    async def apply(self, tenant_id: str, operations: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Applies [{"action": "read"|"unread"|"delete", "notification_ids": [...]}, ...] in order."""
+        requests = []
+        touched: List[ObjectId] = []
+        for operation in operations:
+            action = operation["action"]
+            if action not in NOTIFICATION_ACTIONS:
+                raise HTTPException(status_code=400, detail=f"Unsupported notification action: {action}")
+            ids = _object_ids(operation["notification_ids"])
+            if not ids:
+                continue
+            touched.extend(ids)
+            match = {"_id": {"$in": ids}, "tenantId": tenant_id}
+            if action == "read":
+                requests.append(UpdateMany(match, {"$set": {"read": True}, "$unset": {"unread_pinned": ""}}))
+            elif action == "unread":
+                requests.append(UpdateMany(match, {"$set": {"read": False, "unread_pinned": True}}))
+            else:
+                requests.append(DeleteMany(match))
+        if len(touched) > MAX_BULK_NOTIFICATION_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_NOTIFICATION_IDS} notification ids per request")
+        if not requests:
+            return {"modified": 0, "deleted": 0, "unread_count": await self.counter.get(tenant_id)}
+
+        state = await self.counter.get_state(tenant_id)
+        notifications = self.db.get_collection("notifications")
+        unread_touched = {"$and": [unread_filter(tenant_id, state["watermark"]), {"_id": {"$in": touched}}]}
+        unread_before = await notifications.count_documents(unread_touched)
+        result = await notifications.bulk_write(requests, ordered=True)
+        unread_after = await notifications.count_documents(unread_touched)
+        await self.counter.increment(tenant_id, unread_after - unread_before)
+
+        return {
+            "modified": result.modified_count,
+            "deleted": result.deleted_count,
+            "unread_count": max(0, state["unread"] + unread_after - unread_before),
+        }
+
+    async def mark_all_read(self, tenant_id: str, up_to: Optional[datetime] = None) -> Dict[str, Any]:
+        """Marks everything created at or before `up_to` (default: the newest notification) as read."""
+        if up_to is None:
+            newest = await self.db.get_collection("notifications").find_one(
+                {"tenantId": tenant_id}, {"created_at": 1}, sort=[("created_at", -1), ("_id", -1)]
+            )
+            if newest is None or not isinstance(newest.get("created_at"), datetime):
+                return {"watermark": None, "unread_count": await self.counter.get(tenant_id)}
+            up_to = newest["created_at"]
+        elif up_to.tzinfo is not None:
+            # Stored datetimes come back naive (UTC), so keep the watermark comparable in Python.
+            up_to = up_to.astimezone(timezone.utc).replace(tzinfo=None)
+
+        notifications = self.db.get_collection("notifications")
+        counters = self.db.get_collection(UNREAD_COUNTER_COLLECTION)
+        while True:
+            state = await self.counter.get_state(tenant_id)
+            current = state["watermark"]
+            if current is not None and current >= up_to:
+                # The watermark only moves forward.
+                return {"watermark": current.isoformat(), "unread_count": state["unread"]}
+            # What the move turns from unread to read: unread now (newer than the old
+            # watermark, or pinned) and created at or before the new one.
+            newly_read = await notifications.count_documents(
+                {"$and": [unread_filter(tenant_id, current), {"created_at": {"$lte": up_to}}]}
+            )
+            # Compare-and-set on the watermark read above, and $inc rather than $set the
+            # counter so notifications inserted meanwhile keep their increments.
+            result = await counters.update_one(
+                {"_id": tenant_id, "read_watermark": current},
+                {"$set": {"read_watermark": up_to}, "$inc": {"unread": -newly_read}},
+            )
+            if result.matched_count:
+                break
+
+        # Explicit "unread" pins older than the new watermark are superseded by it.
+        await notifications.update_many(
+            {"tenantId": tenant_id, "unread_pinned": True, "created_at": {"$lte": up_to}},
+            {"$set": {"read": True}, "$unset": {"unread_pinned": ""}},
+        )
+        logger.info(f"Moved read watermark for tenantId: {tenant_id} to {up_to.isoformat()}")
+        return {"watermark": up_to.isoformat(), "unread_count": max(0, state["unread"] - newly_read)}
@@ -0,0 +1,43 @@
+# services/pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+def encode_cursor(sort_value: Any, doc_id: Any) -> str:
+    """Encodes the (sort value, _id) pair of the last document of a page into an opaque cursor.
+    Datetimes are tagged so they decode back to datetimes and keep comparing as BSON dates."""
+    payload = {"v": sort_value, "id": str(doc_id)}
+    if isinstance(sort_value, datetime):
+        payload.update(v=sort_value.isoformat(), t="dt")
+    payload = json.dumps(payload, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        sort_value = payload["v"]
+        if payload.get("t") == "dt":
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def keyset_filter(base_filter: Dict[str, Any], sort_field: str, cursor: Optional[str]) -> Dict[str, Any]:
+    """Extends `base_filter` so that only documents strictly after `cursor` in
+    (sort_field DESC, _id DESC) order are matched."""
+    if not cursor:
+        return base_filter
+    sort_value, last_id = decode_cursor(cursor)
+    after = [
+        {sort_field: {"$lt": sort_value}},
+        {sort_field: sort_value, "_id": {"$lt": last_id}},
+    ]
+    if isinstance(sort_value, datetime):
+        # Strings sort below every date in BSON order, so legacy ISO-string values
+        # (not yet migrated to dates) come after any date cursor.
+        after.append({sort_field: {"$type": "string"}})
+    return {"$and": [base_filter, {"$or": after}]}
@@ -0,0 +1,103 @@
+# services/password_hasher.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# bcrypt only looks at the first 72 bytes of a password.
+MAX_PASSWORD_LENGTH = 72
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool so hashing never blocks the event loop.
+
+    At most ``max_pending`` hash/verify calls may be running or queued at once;
+    further calls are rejected with 503 instead of piling up behind the pool.
+    ``verify_and_update`` returns a fresh hash whenever the stored one was made
+    with a different cost factor, so changing ``rounds`` migrates users on login.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 4, max_pending: int = 64):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pwd_context = CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._rejected = 0
+        self._rehashed = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.pwd_context.hash, password[:MAX_PASSWORD_LENGTH])
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(
+            self.pwd_context.verify, password[:MAX_PASSWORD_LENGTH], hashed
+        )
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Verify ``password`` and return ``(valid, new_hash)``.
+
+        ``new_hash`` is only set when the password is valid and the stored hash
+        no longer matches the configured cost factor.
+        """
+        valid, new_hash = await self._run(
+            self.pwd_context.verify_and_update, password[:MAX_PASSWORD_LENGTH], hashed
+        )
+        if new_hash:
+            self._rehashed += 1
+        return valid, new_hash
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "maxPending": self.max_pending,
+            "pending": self._pending,
+            "rejected": self._rejected,
+            "rehashed": self._rehashed,
+        }
+
+
+_settings = get_settings()
+password_hasher = PasswordHasher(
+    rounds=_settings.BCRYPT_ROUNDS,
+    workers=_settings.PASSWORD_HASH_WORKERS,
+    max_pending=_settings.PASSWORD_HASH_MAX_PENDING,
+)
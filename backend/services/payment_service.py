@@ -4,22 +4,24 @@ from fastapi import HTTPException
 from pymongo.database import Database
 from typing import List, Dict
 from datetime import datetime
-import stripe
-import paypalrestsdk
 from pydantic import BaseModel
-from config.settings import Settings # Assumed to exist
+from config.settings import get_settings
+from services.token_cache import token_cache
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Configure Stripe and PayPal
-settings = Settings()
-stripe.api_key = settings.STRIPE_SECRET_KEY
-paypalrestsdk.configure({
-    "mode": "sandbox",
-    "client_id": settings.PAYPAL_CLIENT_ID,
-    "client_secret": settings.PAYPAL_SECRET
-})
+# The Stripe SDK is slow to import, so it is loaded and configured on first use.
+settings = get_settings()
+_stripe = None
+
+def get_stripe():
+    global _stripe
+    if _stripe is None:
+        import stripe
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        _stripe = stripe
+    return _stripe
 
 class PaymentMethodRequest(BaseModel):
     user_id: str
@@ -43,6 +45,7 @@ class PaymentService:
     async def request_withdrawal(self, user_id: str, amount: float, method: str) -> Dict:
         """Processes a withdrawal (payout or transfer) request."""
         logging.info(f"Processing withdrawal request for user_id: {user_id}, amount: ${amount}, method: {method}")
+        stripe = get_stripe()
 
         try:
             method_id = ObjectId(method)
@@ -115,6 +118,7 @@ class PaymentService:
 
     async def add_payment_method(self, request: PaymentMethodRequest, user_id: str, tenant_id: str) -> Dict:
         """Adds a payment method (either a Stripe Standard Account link or PayPal)."""
+        stripe = get_stripe()
         try:
             authenticated_user_id = user_id
             
@@ -139,6 +143,7 @@ class PaymentService:
                     {"_id": ObjectId(authenticated_user_id)},
                     {"$set": {"stripe_customer_id": customer.id}}
                 )
+                token_cache.invalidate_user(authenticated_user_id)
                 customer_id = customer.id
                 user["stripe_customer_id"] = customer_id # Update local user dict for immediate use
 
@@ -163,6 +168,7 @@ class PaymentService:
                         {"_id": ObjectId(authenticated_user_id)},
                         {"$set": {"stripe_account_id": custom_account.id}}
                     )
+                    token_cache.invalidate_user(authenticated_user_id)
                     custom_account_id = custom_account.id
                     
                 destination_id = custom_account_id
@@ -0,0 +1,347 @@
+# services/retention.py
+"""Retention policies, TTL indexes and the archival compactor.
+
+    python -m services.retention ttl       # create/update TTL indexes
+    python -m services.retention compact   # run one compaction pass
+
+Policies are configured per collection and document type via RETENTION_DAYS,
+e.g. {"data.impression": 30, "data.commission": 2555, "data.*": 365}; "*" covers
+every type without its own entry. Expired raw events are packed into compressed
+per-tenant monthly archive documents, which also store their events' rollup
+totals, before they are deleted, and the date up to which each event type is
+archived is recorded in `archive_state` so rollup
+rebuilds can skip raw copies that an interrupted run left behind. Each archive batch
+is journaled in `archive_state` first, and a later run finishes a batch whose
+worker died between archiving and deleting; expired
+notifications are deleted (and uncounted from the unread badge). Read
+notifications additionally expire through a TTL index.
+
+Event buckets (the "buckets" layout) hold every event type of an hour, so the
+"data" policies expire a whole bucket once the newest event it can hold is past the
+policy of every type in it. Its events are archived like raw events, and the bucket
+is flagged `archived` before it is deleted so rebuilds stop counting it.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from services.event_archive import (
+    ARCHIVE_COLLECTION, ARCHIVE_STATE_COLLECTION, advance_archived_through, archived_ids, build_archive_documents,
+)
+from services.event_store import BUCKET_COLLECTION, BucketedEventStore, utc_now
+from services.rollup_service import RollupService, event_month, rollup_increments
+from services.unread_counter import UnreadCounterService
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+# How each retained collection is partitioned into policies and aged.
+RETAINED_COLLECTIONS: Dict[str, Dict[str, Any]] = {
+    "data": {"type_field": "event", "date_field": "date", "archive": True, "buckets": BUCKET_COLLECTION},
+    # Follows the "data" policies; its events are archived as "data" events.
+    BUCKET_COLLECTION: {"type_field": None, "date_field": "hour", "archive": True, "archive_as": "data"},
+    "notifications": {"type_field": "type", "date_field": "created_at", "archive": False},
+}
+
+def _notification_month(notification: Dict[str, Any]) -> Optional[str]:
+    created_at = notification.get("created_at")
+    return created_at.strftime('%Y-%m') if isinstance(created_at, datetime) else None
+
+def parse_policies(retention_days: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    """Turns {"collection.type": days} into {collection: {type: days}}."""
+    policies: Dict[str, Dict[str, int]] = {}
+    for key, days in retention_days.items():
+        collection, _, doc_type = key.partition(".")
+        if collection not in RETAINED_COLLECTIONS:
+            raise ValueError(f"No retention support for collection '{collection}'")
+        if "archive_as" in RETAINED_COLLECTIONS[collection]:
+            raise ValueError(f"'{collection}' follows the '{RETAINED_COLLECTIONS[collection]['archive_as']}' policies")
+        policies.setdefault(collection, {})[doc_type or "*"] = int(days)
+    return policies
+
+def raw_retention_days(policies: Dict[str, Dict[str, int]], collection: str, doc_types: List[str]) -> Optional[int]:
+    """How many days back every document of `doc_types` is still kept raw in
+    `collection` (the shortest of their policies), or None if none of them expires."""
+    policy = policies.get(collection, {})
+    days = [policy.get(doc_type, policy.get("*")) for doc_type in doc_types]
+    days = [d for d in days if d is not None]
+    return min(days) if days else None
+
+def expired_filter(collection: str, doc_type: str, typed: List[str], cutoff: datetime) -> Dict[str, Any]:
+    """Matches documents of one policy older than `cutoff`. Event dates may be stored
+    as ISO strings or BSON dates, and Mongo only compares within a type, so both
+    representations are matched."""
+    spec = RETAINED_COLLECTIONS[collection]
+    type_field, date_field = spec["type_field"], spec["date_field"]
+    query: Dict[str, Any] = {type_field: {"$nin": typed} if doc_type == "*" else doc_type}
+    query["$or"] = [{date_field: {"$lt": cutoff}}, {date_field: {"$lt": cutoff.isoformat()}}]
+    return query
+
+def expired_buckets_filter(type_days: Dict[str, int], now: datetime) -> Optional[Dict[str, Any]]:
+    """Matches event buckets whose every event is past the policy of its type: the
+    bucket's hour is before the "*" cutoff, and no type with a longer policy has events
+    in an hour after its own cutoff. Without a "*" policy some types are kept forever,
+    so no bucket can be dropped whole and None is returned."""
+    if "*" not in type_days:
+        return None
+    hour = timedelta(hours=1)
+    # A bucket holds events up to an hour after its `hour`.
+    query: Dict[str, Any] = {"hour": {"$lt": now - timedelta(days=type_days["*"]) - hour}}
+    longer = [
+        {f"totals.{doc_type}": {"$gt": 0}, "hour": {"$gte": now - timedelta(days=days) - hour}}
+        for doc_type, days in type_days.items() if doc_type != "*" and days > type_days["*"]
+    ]
+    if longer:
+        query["$nor"] = longer
+    return query
+
+def ttl_indexes(read_notification_ttl_days: int) -> Dict[str, List[IndexModel]]:
+    return {
+        "notifications": [
+            # Read notifications no longer affect the unread badge, so the server can expire them itself.
+            IndexModel(
+                [("created_at", ASCENDING)], name="read_created_at_ttl",
+                expireAfterSeconds=read_notification_ttl_days * 86400,
+                partialFilterExpression={"read": True},
+            ),
+        ],
+    }
+
+async def apply_ttl_indexes(db: Database, read_notification_ttl_days: int) -> None:
+    """Creates the TTL indexes, or updates expireAfterSeconds in place with collMod."""
+    for collection_name, indexes in ttl_indexes(read_notification_ttl_days).items():
+        collection = db.get_collection(collection_name)
+        for index in indexes:
+            document = index.document
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure:
+                await db.command({
+                    "collMod": collection_name,
+                    "index": {"name": document["name"], "expireAfterSeconds": document["expireAfterSeconds"]},
+                })
+            logger.info(f"TTL index {document['name']} on {collection_name}: {document['expireAfterSeconds']}s")
+
+class RetentionCompactor:
+    """Periodically archives and deletes documents that are past their retention policy."""
+
+    def __init__(self, db: Database, policies: Dict[str, Dict[str, int]], interval: float,
+                 batch_size: int, max_batches_per_run: int = 100, journal_timeout: float = 600):
+        self.db = db
+        self.policies = policies
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches_per_run = max_batches_per_run
+        # A journaled batch older than this is assumed abandoned by the worker that started it.
+        self.journal_timeout = journal_timeout
+        self.archived = 0
+        self.deleted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Retention compaction failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Runs every policy until it has nothing left to expire (or hits the per-run
+        batch cap) and returns {"collection.type": documents removed}."""
+        now = now or utc_now()
+        removed: Dict[str, int] = {}
+        for collection, type_days in self.policies.items():
+            if RETAINED_COLLECTIONS[collection]["archive"]:
+                await self.recover(collection)
+            typed = [doc_type for doc_type in type_days if doc_type != "*"]
+            for doc_type, days in type_days.items():
+                query = expired_filter(collection, doc_type, typed, now - timedelta(days=days))
+                count = await self._compact(collection, query)
+                if count:
+                    removed[f"{collection}.{doc_type}"] = count
+            buckets = RETAINED_COLLECTIONS[collection].get("buckets")
+            query = expired_buckets_filter(type_days, now) if buckets else None
+            if query is not None:
+                await self.recover(buckets)
+                count = await self._compact(buckets, query)
+                if count:
+                    removed[f"{buckets}.*"] = count
+        if removed:
+            logger.info(f"Retention compaction removed {sum(removed.values())} documents: {removed}")
+        return removed
+
+    async def _compact(self, collection: str, query: Dict[str, Any]) -> int:
+        count = 0
+        for _ in range(self.max_batches_per_run):
+            batch_removed = await self._compact_batch(collection, query)
+            count += batch_removed
+            if batch_removed < self.batch_size:
+                break
+        return count
+
+    async def _compact_batch(self, collection: str, query: Dict[str, Any]) -> int:
+        source = self.db.get_collection(collection)
+        spec = RETAINED_COLLECTIONS[collection]
+        # Oldest first along the (type, date) index keeps batches deterministic.
+        date_field = spec["date_field"]
+        docs = await source.find(query).sort(date_field, ASCENDING).limit(self.batch_size).to_list(length=self.batch_size)
+        if not docs:
+            return 0
+
+        if not RETAINED_COLLECTIONS[collection]["archive"]:
+            if collection == "notifications":
+                await UnreadCounterService(self.db).forget_notifications(docs)
+            result = await source.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            self.deleted += result.deleted_count
+            return len(docs)
+
+        last_date = docs[-1].get(date_field)
+        if len(docs) == self.batch_size and isinstance(last_date, datetime):
+            # Take the rest of the documents sharing the last date, so the batch ends on a whole date.
+            docs += await source.find(
+                {"$and": [query, {date_field: last_date}], "_id": {"$nin": [doc["_id"] for doc in docs]}}
+            ).to_list(None)
+
+        archive_as = spec.get("archive_as", collection)
+        raw_docs = docs
+        if archive_as != collection:
+            # Close the buckets to writes first, so what is archived is all they will hold.
+            ids = [doc["_id"] for doc in docs]
+            await source.update_many({"_id": {"$in": ids}}, {"$set": {"open": False}})
+            docs = await source.find({"_id": {"$in": ids}}).to_list(None)
+            raw_docs = [BucketedEventStore.expand(bucket, record) for bucket in docs for record in bucket.get("events", [])]
+
+        if archive_as == "data":
+            # Rollup rebuilds read the archived events' totals instead of decoding them.
+            archives = build_archive_documents(archive_as, raw_docs, event_month, rollup_increments)
+        else:
+            archives = build_archive_documents(archive_as, raw_docs, _notification_month)
+        type_field = spec["type_field"] or "event"
+        journal = {
+            "_id": f"{collection}:batch:{archives[0]['_id'] if archives else docs[0]['_id']}",
+            "collection": collection,
+            "raw_ids": [doc["_id"] for doc in docs],
+            "archive_ids": [archive["_id"] for archive in archives],
+            "archived_count": len(raw_docs),
+            "tenant_ids": list({doc.get("tenantId") for doc in docs if doc.get("tenantId")}),
+            "doc_types": list({doc.get(type_field) for doc in raw_docs if isinstance(doc.get(type_field), str)}),
+            # ISO strings sort before dates, so a batch ending on a date has archived every
+            # expired document of its types dated up to that date. Buckets are expired by
+            # hour rather than per type, so they are flagged instead.
+            "through": last_date if isinstance(last_date, datetime) and archive_as == collection else None,
+            "started_at": utc_now(),
+        }
+        await self.journal.replace_one({"_id": journal["_id"]}, journal, upsert=True)
+        try:
+            if archives:
+                await self.db.get_collection(ARCHIVE_COLLECTION).insert_many(archives, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+            # Stored by another worker running the same batch; finish from what the archives hold.
+            await self._finish(journal, recovered=True)
+            return len(docs)
+        await self._finish(journal, recovered=False)
+        return len(docs)
+
+    @property
+    def journal(self):
+        return self.db.get_collection(ARCHIVE_STATE_COLLECTION)
+
+    async def _finish(self, journal: Dict[str, Any], recovered: bool) -> None:
+        """Deletes the raw copies of a journaled batch and drops the journal entry.
+
+        After an interruption only the raw `_id`s the batch's archives actually hold
+        (for buckets: the buckets all of whose events they hold) are deleted; the rest
+        stay raw for a later batch. Archiving and deleting are separate writes, so a
+        rollup rebuild running in between counts the batch twice; such tenants are
+        marked stale.
+        """
+        collection = journal["collection"]
+        source = self.db.get_collection(collection)
+        archive_as = RETAINED_COLLECTIONS[collection].get("archive_as", collection)
+        if not recovered:
+            done, archived_count = list(journal["raw_ids"]), journal.get("archived_count", len(journal["raw_ids"]))
+        elif archive_as != collection:
+            archived = await archived_ids(self.db, journal["archive_ids"])
+            done, archived_count = [], 0
+            async for bucket in source.find({"_id": {"$in": journal["raw_ids"]}}, {"events._id": 1}):
+                if all(record["_id"] in archived for record in bucket.get("events", [])):
+                    done.append(bucket["_id"])
+                    archived_count += len(bucket.get("events", []))
+        else:
+            done = list(await archived_ids(self.db, journal["archive_ids"]))
+            archived_count = len(done)
+
+        if archive_as != collection:
+            await source.update_many({"_id": {"$in": done}}, {"$set": {"archived": True}})
+        elif journal.get("through") is not None and set(journal["raw_ids"]) <= set(done):
+            await advance_archived_through(self.db, collection, journal["doc_types"], journal["through"])
+        result = await source.delete_many({"_id": {"$in": done}})
+        self.archived += archived_count
+        self.deleted += result.deleted_count
+        if archive_as == "data":
+            rollups = RollupService(self.db)
+            if recovered:
+                for tenant_id in journal["tenant_ids"]:
+                    await rollups.mark_stale(tenant_id)
+            else:
+                await rollups.mark_rebuilt_stale(journal["tenant_ids"], journal["started_at"])
+        await self.journal.delete_one({"_id": journal["_id"]})
+
+    async def recover(self, collection: str) -> int:
+        """Finishes batches an earlier run journaled but did not complete."""
+        cutoff = utc_now() - timedelta(seconds=self.journal_timeout)
+        journals = await self.journal.find({"collection": collection, "started_at": {"$lte": cutoff}}).to_list(None)
+        for journal in journals:
+            logger.warning(f"Finishing interrupted retention batch {journal['_id']}")
+            await self._finish(journal, recovered=True)
+        return len(journals)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"policies": self.policies, "archived": self.archived, "deleted": self.deleted}
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Apply retention TTL indexes or run one compaction pass.")
+    parser.add_argument("command", choices=["ttl", "compact"])
+    args = parser.parse_args(argv)
+
+    from config.settings import get_settings
+    from db.database import get_db
+
+    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    db = get_db()
+    if args.command == "ttl":
+        asyncio.run(apply_ttl_indexes(db, settings.NOTIFICATION_READ_TTL_DAYS))
+        return
+
+    compactor = RetentionCompactor(db, parse_policies(settings.RETENTION_DAYS), settings.RETENTION_INTERVAL_SECONDS,
+                                   settings.RETENTION_BATCH_SIZE)
+    removed = asyncio.run(compactor.run_once())
+    for policy, count in removed.items():
+        print(f"{policy}: {count}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# services/rollup_service.py
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+from services.event_archive import get_archived_through, iter_archived_totals, pending_archived_ids
+from services.event_store import BUCKET_COLLECTION, REVENUE_EVENTS, as_datetime, bson_datetime, create_event_store, utc_now
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "rollups_monthly"
+ROLLUP_STATE_COLLECTION = "rollup_state"
+ROLLUP_FIELDS = ("revenue", "commissions", "clicks")
+# How long a rebuild may hold a tenant before another process may take it over.
+REBUILD_CLAIM_SECONDS = 300
+# How long a reader waits for another process's rebuild before reading what is there.
+REBUILD_WAIT_SECONDS = 30
+
+def event_month(event: Dict[str, Any]) -> Optional[str]:
+    """Returns the YYYY-MM bucket of an event's date, or None if it has no usable date."""
+    date = event.get("date")
+    try:
+        if isinstance(date, datetime):
+            return date.strftime('%Y-%m')
+        if isinstance(date, str):
+            return datetime.fromisoformat(date.replace('Z', '+00:00')).strftime('%Y-%m')
+    except ValueError:
+        pass
+    return None
+
+def rollup_increments(event: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Dict[str, float]]]:
+    """Maps a raw event to its rollup key and the counters it adds, or None if it
+    does not contribute to revenue, commission count or clicks."""
+    month = event_month(event)
+    if month is None:
+        return None
+
+    inc: Dict[str, float] = {}
+    if event.get("event") in REVENUE_EVENTS:
+        amount = event.get("commissionAmount", event.get("amount", 0))
+        if not isinstance(amount, (int, float)):
+            return None
+        inc = {"revenue": amount, "commissions": 1}
+    elif event.get("event") == "click" and isinstance(event.get("clicks"), (int, float)):
+        inc = {"clicks": event["clicks"]}
+    else:
+        return None
+
+    key = {"tenantId": event.get("tenantId"), "month": month, "campaign": event.get("campaign")}
+    return key, inc
+
+class RollupService:
+    """Maintains per tenant x month x campaign revenue/commission/click counters
+    so forecasts can be computed without replaying the raw event history.
+
+    Each tenant's `rollup_state` document carries a rebuild `generation` and a
+    `fence` date. The write-behind writer stamps each event with its tenant's
+    generation (`rollupGeneration`) just before inserting it. A rebuild claims the
+    tenant, bumps the generation and moves the fence to now in one update, replays
+    every event stamped with an older generation (unstamped events: dated before the
+    fence) and `$set`s the result as the buckets' base counters. Writers `$inc` the
+    `live.<generation>` counters for events stamped with the current generation, so
+    increments racing a rebuild are neither overwritten nor counted twice. An event
+    stamped before a claim that is only recorded after it (its insert overlapped the
+    claim) may or may not have been replayed, so it marks the tenant stale instead and
+    the next read rebuilds it. Fencing on write order rather than event dates keeps
+    events buffered before a rebuild from invalidating it once they are flushed.
+    A bucket's value is its base (if written by the current generation) plus the
+    current generation's live counters.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    @property
+    def state(self):
+        return self.db.get_collection(ROLLUP_STATE_COLLECTION)
+
+    async def stamp_generations(self, events: List[Dict[str, Any]]) -> None:
+        """Stamps rollup events with their tenant's current generation; call right before
+        inserting them. An event keeps its first stamp, so a retried insert that already
+        landed matches what was stored."""
+        events = [event for event in events if "rollupGeneration" not in event and rollup_increments(event) is not None]
+        tenant_ids = list({event.get("tenantId") for event in events})
+        if not tenant_ids:
+            return
+        generations = {
+            state["_id"]: state.get("generation", 0)
+            async for state in self.state.find({"_id": {"$in": tenant_ids}}, {"generation": 1})
+        }
+        for event in events:
+            event["rollupGeneration"] = generations.get(event.get("tenantId"), 0)
+
+    async def record_event(self, event: Dict[str, Any]) -> None:
+        await self.record_events([event])
+
+    async def record_events(self, events: List[Dict[str, Any]]) -> None:
+        increments = [(event, rollup_increments(event)) for event in events]
+        increments = [(event, inc) for event, inc in increments if inc is not None]
+        if not increments:
+            return
+        tenant_ids = list({key["tenantId"] for _, (key, _) in increments})
+        states = {state["_id"]: state async for state in self.state.find({"_id": {"$in": tenant_ids}}, {"generation": 1, "fence": 1})}
+
+        operations, stale = [], set()
+        for event, (key, inc) in increments:
+            state = states.get(key["tenantId"], {})
+            generation = state.get("generation", 0)
+            if self._before_fence(event, generation, state.get("fence")):
+                stale.add(key["tenantId"])
+                continue
+            operations.append(UpdateOne(key, {"$inc": {f"live.{generation}.{field}": value for field, value in inc.items()}}, upsert=True))
+        if operations:
+            await self.db.get_collection(ROLLUP_COLLECTION).bulk_write(operations, ordered=False)
+        for tenant_id in stale:
+            await self.mark_stale(tenant_id, states[tenant_id].get("generation", 0))
+
+    @staticmethod
+    def _before_fence(event: Dict[str, Any], generation: int, fence: Optional[datetime]) -> bool:
+        """Whether a rebuild of `generation` fenced at `fence` replays the event."""
+        stamp = event.get("rollupGeneration")
+        if isinstance(stamp, int):
+            return stamp < generation
+        if fence is None:
+            return False
+        date = as_datetime(event.get("date"))
+        return date is None or date < fence
+
+    async def mark_stale(self, tenant_id: str, generation: Optional[int] = None) -> None:
+        """Makes the next read rebuild the tenant. With `generation`, only if no rebuild
+        has started since (a newer one already replays everything written before it)."""
+        if generation is None:
+            state = await self.state.find_one({"_id": tenant_id}, {"generation": 1})
+            if state is None:
+                return
+            generation = state.get("generation", 0)
+        # State documents from before rebuild generations have no `generation` field (generation 0).
+        await self.state.update_one({"_id": tenant_id, "generation": generation or None}, {"$set": {"stale_generation": generation}})
+
+    async def mark_rebuilt_stale(self, tenant_ids: List[str], since: datetime) -> None:
+        """Marks stale the tenants rebuilt since `since` (or being rebuilt), whose replay
+        may have raced a change to their raw or archived events."""
+        async for state in self.state.find({
+            "_id": {"$in": tenant_ids},
+            "$or": [{"built_at": {"$gte": since}}, {"claimed_until": {"$exists": True}}],
+        }, {"generation": 1}):
+            await self.mark_stale(state["_id"], state.get("generation", 0))
+
+    async def _claim(self, tenant_id: str) -> Optional[Dict[str, Any]]:
+        """Takes the tenant's rebuild lease and opens a new generation, or returns None
+        while another process holds it."""
+        now = utc_now()
+        try:
+            return await self.state.find_one_and_update(
+                {"_id": tenant_id, "$or": [{"claimed_until": None}, {"claimed_until": {"$lt": now}}]},
+                {
+                    "$inc": {"generation": 1},
+                    "$set": {"fence": bson_datetime(), "claimed_until": now + timedelta(seconds=REBUILD_CLAIM_SECONDS)},
+                    "$unset": {"built_at": ""},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return None
+
+    async def rebuild_tenant(self, tenant_id: str) -> bool:
+        """Recomputes a tenant's rollups from its raw and archived events and marks them as
+        built. Returns False without doing anything if another rebuild holds the tenant.
+        Events with BSON dates are bucketed by month on the server; the totals stored on
+        the archives and raw events whose date is still an ISO string are folded in here."""
+        state = await self._claim(tenant_id)
+        if state is None:
+            return False
+        generation, fence = state["generation"], state["fence"]
+
+        store = create_event_store(self.db)
+        # Raw events the compactor has archived but not yet deleted are counted from the archives only.
+        archived_through = await get_archived_through(self.db, store.collection.name)
+        totals: Dict[Tuple[str, Optional[str]], Dict[str, float]] = {
+            (row["_id"]["month"], row["_id"].get("campaign")): {field: row[field] for field in ROLLUP_FIELDS}
+            for row in await store.monthly_totals(tenant_id, before=fence, archived_through=archived_through, generation=generation)
+        }
+
+        def add(month: str, campaign: Optional[str], inc: Dict[str, float]) -> None:
+            bucket = totals.setdefault((month, campaign), {"revenue": 0.0, "commissions": 0, "clicks": 0})
+            for field, value in inc.items():
+                bucket[field] += value
+
+        # Archived events are past their retention window, so all of them predate the fence.
+        async for row in iter_archived_totals(self.db, "data", tenant_id, rollup_increments):
+            add(row["month"], row.get("campaign"), {field: row[field] for field in ROLLUP_FIELDS if field in row})
+        # A raw copy of an archived event is left over from a batch that has not finished.
+        archived = await pending_archived_ids(self.db, ["data", BUCKET_COLLECTION], tenant_id)
+        async for event in store.iter_events(tenant_id, list(REVENUE_EVENTS) + ["click"], string_dates=True):
+            increments = rollup_increments(event)
+            if increments is None or event["_id"] in archived or not self._before_fence(event, generation, fence):
+                continue
+            key, inc = increments
+            add(key["month"], key["campaign"], inc)
+
+        rollups = self.db.get_collection(ROLLUP_COLLECTION)
+        if totals:
+            await rollups.bulk_write([
+                UpdateOne(
+                    {"tenantId": tenant_id, "month": month, "campaign": campaign},
+                    {"$set": {**counters, "generation": generation}, "$unset": {f"live.{generation - 1}": ""}},
+                    upsert=True,
+                )
+                for (month, campaign), counters in totals.items()
+            ], ordered=False)
+        # Buckets the replay no longer produces, unless a writer has already counted into this generation.
+        await rollups.delete_many({"tenantId": tenant_id, "generation": {"$ne": generation}, f"live.{generation}": {"$exists": False}})
+        await self.state.update_one(
+            {"_id": tenant_id, "generation": generation},
+            {"$set": {"built_at": utc_now()}, "$unset": {"claimed_until": ""}},
+        )
+        logger.info(f"Rebuilt {len(totals)} rollup buckets for tenantId: {tenant_id} (generation {generation})")
+        return True
+
+    @staticmethod
+    def _needs_build(state: Optional[Dict[str, Any]]) -> bool:
+        return state is None or "built_at" not in state or state.get("stale_generation") == state.get("generation", 0)
+
+    async def _ensure_built(self, tenant_id: str) -> Dict[str, Any]:
+        """Rebuilds the tenant if needed (or waits for the process that is) and returns its state."""
+        state = await self.state.find_one({"_id": tenant_id})
+        waited = 0.0
+        while self._needs_build(state):
+            if await self.rebuild_tenant(tenant_id):
+                return await self.state.find_one({"_id": tenant_id})
+            if waited >= REBUILD_WAIT_SECONDS:
+                logger.warning(f"Rollups for tenantId: {tenant_id} are still being rebuilt elsewhere; reading them as they are")
+                break
+            await asyncio.sleep(0.1)
+            waited += 0.1
+            state = await self.state.find_one({"_id": tenant_id})
+        return state or {}
+
+    @staticmethod
+    def _bucket_value(bucket: Dict[str, Any], generation: int) -> Dict[str, Any]:
+        base = bucket if bucket.get("generation", 0) == generation else {}
+        live = (bucket.get("live") or {}).get(str(generation), {})
+        return {
+            "month": bucket["month"],
+            "campaign": bucket.get("campaign"),
+            **{field: base.get(field, 0) + live.get(field, 0) for field in ROLLUP_FIELDS},
+        }
+
+    async def get_rollups_for_tenants(self, tenant_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Batch variant of `get_rollups`, returning {tenantId: buckets}."""
+        states = {state["_id"]: state async for state in self.state.find({"_id": {"$in": tenant_ids}})}
+        for tenant_id in tenant_ids:
+            if self._needs_build(states.get(tenant_id)):
+                states[tenant_id] = await self._ensure_built(tenant_id)
+
+        rollups: Dict[str, List[Dict[str, Any]]] = {tenant_id: [] for tenant_id in tenant_ids}
+        async for bucket in self.db.get_collection(ROLLUP_COLLECTION).find({"tenantId": {"$in": tenant_ids}}, {"_id": 0}):
+            tenant_id = bucket["tenantId"]
+            rollups[tenant_id].append(self._bucket_value(bucket, states.get(tenant_id, {}).get("generation", 0)))
+        return rollups
+
+    async def get_rollups(self, tenant_id: str) -> List[Dict[str, Any]]:
+        """Returns the tenant's rollup buckets, backfilling them from history on first use."""
+        return (await self.get_rollups_for_tenants([tenant_id]))[tenant_id]
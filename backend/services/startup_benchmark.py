@@ -0,0 +1,76 @@
+# services/startup_benchmark.py
+"""Reports how long the app takes to import and which modules that time goes to.
+
+    python -m services.startup_benchmark --runs 5 --top 20
+
+Each run imports ``main`` in a fresh interpreter with ``-X importtime``. The
+output shows the median wall-clock import time and the slowest modules by
+cumulative import time, grouped by top-level package.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """Parses ``-X importtime`` output into (module, depth, self_us, cumulative_us) rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+def import_cost_by_package(rows: List[Tuple[str, int, int, int]]) -> Dict[str, int]:
+    """Sums self time per top-level package, so nested imports are counted once."""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, _, self_us, _ in rows:
+        totals[name.split(".")[0]] += self_us
+    return totals
+
+def measure(module: str) -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return elapsed, parse_importtime(result.stderr)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark app import time by module.")
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="number of packages/modules to list")
+    args = parser.parse_args(argv)
+
+    timings = []
+    rows: List[Tuple[str, int, int, int]] = []
+    for _ in range(args.runs):
+        elapsed, rows = measure(args.module)
+        timings.append(elapsed)
+
+    print(f"import {args.module}: median {statistics.median(timings) * 1000:,.0f} ms "
+          f"over {args.runs} runs (min {min(timings) * 1000:,.0f} ms, includes interpreter start)")
+
+    print(f"\nTop {args.top} packages by self import time (last run):")
+    by_package = sorted(import_cost_by_package(rows).items(), key=lambda item: item[1], reverse=True)
+    for package, total_us in by_package[:args.top]:
+        print(f"  {total_us / 1000:>8.1f} ms  {package}")
+
+    print(f"\nTop {args.top} modules by cumulative import time (last run):")
+    for name, _, _, cumulative_us in sorted(rows, key=lambda row: row[3], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+if __name__ == "__main__":
+    main()
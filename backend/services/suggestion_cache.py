@@ -0,0 +1,87 @@
+# services/suggestion_cache.py
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+from config.settings import get_settings
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class SuggestionCache:
+    """Content-addressed cache for LLM suggestions.
+
+    Entries are keyed by a hash of the prompt metrics and model name, so identical
+    inputs reuse one answer across tenants. Concurrent misses for the same key share
+    a single in-flight call. With `stale_while_revalidate`, entries older than `ttl`
+    (but younger than `ttl + stale_ttl`) are served immediately while one background
+    refresh runs.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, maxsize: int, stale_while_revalidate: bool):
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_hits = 0
+        self.coalesced = 0
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl + stale_ttl)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def key(metrics: Dict[str, Any], model_name: str) -> str:
+        payload = json.dumps({"model": model_name, "metrics": metrics}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._cache.get(key)
+        if entry is not None:
+            fetched_at, value = entry
+            if time.monotonic() - fetched_at < self.ttl:
+                return value
+            if self.stale_while_revalidate:
+                self.stale_hits += 1
+                self._refresh(key, compute)
+                return value
+        # shield() keeps a cancelled request from cancelling the call other waiters share.
+        return await asyncio.shield(self._refresh(key, compute))
+
+    def _refresh(self, key: str, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        task = asyncio.create_task(self._run(key, compute))
+        task.add_done_callback(self._log_failure)
+        self._inflight[key] = task
+        return task
+
+    async def _run(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+            self._cache.set(key, (time.monotonic(), value))
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Suggestion refresh failed: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._cache.stats(),
+            "freshTtl": self.ttl,
+            "staleHits": self.stale_hits,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+_settings = get_settings()
+suggestion_cache = SuggestionCache(
+    ttl=_settings.SUGGESTION_CACHE_TTL_SECONDS,
+    stale_ttl=_settings.SUGGESTION_CACHE_STALE_SECONDS,
+    maxsize=_settings.SUGGESTION_CACHE_MAX_ENTRIES,
+    stale_while_revalidate=_settings.SUGGESTION_STALE_WHILE_REVALIDATE,
+)
@@ -0,0 +1,71 @@
+# services/token_cache.py
+import asyncio
+import hashlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from config.settings import get_settings
+from services.cache import TTLCache
+
+CACHED_USER_FIELDS = ("_id", "email", "name", "tenantId")
+
+class TokenCache:
+    """Bounded cache of token -> user identity (`_id`, email, name, tenantId).
+
+    Entries never outlive the token's `exp` claim, concurrent misses for the same
+    token share one lookup, and `invalidate_user` drops every token of a user
+    whose document changed.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._keys_by_user: Dict[str, Set[str]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    async def get_or_load(self, token: str, expires_at: Optional[float],
+                          load: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        key = self.key(token)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, expires_at, load))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        user = await asyncio.shield(task)
+        return dict(user) if user is not None else None
+
+    async def _load(self, key: str, expires_at: Optional[float],
+                    load: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        try:
+            user = await load()
+            if user is None:
+                return None
+            entry = {field: user.get(field) for field in CACHED_USER_FIELDS}
+            ttl = self.ttl if expires_at is None else min(self.ttl, expires_at - time.time())
+            if ttl > 0:
+                self._cache.set(key, entry, ttl=ttl)
+                # Drop keys of the user's tokens that have already expired from the cache.
+                user_id = str(entry["_id"])
+                live_keys = {k for k in self._keys_by_user.get(user_id, ()) if k in self._cache}
+                self._keys_by_user[user_id] = live_keys | {key}
+            return entry
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate_user(self, user_id: str) -> None:
+        for key in self._keys_by_user.pop(str(user_id), ()):
+            self._cache.pop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "users": len(self._keys_by_user), "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+_settings = get_settings()
+token_cache = TokenCache(maxsize=_settings.TOKEN_CACHE_MAX_ENTRIES, ttl=_settings.TOKEN_CACHE_TTL_SECONDS)
@@ -0,0 +1,105 @@
+# services/unread_counter.py
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+logger = logging.getLogger(__name__)
+
+UNREAD_COUNTER_COLLECTION = "notification_counters"
+
+def unread_filter(tenant_id: str, watermark: Optional[datetime] = None) -> Dict[str, Any]:
+    """Matches the tenant's unread notifications. Anything created at or before the
+    read watermark counts as read unless it was explicitly marked unread since."""
+    query: Dict[str, Any] = {"tenantId": tenant_id, "read": {"$ne": True}}
+    if watermark is not None:
+        query["$or"] = [{"created_at": {"$gt": watermark}}, {"unread_pinned": True}]
+    return query
+
+def is_read(notification: Dict[str, Any], watermark: Optional[datetime] = None) -> bool:
+    if notification.get("read"):
+        return True
+    if watermark is None or notification.get("unread_pinned"):
+        return False
+    created_at = notification.get("created_at")
+    return isinstance(created_at, datetime) and created_at <= watermark
+
+class UnreadCounterService:
+    """Per-tenant unread notification counter, one document per tenant keyed by tenantId.
+
+    Writers `$inc` the counter when they insert unread notifications and state
+    changes adjust it by the number of documents they actually flipped, so the badge
+    is a single `_id` lookup. The same document holds the tenant's read watermark.
+    Tenants without a counter (or whose counter predates this service) are
+    backfilled with one count on first read.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    @property
+    def collection(self):
+        return self.db.get_collection(UNREAD_COUNTER_COLLECTION)
+
+    async def increment(self, tenant_id: str, amount: int = 1) -> None:
+        if tenant_id and amount:
+            await self.collection.update_one({"_id": tenant_id}, {"$inc": {"unread": amount}}, upsert=True)
+
+    async def decrement(self, tenant_id: str, amount: int = 1) -> None:
+        await self.increment(tenant_id, -amount)
+
+    async def record_notifications(self, notifications: Iterable[Dict[str, Any]]) -> None:
+        """Counts a batch of freshly inserted notifications, one `$inc` per tenant.
+        Notifications already covered by their tenant's read watermark are skipped."""
+        await self._adjust_for(notifications, 1)
+
+    async def forget_notifications(self, notifications: Iterable[Dict[str, Any]]) -> None:
+        """Uncounts a batch of notifications that are about to be deleted."""
+        await self._adjust_for(notifications, -1)
+
+    async def _adjust_for(self, notifications: Iterable[Dict[str, Any]], sign: int) -> None:
+        notifications = [n for n in notifications if n.get("tenantId") and not n.get("read")]
+        if not notifications:
+            return
+        watermarks = {
+            counter["_id"]: counter.get("read_watermark")
+            async for counter in self.collection.find(
+                {"_id": {"$in": list({n["tenantId"] for n in notifications})}}, {"read_watermark": 1}
+            )
+        }
+        per_tenant = Counter(
+            n["tenantId"] for n in notifications if not is_read(n, watermarks.get(n["tenantId"]))
+        )
+        if per_tenant:
+            await self.collection.bulk_write([
+                UpdateOne({"_id": tenant_id}, {"$inc": {"unread": sign * count}}, upsert=True)
+                for tenant_id, count in per_tenant.items()
+            ], ordered=False)
+
+    async def mark_stale(self, tenant_ids: Iterable[str]) -> None:
+        """Makes the next read recount the tenants, for when an adjustment could not be applied."""
+        tenant_ids = [tenant_id for tenant_id in set(tenant_ids) if tenant_id]
+        if tenant_ids:
+            await self.collection.update_many({"_id": {"$in": tenant_ids}}, {"$unset": {"built_at": ""}})
+
+    async def rebuild(self, tenant_id: str, watermark: Optional[datetime] = None) -> int:
+        """Recounts the tenant's unread notifications and resets the counter."""
+        unread = await self.db.get_collection("notifications").count_documents(unread_filter(tenant_id, watermark))
+        await self.collection.update_one(
+            {"_id": tenant_id}, {"$set": {"unread": unread, "built_at": datetime.utcnow()}}, upsert=True
+        )
+        logger.info(f"Rebuilt unread counter for tenantId: {tenant_id} ({unread} unread)")
+        return unread
+
+    async def get_state(self, tenant_id: str) -> Dict[str, Any]:
+        """Returns {"unread": count, "watermark": datetime or None} for the tenant."""
+        counter = await self.collection.find_one({"_id": tenant_id}) or {}
+        watermark = counter.get("read_watermark")
+        if "built_at" not in counter:
+            return {"unread": await self.rebuild(tenant_id, watermark), "watermark": watermark}
+        return {"unread": max(0, counter.get("unread", 0)), "watermark": watermark}
+
+    async def get(self, tenant_id: str) -> int:
+        return (await self.get_state(tenant_id))["unread"]
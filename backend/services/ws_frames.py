@@ -0,0 +1,147 @@
+# services/ws_frames.py
+import asyncio
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple, Union
+from fastapi import WebSocket
+
+ENCODINGS = ("json", "json-compact", "msgpack")
+DEFAULT_BATCH_INTERVAL = 1.0
+# Bounds (ms) for the client-negotiated frame batching and event frequency.
+BATCH_INTERVAL_RANGE = (0, 60000)
+FREQUENCY_RANGE = (1000, 3600000)
+
+EVENT_FIELDS = ["_id", "event", "network", "campaign", "product", "date", "amount", "commissionAmount",
+                "clicks", "impressions", "orderId", "status", "paymentMethodId"]
+NOTIFICATION_FIELDS = ["_id", "message", "created_at", "read"]
+# Notifications pushed without an event (e.g. payouts over the bus) carry the fields themselves.
+STANDALONE_NOTIFICATION_FIELDS = NOTIFICATION_FIELDS + ["type", "network", "amount", "clicks", "status", "paymentMethodId"]
+# Low-cardinality values that repeat across events and are sent once per frame.
+INTERNED_FIELDS = {"event", "network", "campaign", "product", "status", "paymentMethodId"}
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed when a client negotiates "msgpack"
+    msgpack = None
+
+def available_encodings() -> List[str]:
+    return [encoding for encoding in ENCODINGS if encoding != "msgpack" or msgpack is not None]
+
+class FrameEncoder:
+    """Encodes outgoing WebSocket payloads for a negotiated mode.
+
+    "json" sends each payload as its own JSON text frame (the original protocol).
+    "json-compact" and "msgpack" coalesce every payload produced during
+    `batch_interval` seconds into one columnar frame:
+
+        {"v": 1, "tenantId": ..., "strings": [...], "eventFields": [...],
+         "notificationFields": [...], "standaloneNotificationFields": [...],
+         "rows": [[event_values, notification_values], ...]}
+
+    where interned fields hold an index into `strings`. Notification fields that
+    duplicate the event (type, network, amount, ...) are omitted; a row without an
+    event has `null` event values and its notification values follow
+    `standaloneNotificationFields` instead.
+    """
+
+    def __init__(self, encoding: str = "json", batch_interval: float = DEFAULT_BATCH_INTERVAL):
+        self.encoding = encoding
+        self.batch_interval = batch_interval
+
+    @property
+    def batched(self) -> bool:
+        return self.encoding != "json"
+
+    def encode_batch(self, tenant_id: str, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+        strings: List[str] = []
+        index: Dict[str, int] = {}
+
+        def intern(value: Any) -> Any:
+            if not isinstance(value, str):
+                return value
+            if value not in index:
+                index[value] = len(strings)
+                strings.append(value)
+            return index[value]
+
+        rows = []
+        for payload in payloads:
+            event = payload.get("event")
+            notification = payload.get("notification") or {}
+            if event is None:
+                rows.append([None, [notification.get(f) for f in STANDALONE_NOTIFICATION_FIELDS]])
+                continue
+            rows.append([
+                [intern(event.get(f)) if f in INTERNED_FIELDS else event.get(f) for f in EVENT_FIELDS],
+                [notification.get(f) for f in NOTIFICATION_FIELDS],
+            ])
+        return {
+            "v": 1,
+            "tenantId": tenant_id,
+            "strings": strings,
+            "eventFields": EVENT_FIELDS,
+            "notificationFields": NOTIFICATION_FIELDS,
+            "standaloneNotificationFields": STANDALONE_NOTIFICATION_FIELDS,
+            "rows": rows,
+        }
+
+    def encode(self, tenant_id: str, payloads: List[Dict[str, Any]]) -> Union[str, bytes]:
+        frame = self.encode_batch(tenant_id, payloads)
+        if self.encoding == "msgpack":
+            return msgpack.packb(frame, use_bin_type=True)
+        return json.dumps(frame, separators=(",", ":"), default=str)
+
+    async def send(self, websocket: WebSocket, tenant_id: str, payloads: List[Dict[str, Any]]) -> None:
+        if not self.batched:
+            for payload in payloads:
+                await websocket.send_json(payload)
+            return
+        frame = self.encode(tenant_id, payloads)
+        if isinstance(frame, bytes):
+            await websocket.send_bytes(frame)
+        else:
+            await websocket.send_text(frame)
+
+def parse_interval_ms(client_config: Dict[str, Any], key: str, bounds: Tuple[int, int]) -> Optional[int]:
+    """Reads an integer millisecond setting from a `config` control message, or None
+    if absent. Non-numeric or out-of-range values raise ValueError."""
+    value = client_config.get(key)
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{key}' must be a number of milliseconds")
+    low, high = bounds
+    if not math.isfinite(number) or not low <= number <= high:
+        raise ValueError(f"'{key}' must be between {low} and {high} ms")
+    return int(number)
+
+def negotiate_encoder(client_config: Dict[str, Any], current: Optional[FrameEncoder] = None) -> FrameEncoder:
+    """Builds the encoder requested by a `config` control message, keeping the
+    current settings for anything the message leaves out. Unknown or unavailable
+    encodings and invalid batch intervals raise ValueError."""
+    encoding = client_config.get("encoding", current.encoding if current else "json")
+    if encoding not in available_encodings():
+        raise ValueError(f"Unsupported encoding '{encoding}'. Available: {', '.join(available_encodings())}")
+    interval_ms = parse_interval_ms(client_config, "batchInterval", BATCH_INTERVAL_RANGE)
+    if interval_ms is not None:
+        batch_interval = interval_ms / 1000
+    elif current is not None:
+        batch_interval = current.batch_interval
+    else:
+        batch_interval = DEFAULT_BATCH_INTERVAL
+    return FrameEncoder(encoding, batch_interval)
+
+async def collect_batch(queue, encoder: FrameEncoder) -> List[Dict[str, Any]]:
+    """Waits for the next payload; in batched modes also gathers everything that
+    arrives within the encoder's flush interval."""
+    batch = [await queue.get()]
+    if encoder.batched:
+        if encoder.batch_interval > 0:
+            await asyncio.sleep(encoder.batch_interval)
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+    return batch
@@ -0,0 +1,47 @@
+# tests/conftest.py
+import os
+import sys
+
+# Settings are required at import time; tests never reach the real services.
+for name, value in {
+    "SECRET_KEY": "test-secret",
+    "FRONTEND_BASE_URL": "http://localhost:3000",
+    "MONGODB_URI": "mongodb://localhost:27017",
+    "MONGODB_DB_NAME": "test",
+    "STRIPE_SECRET_KEY": "sk_test",
+    "STRIPE_PUBLISHABLE_KEY": "pk_test",
+    "PAYPAL_CLIENT_ID": "paypal-test",
+    "PAYPAL_SECRET": "paypal-test",
+    "GROQ_API_KEY": "groq-test",
+    "FORECAST_SNAPSHOT_ENABLED": "false",
+    "RETENTION_ENABLED": "false",
+    "APPLY_INDEXES_ON_STARTUP": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongomock.collection
+from types import SimpleNamespace
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+def _bulk_write(self, requests, ordered=True, **kwargs):
+    """mongomock's bulk_write predates pymongo 4.9's operation API; apply the
+    operations one by one instead, which is all the services rely on."""
+    result = SimpleNamespace(inserted_count=0, matched_count=0, modified_count=0, deleted_count=0, upserted_count=0)
+    for request in requests:
+        if isinstance(request, InsertOne):
+            self.insert_one(request._doc)
+            result.inserted_count += 1
+        elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+            apply = {UpdateOne: self.update_one, UpdateMany: self.update_many, ReplaceOne: self.replace_one}[type(request)]
+            outcome = apply(request._filter, request._doc, upsert=request._upsert)
+            result.matched_count += outcome.matched_count
+            result.modified_count += outcome.modified_count
+            result.upserted_count += outcome.upserted_id is not None
+        elif isinstance(request, (DeleteOne, DeleteMany)):
+            apply = self.delete_one if isinstance(request, DeleteOne) else self.delete_many
+            result.deleted_count += apply(request._filter).deleted_count
+    return result
+
+mongomock.collection.Collection.bulk_write = _bulk_write
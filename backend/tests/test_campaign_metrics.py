@@ -0,0 +1,55 @@
+# tests/test_campaign_metrics.py
+"""The campaign metrics pipeline must agree with the Python reference implementation."""
+import asyncio
+from datetime import timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from config.settings import get_settings
+from routers.affiliate_router import (
+    aggregate_campaign_metrics, calculate_campaign_metrics, campaigns, lookback_since, payment_method_ids, products,
+)
+from services.event_seeder import EventSeeder
+from services.event_store import create_event_store, utc_now
+
+TENANT_ID = "tenant-metrics"
+
+def _events():
+    end = utc_now()
+    seeder = EventSeeder(campaigns, products, payment_method_ids, ["amazon", "cj"], end - timedelta(days=45), end, seed=3)
+    events = seeder.generate_batch(TENANT_ID, 3000)
+    # Shapes the Python path tolerates and the pipeline must skip the same way.
+    events += [
+        {"tenantId": TENANT_ID, "event": "commission", "campaign": campaigns[0]["name"], "amount": "12.50", "date": end},
+        {"tenantId": TENANT_ID, "event": "conversion", "campaign": campaigns[1]["name"], "date": end},
+        {"tenantId": TENANT_ID, "event": "click", "campaign": campaigns[2]["name"], "date": end},
+        {"tenantId": TENANT_ID, "event": "commission", "campaign": "Unknown Campaign", "amount": 40.0, "date": end},
+        {"tenantId": TENANT_ID, "event": "commission", "amount": 40.0, "date": end},
+        {"tenantId": "other-tenant", "event": "commission", "campaign": campaigns[0]["name"], "amount": 99.0, "date": end},
+    ]
+    return events
+
+def _rounded(metrics):
+    return {name: {key: round(value, 6) for key, value in values.items()} for name, values in metrics.items()}
+
+@pytest.mark.parametrize("layout", ["documents", "buckets"])
+@pytest.mark.parametrize("lookback_days,retention", [(None, False), (10, False), (None, True)])
+def test_pipeline_matches_python_metrics(monkeypatch, layout, lookback_days, retention):
+    # With retention on, the unbounded window is answered from the rollups instead.
+    monkeypatch.setattr(get_settings(), "EVENT_STORAGE_LAYOUT", layout)
+    monkeypatch.setattr(get_settings(), "RETENTION_ENABLED", retention)
+    events = _events()
+    db = AsyncMongoMockClient()["metrics"]
+
+    async def run():
+        await create_event_store(db).insert_many([dict(event) for event in events])
+        return await aggregate_campaign_metrics(db, TENANT_ID, lookback_days)
+
+    aggregated = asyncio.run(run())
+    expected_events = [event for event in events if event["tenantId"] == TENANT_ID]
+    if lookback_days is not None:
+        since = lookback_since(lookback_days)
+        expected_events = [event for event in expected_events if event["date"] >= since]
+
+    assert _rounded(aggregated) == _rounded(calculate_campaign_metrics(expected_events))
@@ -0,0 +1,67 @@
+# tests/test_event_store.py
+"""The bucketed layout must page and fill buckets the way the document layout does."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from services.event_store import BucketedEventStore, DocumentEventStore, as_datetime, bson_datetime
+from services.pagination import encode_cursor
+
+TENANT_ID = "tenant-store"
+START = datetime(2025, 3, 1)
+
+def _events():
+    events = []
+    for i in range(40):
+        date = START + timedelta(minutes=37 * i)
+        # Legacy ISO strings sort below every BSON date; ties on date fall back to _id.
+        if i % 5 == 0:
+            date = date.isoformat()
+        elif i % 7 == 0:
+            date = START + timedelta(minutes=37 * (i - 1))
+        events.append({"_id": ObjectId(), "tenantId": TENANT_ID, "network": ("amazon", "cj")[i % 2],
+                       "event": "click", "clicks": 1, "date": date})
+    return events
+
+async def _pages(store, page_size):
+    ids, after = [], None
+    while True:
+        page = [event async for event in store.iter_newest(TENANT_ID, after, page_size)]
+        ids += [event["_id"] for event in page]
+        if len(page) < page_size:
+            return ids
+        after = encode_cursor(page[-1]["date"], page[-1]["_id"])
+
+def test_bucketed_newest_pages_match_document_order():
+    db = AsyncMongoMockClient()["store"]
+
+    async def run():
+        documents, buckets = DocumentEventStore(db), BucketedEventStore(db)
+        events = _events()
+        await documents.insert_many([dict(event) for event in events])
+        await buckets.insert_many([dict(event) for event in events])
+        return [(await _pages(documents, size), await _pages(buckets, size)) for size in (1, 6, 100)]
+
+    for document_ids, bucket_ids in asyncio.run(run()):
+        assert bucket_ids == document_ids
+
+def test_full_bucket_is_closed_and_the_next_write_opens_one():
+    db = AsyncMongoMockClient()["store"]
+
+    async def run():
+        store = BucketedEventStore(db, max_events=3)
+        for i in range(7):
+            await store.insert_one({"tenantId": TENANT_ID, "network": "amazon", "event": "click",
+                                    "date": START + timedelta(minutes=i)})
+        return await db.get_collection("data_buckets").find({}, {"count": 1, "open": 1, "_id": 0}).to_list(None)
+
+    buckets = asyncio.run(run())
+    assert sorted((bucket["count"], bucket["open"]) for bucket in buckets) == [(1, True), (3, False), (3, False)]
+
+def test_aware_dates_are_stored_as_naive_utc():
+    local = datetime(2025, 3, 1, 12, 30, 0, 123456, tzinfo=timezone(timedelta(hours=2)))
+    assert bson_datetime(local) == datetime(2025, 3, 1, 10, 30, 0, 123000)
+    assert as_datetime(local) == as_datetime("2025-03-01T12:30:00.123456+02:00") == datetime(2025, 3, 1, 10, 30, 0, 123456)
+    assert as_datetime("2025-03-01T10:30:00Z") == datetime(2025, 3, 1, 10, 30)
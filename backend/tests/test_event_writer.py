@@ -0,0 +1,166 @@
+# tests/test_event_writer.py
+"""A failed write-behind flush must not lose events, notifications or counter updates."""
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from services.event_writer import EventWriter
+from services.rollup_service import ROLLUP_STATE_COLLECTION, RollupService
+from services.unread_counter import UnreadCounterService
+
+TENANT_ID = "tenant-writer"
+
+def _event(amount: float = 10.0):
+    return {"_id": ObjectId(), "tenantId": TENANT_ID, "event": "commission", "network": "amazon",
+            "campaign": "Summer Sale", "amount": amount, "date": datetime(2025, 6, 1, 12)}
+
+def _notification():
+    return {"_id": ObjectId(), "tenantId": TENANT_ID, "user_id": "u1", "message": "m",
+            "read": False, "created_at": datetime(2025, 6, 1, 12)}
+
+def _failing(method, failures: int):
+    calls = {"n": 0}
+
+    async def wrapper(*args, **kwargs):
+        calls["n"] += 1
+        if calls["n"] <= failures:
+            raise ConnectionError("connection reset")
+        return await method(*args, **kwargs)
+    return wrapper
+
+def test_failed_event_insert_is_requeued_and_notifications_still_written(monkeypatch):
+    db = AsyncMongoMockClient()["writer"]
+    writer = EventWriter(max_batch=100, flush_interval=0.01, max_pending=1000)
+
+    async def run():
+        events = db.get_collection("data")
+        monkeypatch.setattr(type(events), "insert_many", _failing(type(events).insert_many, 1))
+        writer.enqueue(db, _event(), _notification())
+        writer.enqueue(db, _event(), None)
+        await writer.flush()
+        assert writer.stats()["pendingEvents"] == 2
+        assert await db.get_collection("notifications").count_documents({}) == 1
+
+        writer.enqueue(db, _event(), None)
+        await writer.flush()
+        await writer.close()
+        return await events.count_documents({})
+
+    assert asyncio.run(run()) == 3
+    assert writer.stats()["pendingEvents"] == 0
+
+def test_failed_rollup_update_marks_tenant_stale(monkeypatch):
+    db = AsyncMongoMockClient()["writer"]
+    writer = EventWriter(max_batch=100, flush_interval=0.01, max_pending=1000)
+
+    async def run():
+        service = RollupService(db)
+        await service.get_rollups(TENANT_ID)
+        monkeypatch.setattr(RollupService, "record_events", _failing(RollupService.record_events, 1))
+        writer.enqueue(db, _event(25.0), None)
+        await writer.flush()
+        state = await db.get_collection(ROLLUP_STATE_COLLECTION).find_one({"_id": TENANT_ID})
+        assert state["stale_generation"] == state["generation"]
+        return await service.get_rollups(TENANT_ID)
+
+    rollups = asyncio.run(run())
+    assert sum(bucket["revenue"] for bucket in rollups) == 25.0
+
+def test_failed_unread_count_marks_counter_for_recount(monkeypatch):
+    db = AsyncMongoMockClient()["writer"]
+    writer = EventWriter(max_batch=100, flush_interval=0.01, max_pending=1000)
+
+    async def run():
+        counters = UnreadCounterService(db)
+        assert await counters.get(TENANT_ID) == 0
+        monkeypatch.setattr(UnreadCounterService, "record_notifications",
+                            _failing(UnreadCounterService.record_notifications, 1))
+        writer.enqueue(db, _event(), _notification())
+        await writer.flush()
+        return await counters.get(TENANT_ID)
+
+    assert asyncio.run(run()) == 1
+
+def test_requeued_buffers_drop_the_oldest_past_max_pending(monkeypatch):
+    db = AsyncMongoMockClient()["writer"]
+    writer = EventWriter(max_batch=100, flush_interval=0.01, max_pending=3)
+
+    async def run():
+        events = db.get_collection("data")
+        monkeypatch.setattr(type(events), "insert_many", _failing(type(events).insert_many, 2))
+        enqueued = [_event() for _ in range(5)]
+        for event in enqueued[:2]:
+            writer.enqueue(db, event, None)
+        await writer.flush()
+        for event in enqueued[2:]:
+            writer.enqueue(db, event, None)
+        assert writer.stats()["pendingEvents"] == 3
+        await writer.flush()
+        await writer.flush()
+        await writer.close()
+        return enqueued, [event["_id"] async for event in events.find({}, {"_id": 1})]
+
+    enqueued, stored = asyncio.run(run())
+    assert sorted(stored) == sorted(event["_id"] for event in enqueued[2:])
+    assert writer.stats()["dropped"] == 2
+
+def test_size_trigger_counts_notifications():
+    writer = EventWriter(max_batch=4, flush_interval=60, max_pending=1000)
+
+    async def run():
+        db = AsyncMongoMockClient()["writer"]
+        writer.enqueue(db, _event(), _notification())
+        writer.enqueue(db, _event(), _notification())
+        await asyncio.sleep(0.05)
+        await writer.close()
+        return writer.flushes
+
+    assert asyncio.run(run()) >= 1
+
+def test_event_buffered_before_a_rebuild_does_not_mark_it_stale():
+    db = AsyncMongoMockClient()["writer"]
+    writer = EventWriter(max_batch=100, flush_interval=0.01, max_pending=1000)
+
+    async def run():
+        service = RollupService(db)
+        await service.get_rollups(TENANT_ID)
+        # Generated (and dated) before the rebuild's fence, flushed after it.
+        event = _event(40.0)
+        event["date"] = datetime(2025, 6, 1, 12)
+        await service.rebuild_tenant(TENANT_ID)
+        writer.enqueue(db, event, None)
+        await writer.flush()
+        state = await db.get_collection(ROLLUP_STATE_COLLECTION).find_one({"_id": TENANT_ID})
+        live = await service.get_rollups(TENANT_ID)
+        await service.rebuild_tenant(TENANT_ID)
+        return state, live, await service.get_rollups(TENANT_ID)
+
+    state, live, rebuilt = asyncio.run(run())
+    assert state.get("stale_generation") != state["generation"]
+    assert sum(bucket["revenue"] for bucket in live) == sum(bucket["revenue"] for bucket in rebuilt) == 40.0
+
+def test_insert_overlapping_a_rebuild_claim_marks_tenant_stale(monkeypatch):
+    db = AsyncMongoMockClient()["writer"]
+    writer = EventWriter(max_batch=100, flush_interval=0.01, max_pending=1000)
+
+    async def run():
+        service = RollupService(db)
+        await service.get_rollups(TENANT_ID)
+        stamp = RollupService.stamp_generations
+
+        async def stamp_then_rebuild(self, events):
+            await stamp(self, events)
+            await RollupService(db).rebuild_tenant(TENANT_ID)
+
+        monkeypatch.setattr(RollupService, "stamp_generations", stamp_then_rebuild)
+        writer.enqueue(db, _event(15.0), None)
+        await writer.flush()
+        monkeypatch.undo()
+        state = await db.get_collection(ROLLUP_STATE_COLLECTION).find_one({"_id": TENANT_ID})
+        return state, await service.get_rollups(TENANT_ID)
+
+    state, rollups = asyncio.run(run())
+    assert state["stale_generation"] == state["generation"]
+    assert sum(bucket["revenue"] for bucket in rollups) == 15.0
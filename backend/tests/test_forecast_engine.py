@@ -0,0 +1,37 @@
+# tests/test_forecast_engine.py
+"""The vectorized snapshot forecasts must match the per-request forecast."""
+import random
+
+from routers.affiliate_router import build_forecast, campaigns
+from services.forecast_engine import build_forecasts
+
+MONTHS = [f"{year}-{month:02d}" for year in (2023, 2024, 2025) for month in range(1, 13)]
+
+def _tenants(count: int, seed: int):
+    rng = random.Random(seed)
+    monthly_series, campaign_metrics = [], []
+    for _ in range(count):
+        # Empty, single-month and gappy histories, with zero and tiny months.
+        months = sorted(rng.sample(MONTHS, rng.randint(0, 14)))
+        monthly_series.append({
+            month: rng.choice([0.0, round(rng.uniform(0, 5000), 2), rng.uniform(0, 50)]) for month in months
+        })
+        campaign_metrics.append({
+            campaign["name"]: {
+                "revenue": rng.uniform(0, 100),
+                "commissions": rng.randint(0, 5),
+                "clicks": rng.randint(0, 50),
+                "conversionRate": rng.uniform(0, 15),
+            }
+            for campaign in campaigns
+        })
+    return monthly_series, campaign_metrics
+
+def test_build_forecasts_matches_build_forecast():
+    monthly_series, campaign_metrics = _tenants(500, seed=3)
+
+    forecasts = build_forecasts(monthly_series, campaign_metrics)
+
+    assert len(forecasts) == len(monthly_series)
+    for forecast, monthly_data, metrics in zip(forecasts, monthly_series, campaign_metrics):
+        assert forecast.model_dump() == build_forecast(monthly_data, metrics).model_dump(), monthly_data
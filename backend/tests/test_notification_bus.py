@@ -0,0 +1,71 @@
+# tests/test_notification_bus.py
+"""The Mongo bus must keep tailing one cursor while it is idle instead of replaying the collection."""
+import asyncio
+
+from services.notification_bus import MongoBusBackend
+
+class _TailableCursor:
+    """Yields one scripted batch per `async for`, like Motor on each awaitData getMore."""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.alive = True
+        self.closed = False
+
+    def __aiter__(self):
+        return self._batch()
+
+    async def _batch(self):
+        if not self.batches:
+            # Idle: the getMore waits for awaitData and returns nothing.
+            await asyncio.sleep(0.01)
+            return
+        for message in self.batches.pop(0):
+            yield message
+
+    async def close(self):
+        self.alive = False
+        self.closed = True
+
+class _Collection:
+    def __init__(self, batches):
+        self.cursors = []
+        self.batches = batches
+        self.counts = 0
+
+    async def find_one(self, *args, **kwargs):
+        return None
+
+    async def count_documents(self, *args, **kwargs):
+        self.counts += 1
+        return 1
+
+    def find(self, *args, **kwargs):
+        self.cursors.append(_TailableCursor(self.batches))
+        return self.cursors[-1]
+
+class _Db:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_collection(self, name):
+        return self.collection
+
+def _message(i):
+    return {"_id": i, "tenantId": "t", "notification": {"n": i}, "origin": "other"}
+
+def test_idle_tail_keeps_one_cursor():
+    collection = _Collection([[_message(1)], [], [], [_message(2), _message(3)], []])
+    backend = MongoBusBackend(_Db(collection))
+    delivered = []
+
+    async def run():
+        task = asyncio.create_task(backend._tail(lambda tenant_id, notification: delivered.append(notification["n"])))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert delivered == [1, 2, 3]
+    assert len(collection.cursors) == 1 and collection.counts == 0
+    assert collection.cursors[0].closed
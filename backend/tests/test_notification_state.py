@@ -0,0 +1,47 @@
+# tests/test_notification_state.py
+"""Moving the read watermark must not lose unread increments made concurrently."""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from services.notification_state import NotificationStateService
+from services.unread_counter import UnreadCounterService
+
+TENANT_ID = "tenant-state"
+START = datetime(2025, 1, 1)
+
+def _notification(minutes: int):
+    return {"_id": ObjectId(), "tenantId": TENANT_ID, "message": "m", "read": False,
+            "created_at": START + timedelta(minutes=minutes)}
+
+def test_mark_all_read_keeps_increments_from_concurrent_inserts(monkeypatch):
+    db = AsyncMongoMockClient()["state"]
+    notifications = db.get_collection("notifications")
+
+    async def run():
+        await notifications.insert_many([_notification(minute) for minute in range(5)])
+        counter = UnreadCounterService(db)
+        assert await counter.get(TENANT_ID) == 5
+
+        count_documents = type(notifications).count_documents
+        inserted = []
+
+        async def count_then_insert(self, *args, **kwargs):
+            count = await count_documents(self, *args, **kwargs)
+            if not inserted:
+                # A writer lands a newer notification between the count and the watermark move.
+                inserted.append(_notification(10))
+                await notifications.insert_one(inserted[0])
+                await counter.record_notifications(inserted)
+            return count
+
+        monkeypatch.setattr(type(notifications), "count_documents", count_then_insert)
+        result = await NotificationStateService(db).mark_all_read(TENANT_ID, START + timedelta(minutes=4))
+        monkeypatch.undo()
+        return result, await counter.get(TENANT_ID), await counter.rebuild(TENANT_ID, START + timedelta(minutes=4))
+
+    result, unread, recounted = asyncio.run(run())
+    assert result["watermark"] == (START + timedelta(minutes=4)).isoformat()
+    assert unread == recounted == 1
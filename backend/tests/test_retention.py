@@ -0,0 +1,174 @@
+# tests/test_retention.py
+"""Compaction interrupted between archiving and deleting must not double count or lose events."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from config.settings import get_settings
+from services import event_archive
+from services.event_archive import ARCHIVE_COLLECTION, decode_archive
+from services.event_store import BucketedEventStore
+from services.retention import RetentionCompactor, parse_policies
+from services.rollup_service import RollupService
+
+TENANT_ID = "tenant-retention"
+NOW = datetime(2026, 1, 15)
+POLICIES = parse_policies({"data.click": 90, "data.commission": 365, "data.*": 365})
+
+def _events():
+    events = []
+    for days in (1, 10, 100, 200, 400, 401, 402, 800, 801):
+        for event_type in ("click", "commission", "payout"):
+            events.append({"_id": ObjectId(), "tenantId": TENANT_ID, "event": event_type, "campaign": "C",
+                           "amount": 10.0, "clicks": 2, "date": NOW - timedelta(days=days)})
+    return events
+
+def _rollup_totals(rollups):
+    return sorted((r["month"], r["revenue"], r["commissions"], r["clicks"]) for r in rollups)
+
+async def _stored_ids(db):
+    ids = [event["_id"] async for event in db.get_collection("data").find({}, {"_id": 1})]
+    async for archive in db.get_collection(ARCHIVE_COLLECTION).find():
+        ids += [doc["_id"] for doc in decode_archive(archive)]
+    return ids
+
+def _interrupt_deletes(monkeypatch, db, collection="data"):
+    data = db.get_collection(collection)
+    delete_many = type(data).delete_many
+
+    async def failing_delete(self, *args, **kwargs):
+        if self.name == collection:
+            raise ConnectionError("connection reset")
+        return await delete_many(self, *args, **kwargs)
+
+    monkeypatch.setattr(type(data), "delete_many", failing_delete)
+
+def test_rebuild_skips_raw_copies_left_by_an_interrupted_run(monkeypatch):
+    db = AsyncMongoMockClient()["retention"]
+
+    async def run():
+        await db.get_collection("data").insert_many(_events())
+        service = RollupService(db)
+        expected = _rollup_totals(await service.get_rollups(TENANT_ID))
+
+        _interrupt_deletes(monkeypatch, db)
+        with pytest.raises(ConnectionError):
+            await RetentionCompactor(db, POLICIES, 3600, batch_size=4, journal_timeout=0).run_once(NOW)
+        monkeypatch.undo()
+        await service.rebuild_tenant(TENANT_ID)
+        interrupted = _rollup_totals(await service.get_rollups(TENANT_ID))
+
+        await RetentionCompactor(db, POLICIES, 3600, batch_size=4, journal_timeout=0).run_once(NOW)
+        await service.rebuild_tenant(TENANT_ID)
+        return expected, interrupted, _rollup_totals(await service.get_rollups(TENANT_ID))
+
+    expected, interrupted, compacted = asyncio.run(run())
+    assert interrupted == expected
+    assert compacted == expected
+
+def test_rerun_with_a_different_batch_keeps_every_event(monkeypatch):
+    db = AsyncMongoMockClient()["retention"]
+
+    async def run():
+        events = _events()
+        await db.get_collection("data").insert_many(events)
+        _interrupt_deletes(monkeypatch, db)
+        with pytest.raises(ConnectionError):
+            await RetentionCompactor(db, POLICIES, 3600, batch_size=4, journal_timeout=0).run_once(NOW)
+        monkeypatch.undo()
+
+        # An expired event that lands before the rerun changes what the first batch archives.
+        late = {"_id": ObjectId(), "tenantId": TENANT_ID, "event": "click", "campaign": "C", "clicks": 2,
+                "date": NOW - timedelta(days=900)}
+        await db.get_collection("data").insert_one(late)
+        await RetentionCompactor(db, POLICIES, 3600, batch_size=4, journal_timeout=0).run_once(NOW)
+        stored = await _stored_ids(db)
+        return sorted(map(str, stored)), sorted(str(event["_id"]) for event in events + [late])
+
+    stored, expected = asyncio.run(run())
+    assert stored == expected
+
+def test_rebuild_reads_archive_totals_without_decoding(monkeypatch):
+    db = AsyncMongoMockClient()["retention"]
+
+    async def run():
+        await db.get_collection("data").insert_many(_events())
+        service = RollupService(db)
+        expected = _rollup_totals(await service.get_rollups(TENANT_ID))
+        await RetentionCompactor(db, POLICIES, 3600, batch_size=4).run_once(NOW)
+        archives = db.get_collection(ARCHIVE_COLLECTION)
+        # An archive written before archives carried totals is decoded once and given them.
+        legacy = await archives.find_one({}, sort=[("month", 1)])
+        await archives.update_one({"_id": legacy["_id"]}, {"$unset": {"totals": ""}})
+        await service.rebuild_tenant(TENANT_ID)
+        backfilled = _rollup_totals(await service.get_rollups(TENANT_ID))
+
+        monkeypatch.setattr(event_archive, "decode_archive", lambda archive: pytest.fail("decoded an archive"))
+        await service.rebuild_tenant(TENANT_ID)
+        return expected, backfilled, _rollup_totals(await service.get_rollups(TENANT_ID)), await archives.count_documents({"totals": None})
+
+    expected, backfilled, rebuilt, without_totals = asyncio.run(run())
+    assert backfilled == rebuilt == expected
+    assert without_totals == 0
+
+def _bucket_ids(db):
+    async def ids():
+        found = []
+        async for bucket in db.get_collection("data_buckets").find():
+            found += [record["_id"] for record in bucket["events"]]
+        async for archive in db.get_collection(ARCHIVE_COLLECTION).find():
+            found += [doc["_id"] for doc in decode_archive(archive)]
+        return found
+    return ids()
+
+def test_interrupted_bucket_compaction_keeps_rollups_and_events(monkeypatch):
+    monkeypatch.setattr(get_settings(), "EVENT_STORAGE_LAYOUT", "buckets")
+    db = AsyncMongoMockClient()["retention"]
+    policies = parse_policies({"data.click": 90, "data.*": 365})
+
+    async def run():
+        events = _events()
+        await BucketedEventStore(db).insert_many([dict(event, network="amazon") for event in events])
+        service = RollupService(db)
+        expected = _rollup_totals(await service.get_rollups(TENANT_ID))
+
+        _interrupt_deletes(monkeypatch, db, "data_buckets")
+        with pytest.raises(ConnectionError):
+            await RetentionCompactor(db, policies, 3600, batch_size=1, journal_timeout=0).run_once(NOW)
+        monkeypatch.undo()
+        monkeypatch.setattr(get_settings(), "EVENT_STORAGE_LAYOUT", "buckets")
+        await service.rebuild_tenant(TENANT_ID)
+        interrupted = _rollup_totals(await service.get_rollups(TENANT_ID))
+
+        removed = await RetentionCompactor(db, policies, 3600, batch_size=1, journal_timeout=0).run_once(NOW)
+        await service.rebuild_tenant(TENANT_ID)
+        hours = sorted([bucket["hour"] async for bucket in db.get_collection("data_buckets").find()])
+        return (expected, interrupted, _rollup_totals(await service.get_rollups(TENANT_ID)), removed, hours,
+                sorted(map(str, await _bucket_ids(db))), sorted(str(event["_id"]) for event in events))
+
+    expected, interrupted, compacted, removed, hours, stored, written = asyncio.run(run())
+    assert interrupted == compacted == expected
+    # The interrupted run archived the oldest bucket; the rerun finished it and took the other four.
+    assert removed == {"data_buckets.*": 4}
+    assert [NOW - hour for hour in hours] == [timedelta(days=days) for days in (200, 100, 10, 1)]
+    assert stored == written
+
+def test_bucket_policy_follows_the_longest_type_in_it():
+    db = AsyncMongoMockClient()["retention"]
+    policies = parse_policies({"data.click": 90, "data.payout": 2555, "data.*": 365})
+
+    async def run():
+        events = [event for event in _events() if event["event"] != "payout" or event["date"] > NOW - timedelta(days=500)]
+        await BucketedEventStore(db).insert_many([dict(event, network="amazon") for event in events])
+        removed = await RetentionCompactor(db, policies, 3600, batch_size=2).run_once(NOW)
+        hours = sorted([bucket["hour"] async for bucket in db.get_collection("data_buckets").find()])
+        return removed, hours, sorted(map(str, await _bucket_ids(db))), sorted(str(event["_id"]) for event in events)
+
+    removed, hours, stored, written = asyncio.run(run())
+    # Clicks alone expire after 90 days, and the 400-day buckets hold payouts (2555 days).
+    assert removed == {"data_buckets.*": 2}
+    assert [NOW - hour for hour in hours] == [timedelta(days=days) for days in (402, 401, 400, 200, 100, 10, 1)]
+    assert stored == written
@@ -9,6 +9,7 @@ import { Badge } from "@/components/ui/badge";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { TrendingUp, Filter, Download, Settings, DollarSign } from "lucide-react";
 import { DashboardLayout } from "@/components/dashboard-layout";
+import { fetchAllEvents } from "@/lib/events";
 import { ConversionAnalysis } from "@/components/conversion-analysis";
 import { CampaignOptimization } from "@/components/campaign-optimization";
 import { RevenueForecasting } from "@/components/revenue-forecasting";
@@ -182,7 +183,7 @@ export default function AnalyticsPage() {
         async function fetchUnreadCount() {
             if (!accessToken) return;
             try {
-                const response = await fetch("/.netlify/functions/proxy/api/affiliate/notifications", {
+                const response = await fetch("/.netlify/functions/proxy/api/affiliate/notifications/unread-count", {
                     headers: {
                         Authorization: `Bearer ${accessToken}`,
                     },
@@ -196,7 +197,7 @@ export default function AnalyticsPage() {
                     throw new Error("Failed to fetch notifications");
                 }
                 const data = await response.json();
-                const count = data.notifications.filter((n: any) => !n.read).length;
+                const count = data.unread_count;
                 setUnreadCount(count);
             } catch (error: any) {
                 console.error("Error fetching unread count:", error);
@@ -282,20 +283,14 @@ export default function AnalyticsPage() {
             if (!accessToken) return;
 
             try {
-                const eventsResponse = await fetch("/.netlify/functions/proxy/api/affiliate/events", {
-                    headers: {
-                        Authorization: `Bearer ${accessToken}`,
-                    },
-                });
-                if (!eventsResponse.ok) {
-                    const errorText = await response.text();
-                    console.error(`Fetch events failed: ${eventsResponse.status} ${errorText}`);
-                    if (eventsResponse.status === 401) {
+                const eventsData = await fetchAllEvents(accessToken);
+                if (!eventsData.ok) {
+                    console.error(`Fetch events failed: ${eventsData.status} ${eventsData.statusText}`);
+                    if (eventsData.status === 401) {
                         throw new Error("Unauthorized: Invalid or expired token");
                     }
                     throw new Error("Failed to fetch initial events.");
                 }
-                const eventsData = await eventsResponse.json();
                 processEvents(eventsData.events || []);
 
                 const initialCampaignMetrics: { [key: string]: { revenue: number; commissions: number } } = {};
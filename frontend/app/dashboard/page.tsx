@@ -28,6 +28,7 @@ import {
   Search,
 } from "lucide-react";
 import { DashboardLayout } from "@/components/dashboard-layout";
+import { fetchAllEvents } from "@/lib/events";
 import { MetricCard } from "@/components/metric-card";
 import { RevenueChart } from "@/components/revenue-chart";
 import { NetworkTable } from "@/components/network-table";
@@ -142,14 +143,14 @@ export default function DashboardPage() {
           router.push("/onboarding");
           return;
         }
-        const response = await fetch("/.netlify/functions/proxy/api/affiliate/notifications", {
+        const response = await fetch("/.netlify/functions/proxy/api/affiliate/notifications/unread-count", {
           headers: {
             Authorization: `Bearer ${token}`,
           },
         });
         if (response.ok) {
           const data = await response.json();
-          const count = data.notifications.filter((n: any) => !n.read).length;
+          const count = data.unread_count;
           setUnreadCount(count);
         } else {
           console.error("Failed to fetch unread count:", response.statusText);
@@ -248,15 +249,10 @@ export default function DashboardPage() {
           router.push("/onboarding");
           return;
         }
-        const response = await fetch("/.netlify/functions/proxy/api/affiliate/events", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (!response.ok) {
-          throw new Error(`Failed to fetch initial data: ${response.statusText}`);
+        const data = await fetchAllEvents(token);
+        if (!data.ok) {
+          throw new Error(`Failed to fetch initial data: ${data.statusText}`);
         }
-        const data = await response.json();
         processEvents(data.events);
       } catch (error) {
         console.error("Error fetching initial data:", error);
@@ -395,15 +391,10 @@ export default function DashboardPage() {
         router.push("/onboarding");
         return;
       }
-      const response = await fetch("/.netlify/functions/proxy/api/affiliate/events", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-      if (!response.ok) {
-        throw new Error(`Failed to refresh data: ${response.statusText}`);
+      const data = await fetchAllEvents(token);
+      if (!data.ok) {
+        throw new Error(`Failed to refresh data: ${data.statusText}`);
       }
-      const data = await response.json();
       processEvents(data.events);
     } catch (error) {
       console.error("Error refreshing data:", error);
@@ -43,6 +43,7 @@ interface Notification {
 }
 
 const ITEMS_PER_PAGE = 5;
+const NOTIFICATIONS_URL = "/.netlify/functions/proxy/api/affiliate/notifications";
 
 const getPriority = (type: string): "high" | "medium" | "low" => {
   switch (type) {
@@ -148,8 +149,12 @@ export default function NotificationsPage() {
   const [selectedNotifications, setSelectedNotifications] = useState<string[]>([]);
   const [notifications, setNotifications] = useState<Notification[]>([]);
   const [itemsToShow, setItemsToShow] = useState(ITEMS_PER_PAGE);
+  // /notifications is keyset-paginated: older pages are fetched on "show more" by following `next_cursor`.
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  // The list only holds the pages fetched so far, so the badge uses the server's count.
+  const [unreadCount, setUnreadCount] = useState(0);
 
-  const fetchNotifications = useCallback(async () => {
+  const fetchNotifications = useCallback(async (after: string | null = null) => {
     try {
       const token = localStorage.getItem("accessToken");
       if (!token) {
@@ -157,7 +162,8 @@ export default function NotificationsPage() {
         router.push("/onboarding");
         return;
       }
-      const response = await fetch("/.netlify/functions/proxy/api/affiliate/notifications", {
+      const params = after ? `?${new URLSearchParams({ after })}` : "";
+      const response = await fetch(`${NOTIFICATIONS_URL}${params}`, {
         headers: {
           Authorization: `Bearer ${token}`,
         },
@@ -173,7 +179,9 @@ export default function NotificationsPage() {
       }
       const data = await response.json();
       const formattedNotifications = data.notifications.map(formatNotification);
-      setNotifications(formattedNotifications);
+      setNotifications((prev) => (after ? [...prev, ...formattedNotifications] : formattedNotifications));
+      setNextCursor(data.next_cursor ?? null);
+      setUnreadCount(data.unread_count ?? 0);
     } catch (error) {
       console.error("Error fetching notifications:", error);
       router.push("/onboarding");
@@ -227,7 +235,10 @@ export default function NotificationsPage() {
             created_at: data.notification?.created_at ?? data.event.date,
           });
 
-          setNotifications((prev) => [notification, ...prev].slice(0, 100));
+          setNotifications((prev) => [notification, ...prev]);
+          if (!notification.read) {
+            setUnreadCount((prev) => prev + 1);
+          }
         } catch (err) {
           console.error(`WebSocket message parsing error for ${network.id}:`, err);
         }
@@ -265,9 +276,11 @@ export default function NotificationsPage() {
       });
 
       if (response.ok) {
+        const changed = notifications.filter((n) => notificationIds.includes(n._id) && !n.read).length;
         setNotifications((prev) =>
           prev.map((n) => (notificationIds.includes(n._id) ? { ...n, read: true } : n))
         );
+        setUnreadCount((prev) => Math.max(prev - changed, 0));
         setSelectedNotifications([]);
       } else {
         if (response.status === 401) {
@@ -303,9 +316,11 @@ export default function NotificationsPage() {
       });
 
       if (response.ok) {
+        const changed = notifications.filter((n) => notificationIds.includes(n._id) && n.read).length;
         setNotifications((prev) =>
           prev.map((n) => (notificationIds.includes(n._id) ? { ...n, read: false } : n))
         );
+        setUnreadCount((prev) => prev + changed);
         setSelectedNotifications([]);
       } else {
         if (response.status === 401) {
@@ -341,7 +356,9 @@ export default function NotificationsPage() {
       });
 
       if (response.ok) {
+        const removedUnread = notifications.filter((n) => notificationIds.includes(n._id) && !n.read).length;
         setNotifications((prev) => prev.filter((n) => !notificationIds.includes(n._id)));
+        setUnreadCount((prev) => Math.max(prev - removedUnread, 0));
         setSelectedNotifications([]);
       } else {
         if (response.status === 401) {
@@ -358,10 +375,37 @@ export default function NotificationsPage() {
     }
   };
 
-  const markAllAsRead = () => {
-    const unreadIds = notifications.filter((n) => !n.read).map((n) => n._id);
-    if (unreadIds.length > 0) {
-      markAsRead(unreadIds);
+  // Marks every notification read, including pages not fetched yet, by moving the read watermark.
+  const markAllAsRead = async () => {
+    try {
+      const token = localStorage.getItem("accessToken");
+      if (!token) {
+        console.error("No access token for marking notifications as read");
+        router.push("/onboarding");
+        return;
+      }
+      const response = await fetch(`${NOTIFICATIONS_URL}/mark-all-read`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${token}`,
+        },
+        body: JSON.stringify({}),
+      });
+
+      if (response.ok) {
+        setNotifications((prev) => prev.map((n) => ({ ...n, read: true })));
+        setUnreadCount(0);
+      } else if (response.status === 401) {
+        console.error("Unauthorized: Invalid or expired token");
+        localStorage.removeItem("accessToken");
+        router.push("/onboarding");
+      } else {
+        console.error("Failed to mark all notifications as read:", response.statusText);
+      }
+    } catch (error) {
+      console.error("Error marking all notifications as read:", error);
+      router.push("/onboarding");
     }
   };
 
@@ -400,6 +444,10 @@ export default function NotificationsPage() {
   };
 
   const handleShowMore = () => {
+    // Fetch the next page before the loaded notifications run out.
+    if (nextCursor && filteredNotifications.length < itemsToShow + ITEMS_PER_PAGE) {
+      fetchNotifications(nextCursor);
+    }
     setItemsToShow((prevItemsToShow) => prevItemsToShow + ITEMS_PER_PAGE);
   };
 
@@ -422,10 +470,10 @@ export default function NotificationsPage() {
   });
 
   const visibleNotifications = filteredNotifications.slice(0, itemsToShow);
-  const hasMoreNotifications = filteredNotifications.length > itemsToShow;
+  const hasMoreNotifications = filteredNotifications.length > itemsToShow || nextCursor !== null;
 
   return (
-    <DashboardLayout unreadCount={notifications.filter((n) => !n.read).length}>
+    <DashboardLayout unreadCount={unreadCount}>
       <div className="space-y-8">
         {/* Header */}
         <div className="flex flex-col sm:flex-row justify-between items-start sm:items-center gap-4">
@@ -433,9 +481,9 @@ export default function NotificationsPage() {
             <h1 className="text-3xl font-bold flex items-center gap-3 text-balance">
               <Bell className="w-8 h-8 text-primary" />
               Notifications
-              {notifications.filter((n) => !n.read).length > 0 && (
+              {unreadCount > 0 && (
                 <Badge className="bg-primary text-primary-foreground">
-                  {notifications.filter((n) => !n.read).length} new
+                  {unreadCount} new
                 </Badge>
               )}
             </h1>
@@ -458,7 +506,7 @@ export default function NotificationsPage() {
             <Button
               size="sm"
               onClick={markAllAsRead}
-              disabled={notifications.filter((n) => !n.read).length === 0}
+              disabled={unreadCount === 0}
             >
               Mark All Read
             </Button>
@@ -484,7 +532,7 @@ export default function NotificationsPage() {
               <div className="flex items-center justify-between">
                 <div>
                   <p className="text-sm font-medium text-muted-foreground">Unread</p>
-                  <p className="text-2xl font-bold">{notifications.filter((n) => !n.read).length}</p>
+                  <p className="text-2xl font-bold">{unreadCount}</p>
                 </div>
                 <EyeOff className="w-8 h-8 text-orange-500/60" />
               </div>
@@ -565,9 +613,9 @@ export default function NotificationsPage() {
                     <TabsTrigger value="all">All</TabsTrigger>
                     <TabsTrigger value="unread">
                       Unread
-                      {notifications.filter((n) => !n.read).length > 0 && (
+                      {unreadCount > 0 && (
                         <Badge className="ml-2 bg-primary text-primary-foreground text-xs">
-                          {notifications.filter((n) => !n.read).length}
+                          {unreadCount}
                         </Badge>
                       )}
                     </TabsTrigger>
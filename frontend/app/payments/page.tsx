@@ -9,6 +9,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { Input } from "@/components/ui/input";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 import { useToast } from "@/components/ui/use-toast";
+import { fetchAllEvents } from "@/lib/events";
 import {
     ArrowUpRight,
     Plus,
@@ -195,7 +196,7 @@ export default function PaymentsPage() {
         async function fetchUnreadCount() {
             if (!accessToken) return;
             try {
-                const response = await fetch("/.netlify/functions/proxy/api/affiliate/notifications", {
+                const response = await fetch("/.netlify/functions/proxy/api/affiliate/notifications/unread-count", {
                     headers: {
                         Authorization: `Bearer ${accessToken}`,
                     },
@@ -207,7 +208,7 @@ export default function PaymentsPage() {
                     throw new Error("Failed to fetch notifications");
                 }
                 const data = await response.json();
-                const count = data.notifications.filter((n: any) => !n.read).length;
+                const count = data.unread_count;
                 setUnreadCount(count);
             } catch (error: any) {
                 console.error("Error fetching unread count:", error);
@@ -232,18 +233,13 @@ export default function PaymentsPage() {
         async function fetchInitialData() {
             if (!accessToken) return;
             try {
-                const eventsResponse = await fetch("/.netlify/functions/proxy/api/affiliate/events", {
-                    headers: {
-                        Authorization: `Bearer ${accessToken}`,
-                    },
-                });
-                if (!eventsResponse.ok) {
-                    if (eventsResponse.status === 401) {
+                const eventsData = await fetchAllEvents(accessToken);
+                if (!eventsData.ok) {
+                    if (eventsData.status === 401) {
                         throw new Error("Unauthorized: Invalid or expired token");
                     }
                     throw new Error("Failed to fetch initial events");
                 }
-                const eventsData = await eventsResponse.json();
                 const validEvents = eventsData.events.filter((e: AffiliateEvent) => e.network);
                 setEvents(validEvents);
 
@@ -8,6 +8,7 @@ import { Badge } from "@/components/ui/badge"
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs"
 import { FileText, Download, Calendar, Settings, AlertCircle, CheckCircle, Globe, ExternalLink } from "lucide-react"
 import { DashboardLayout } from "@/components/dashboard-layout"
+import { fetchAllEvents } from "@/lib/events"
 import { TaxSummary } from "@/components/tax-summary"
 import { DocumentGenerator } from "@/components/document-generator"
 import { ComplianceChecklist } from "@/components/compliance-checklist"
@@ -170,7 +171,7 @@ export default function TaxReportsPage() {
 
             try {
                 // Fetch notifications
-                const notificationsResponse = await fetch("/.netlify/functions/proxy/api/affiliate/notifications", {
+                const notificationsResponse = await fetch("/.netlify/functions/proxy/api/affiliate/notifications/unread-count", {
                     headers: {
                         Authorization: `Bearer ${accessToken}`, // Include access token
                     },
@@ -182,22 +183,18 @@ export default function TaxReportsPage() {
                     throw new Error("Failed to fetch notifications")
                 }
                 const notificationsData = await notificationsResponse.json()
-                const unread = notificationsData.notifications.filter((n: any) => !n.read).length
+                const unread = notificationsData.unread_count
                 setUnreadCount(unread)
 
                 // Fetch events
-                const eventsResponse = await fetch("/.netlify/functions/proxy/api/affiliate/events", {
-                    headers: {
-                        Authorization: `Bearer ${accessToken}`, // Include access token
-                    },
-                })
-                if (!eventsResponse.ok) {
-                    if (eventsResponse.status === 401) {
+                // Tax totals need the whole history, not just the newest page
+                const eventsData = await fetchAllEvents(accessToken)
+                if (!eventsData.ok) {
+                    if (eventsData.status === 401) {
                         throw new Error("Unauthorized: Invalid or expired token")
                     }
                     throw new Error("Failed to fetch events")
                 }
-                const eventsData = await eventsResponse.json()
 
                 // Calculate totalIncome using both commission and conversion amounts
                 const totalIncome = eventsData.events
@@ -0,0 +1,36 @@
+const EVENTS_URL = "/.netlify/functions/proxy/api/affiliate/events"
+const PAGE_SIZE = 5000
+
+export type EventsResult = {
+  ok: boolean
+  status: number
+  statusText: string
+  events: any[]
+}
+
+// /api/affiliate/events is keyset-paginated: each page returns `next_cursor`
+// until the history is exhausted. Pages that total or list the whole history
+// must follow it, otherwise they only see the newest page.
+export async function fetchAllEvents(accessToken: string): Promise<EventsResult> {
+  const events: any[] = []
+  let after: string | null = null
+
+  do {
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) })
+    if (after) params.set("after", after)
+
+    const response = await fetch(`${EVENTS_URL}?${params}`, {
+      headers: {
+        Authorization: `Bearer ${accessToken}`,
+      },
+    })
+    if (!response.ok) {
+      return { ok: false, status: response.status, statusText: response.statusText, events }
+    }
+    const page = await response.json()
+    events.push(...(page.events || []))
+    after = page.next_cursor ?? null
+  } while (after)
+
+  return { ok: true, status: 200, statusText: "OK", events }
+}